@@ -0,0 +1,144 @@
+# Copyright 2017 data.world, inc
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""Bytes on the wire and latency of gzipped dataset payloads.
+
+Builds data.world payloads of datasets with a growing number of files
+(name, source URL and description per file, like ``API._format_data``)
+and PUTs them, plain and gzipped, to a local HTTP server that reads the
+body at limited bandwidth and adds round-trip delay, i.e. a simulated
+slow link. Compression time is included in the gzip latency.
+
+Usage::
+
+    python benchmarks/gzip_payload.py [--files 10,100,500] \
+        [--bandwidth 1000] [--rtt 80] [--repeat 3]
+"""
+
+import argparse
+import json
+import threading
+import time
+import uuid
+
+import requests
+
+try:
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+except ImportError:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+
+from ckanext.datadotworld.api import gzip_body
+
+CHUNK = 4096
+
+
+def payload(files):
+    return {
+        'title': 'benchmark-dataset',
+        'description': 'Benchmark dataset',
+        'summary': 'Synthetic dataset used to measure request size. ' * 20,
+        'tags': ['benchmark', 'gzip'],
+        'license': 'Public Domain',
+        'visibility': 'OPEN',
+        'files': [{
+            'name': 'file-{0}-{1}.csv'.format(i, uuid.uuid4().hex[:8]),
+            'source': {
+                'url': 'https://ckan.example.com/dataset/{0}/resource/'
+                       '{1}/download/file-{2}.csv'.format(
+                           uuid.uuid4(), uuid.uuid4(), i),
+                'expandArchive': True
+            },
+            'description': 'Resource {0} of the benchmark dataset with a '
+                           'description that is truncated to 120 '
+                           'characters by the extension.'.format(i)[:120]
+        } for i in range(files)]
+    }
+
+
+def make_handler(bandwidth, rtt):
+    """Handler reading body at `bandwidth` kbit/s with `rtt` ms delay.
+    """
+    bytes_per_second = bandwidth * 1000 / 8.0
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_PUT(self):
+            time.sleep(rtt / 2000.0)
+            remaining = int(self.headers.get('Content-Length', 0))
+            while remaining:
+                chunk = self.rfile.read(min(CHUNK, remaining))
+                remaining -= len(chunk)
+                time.sleep(len(chunk) / bytes_per_second)
+            time.sleep(rtt / 2000.0)
+            self.send_response(200)
+            self.send_header('Content-Length', '2')
+            self.end_headers()
+            self.wfile.write(b'{}')
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+
+def measure(url, data, compress, repeat):
+    body = json.dumps(data)
+    timings = []
+    for _ in range(repeat):
+        started = time.time()
+        headers = {'Content-type': 'application/json'}
+        sent = body
+        if compress:
+            sent = gzip_body(body)
+            headers['Content-Encoding'] = 'gzip'
+        requests.put(url, data=sent, headers=headers)
+        timings.append(time.time() - started)
+    return len(sent), min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--files', default='10,100,500')
+    parser.add_argument('--bandwidth', type=int, default=1000,
+                        help='Upload bandwidth, kbit/s.')
+    parser.add_argument('--rtt', type=int, default=80,
+                        help='Round-trip time, ms.')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    server = HTTPServer(
+        ('127.0.0.1', 0), make_handler(args.bandwidth, args.rtt))
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    url = 'http://127.0.0.1:{0}/'.format(server.server_address[1])
+
+    print('{0:>6}{1:>12}{2:>12}{3:>8}{4:>12}{5:>12}'.format(
+        'files', 'plain, B', 'gzip, B', 'ratio', 'plain, ms', 'gzip, ms'))
+    try:
+        for files in [int(amount) for amount in args.files.split(',')]:
+            data = payload(files)
+            plain_size, plain_time = measure(url, data, False, args.repeat)
+            gzip_size, gzip_time = measure(url, data, True, args.repeat)
+            print('{0:>6}{1:>12}{2:>12}{3:>8.2f}{4:>12.0f}{5:>12.0f}'.format(
+                files, plain_size, gzip_size,
+                float(plain_size) / gzip_size,
+                plain_time * 1000, gzip_time * 1000))
+    finally:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
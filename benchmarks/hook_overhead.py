@@ -0,0 +1,225 @@
+# Copyright 2017 data.world, inc
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""Load-test harness for IPackageController hooks of the plugin.
+
+Drives synthetic package events through ``after_create``,
+``after_update`` and ``after_delete`` with every queue backend replaced by
+a local stand-in (nothing is sent to Redis/RabbitMQ and nothing is
+written to the outbox table) and reports per-call latency percentiles and
+memory retained per call. Every event is committed, so the latency covers
+the jobs dispatched after the commit as well. A temporary organization with enabled
+integration is created in the configured database and removed afterwards.
+
+Usage::
+
+    python benchmarks/hook_overhead.py -c test.ini [--events 100000] \
+        [--backends rq,celery,outbox]
+"""
+
+import argparse
+import gc
+import os
+import sys
+import types
+import uuid
+from timeit import default_timer as timer
+
+BACKENDS = ('rq', 'celery', 'outbox')
+
+
+class Sink(object):
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, *args, **kwargs):
+        self.count += 1
+        return self
+
+
+class FakeCelery(object):
+    def __init__(self, sink):
+        self.send_task = sink
+
+
+class FakeEngine(object):
+    def __init__(self, sink):
+        self.sink = sink
+
+    def execute(self, *args, **kwargs):
+        return self.sink()
+
+
+def install(backend, sink):
+    """Replace queue backend with sink. Returns function restoring it.
+    """
+    from pylons import config
+    from ckanext.datadotworld import outbox
+
+    saved_modules = dict(
+        (name, sys.modules.get(name))
+        for name in ('ckan.lib.jobs', 'ckan.lib.celery_app'))
+    saved_queue = config.get('ckan.datadotworld.queue')
+    saved_engine = outbox._engine
+
+    if backend == 'rq':
+        jobs = types.ModuleType('ckan.lib.jobs')
+        jobs.enqueue = sink
+        sys.modules['ckan.lib.jobs'] = jobs
+    elif backend == 'celery':
+        sys.modules['ckan.lib.jobs'] = None
+        celery_app = types.ModuleType('ckan.lib.celery_app')
+        celery_app.celery = FakeCelery(sink)
+        sys.modules['ckan.lib.celery_app'] = celery_app
+    elif backend == 'outbox':
+        config['ckan.datadotworld.queue'] = 'outbox'
+        outbox._engine = lambda: FakeEngine(sink)
+
+    def restore():
+        for name, module in saved_modules.items():
+            if module is None:
+                sys.modules.pop(name, None)
+            else:
+                sys.modules[name] = module
+        if saved_queue is None:
+            config.pop('ckan.datadotworld.queue', None)
+        else:
+            config['ckan.datadotworld.queue'] = saved_queue
+        outbox._engine = saved_engine
+    return restore
+
+
+def create_org():
+    import ckan.model as model
+    from ckanext.datadotworld.model.credentials import Credentials
+
+    org = model.Group(
+        name=u'dw-hooks-' + uuid.uuid4().hex[:10], is_organization=True,
+        type=u'organization')
+    model.Session.add(org)
+    model.Session.flush()
+    model.Session.add(Credentials(
+        organization_id=org.id, integration=True, owner=u'bench',
+        key=u'bench'))
+    model.Session.commit()
+    return org.id
+
+
+def drop_org(org_id):
+    import ckan.model as model
+    from ckanext.datadotworld.model.credentials import Credentials
+
+    model.Session.query(Credentials).filter_by(
+        organization_id=org_id).delete()
+    model.Session.query(model.Group).filter_by(id=org_id).delete()
+    model.Session.commit()
+
+
+def events(amount, org_id):
+    """Mix of 10% creates, 80% updates and 10% deletes.
+    """
+    for i in range(amount):
+        hook = 'after_update'
+        if i % 10 == 0:
+            hook = 'after_create'
+        elif i % 10 == 9:
+            hook = 'after_delete'
+        yield hook, {
+            'id': str(uuid.uuid4()),
+            'name': 'dataset-{0}'.format(i),
+            'title': 'Dataset {0}'.format(i),
+            'owner_org': org_id,
+            'type': 'dataset',
+            'notes': 'Synthetic dataset',
+            'tags': [{'name': 'bench'}],
+            'resources': [],
+        }
+
+
+def percentile(values, pct):
+    return values[min(int(len(values) * pct / 100.0), len(values) - 1)]
+
+
+def run(backend, amount, org_id):
+    import ckan.model as model
+    from ckanext.datadotworld.plugin import DatadotworldPlugin
+
+    plugin = DatadotworldPlugin()
+    sink = Sink()
+    restore = install(backend, sink)
+    latencies = []
+    try:
+        try:
+            import tracemalloc
+            tracemalloc.start()
+        except ImportError:
+            tracemalloc = None
+        gc.collect()
+        objects_before = len(gc.get_objects())
+        for hook, data_dict in events(amount, org_id):
+            started = timer()
+            getattr(plugin, hook)({}, data_dict)
+            model.Session.commit()
+            latencies.append(timer() - started)
+        model.Session.remove()
+        gc.collect()
+        retained = len(gc.get_objects()) - objects_before
+        peak = None
+        if tracemalloc is not None:
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+    finally:
+        restore()
+    latencies.sort()
+    return {
+        'backend': backend,
+        'enqueued': sink.count,
+        'p50': percentile(latencies, 50) * 1000,
+        'p90': percentile(latencies, 90) * 1000,
+        'p99': percentile(latencies, 99) * 1000,
+        'max': latencies[-1] * 1000,
+        'retained': float(retained) / amount,
+        'peak': peak,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('-c', '--config', required=True)
+    parser.add_argument('--events', type=int, default=100000)
+    parser.add_argument('--backends', default=','.join(BACKENDS))
+    args = parser.parse_args()
+
+    from ckanext.datadotworld.api import load_config
+    load_config(os.path.abspath(args.config))
+
+    org_id = create_org()
+    try:
+        print('{0:8} {1:>9} {2:>9} {3:>9} {4:>9} {5:>9} {6:>14} {7:>12}'.format(
+            'backend', 'calls', 'p50, ms', 'p90, ms', 'p99, ms', 'max, ms',
+            'objects/call', 'peak, KB'))
+        for backend in args.backends.split(','):
+            result = run(backend, args.events, org_id)
+            print(
+                '{backend:8} {enqueued:9d} {p50:9.3f} {p90:9.3f} {p99:9.3f} '
+                '{max:9.3f} {retained:14.3f} {peak:>12}'.format(**dict(
+                    result, peak=result['peak'] // 1024
+                    if result['peak'] is not None else '-')))
+    finally:
+        drop_org(org_id)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+# Copyright 2017 data.world, inc
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""Measure cold import time of extension modules.
+
+Every module is imported in a fresh interpreter, so the numbers include
+everything the module pulls in (CKAN, pylons, celery, ...), which is what
+web processes and cold workers pay on start.
+
+Usage::
+
+    python benchmarks/import_time.py [--repeat N] [module ...]
+"""
+
+import argparse
+import json
+import subprocess
+import sys
+
+MODULES = (
+    'ckanext.datadotworld.plugin',
+    'ckanext.datadotworld.api',
+    'ckanext.datadotworld.tasks',
+)
+
+PROBE = '''
+import json, sys, time
+before = set(sys.modules)
+started = time.time()
+__import__({module!r})
+elapsed = time.time() - started
+print(json.dumps({{
+    "seconds": elapsed,
+    "modules": len(set(sys.modules) - before),
+    "celery": "celery" in sys.modules,
+    "markdown": "markdown" in sys.modules,
+    "bleach": "bleach" in sys.modules,
+}}))
+'''
+
+
+def measure(module, repeat):
+    runs = []
+    for _ in range(repeat):
+        out = subprocess.check_output(
+            [sys.executable, '-c', PROBE.format(module=module)])
+        runs.append(json.loads(out.decode('utf-8').strip().splitlines()[-1]))
+    runs.sort(key=lambda run: run['seconds'])
+    return runs[len(runs) // 2]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('modules', nargs='*', default=MODULES)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    print('{0:35} {1:>9} {2:>8}  {3}'.format(
+        'module', 'median, s', 'modules', 'heavy deps loaded'))
+    for module in args.modules:
+        run = measure(module, args.repeat)
+        heavy = [
+            name for name in ('celery', 'markdown', 'bleach') if run[name]
+        ]
+        print('{0:35} {1:9.3f} {2:8d}  {3}'.format(
+            module, run['seconds'], run['modules'],
+            ', '.join(heavy) or '-'))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,147 @@
+# Copyright 2017 data.world, inc
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""Memory usage of organization-wide operations.
+
+Creates synthetic organizations of growing size directly in the database
+configured by the given ini file (use a throwaway database!), then runs
+what happens when data.world credentials are saved: the "mark as pending"
+update and a bootstrap run, whose pages are executed in-process with
+requests to data.world stubbed out. RSS growth is reported for every
+size: flat numbers mean memory usage does not depend on org size.
+
+Usage::
+
+    python benchmarks/org_memory.py -c test.ini [--sizes 1000,10000,50000]
+"""
+
+import argparse
+import gc
+import os
+import resource
+import uuid
+
+
+def rss_kb():
+    try:
+        with open('/proc/self/statm') as statm:
+            pages = int(statm.read().split()[1])
+        return pages * resource.getpagesize() // 1024
+    except IOError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def create_org(size):
+    import ckan.model as model
+    from ckanext.datadotworld.model.credentials import Credentials
+    from ckanext.datadotworld.model.extras import Extras
+
+    org = model.Group(
+        name=u'dw-bench-' + uuid.uuid4().hex[:10], is_organization=True,
+        type=u'organization')
+    model.Session.add(org)
+    model.Session.flush()
+    model.Session.add(Credentials(
+        organization_id=org.id, integration=True, owner=u'bench',
+        key=u'bench'))
+    model.Session.commit()
+
+    engine = model.meta.engine
+    for start in range(0, size, 5000):
+        packages, extras = [], []
+        for i in range(start, min(start + 5000, size)):
+            pkg_id = unicode(uuid.uuid4())
+            packages.append(dict(
+                id=pkg_id, name=u'{0}-{1}'.format(org.name, i),
+                owner_org=org.id, state=u'active', type=u'dataset',
+                private=False))
+            extras.append(dict(
+                package_id=pkg_id, owner=u'bench', id=pkg_id,
+                state=u'up-to-date'))
+        engine.execute(model.Package.__table__.insert(), packages)
+        engine.execute(Extras.__table__.insert(), extras)
+    return org.id
+
+
+def drop_org(org_id):
+    import ckan.model as model
+    from ckanext.datadotworld.model.credentials import Credentials
+    from ckanext.datadotworld.model.extras import Extras
+    from ckanext.datadotworld.model.bootstrap import Bootstrap
+
+    engine = model.meta.engine
+    engine.execute(Bootstrap.__table__.delete().where(
+        Bootstrap.__table__.c.organization_id == org_id))
+    packages = model.Package.__table__
+    ids = packages.select().with_only_columns(
+        [packages.c.id]).where(packages.c.owner_org == org_id)
+    engine.execute(Extras.__table__.delete().where(
+        Extras.__table__.c.package_id.in_(ids)))
+    engine.execute(packages.delete().where(packages.c.owner_org == org_id))
+    engine.execute(Credentials.__table__.delete().where(
+        Credentials.__table__.c.organization_id == org_id))
+    engine.execute(model.Group.__table__.delete().where(
+        model.Group.__table__.c.id == org_id))
+
+
+def measure(org_id):
+    import ckan.model as model
+    import ckanext.datadotworld.bootstrap as bootstrap
+    from ckanext.datadotworld.controller.datadotworld import (
+        mark_org_pending
+    )
+
+    enqueued = []
+    bootstrap.api.compat_enqueue = \
+        lambda name, fn, args=None, owner=None: enqueued.append(args)
+    bootstrap.api.notify = lambda pkg_id, attempt=0: True
+
+    gc.collect()
+    before = rss_kb()
+    mark_org_pending(org_id)
+    model.Session.commit()
+    bootstrap.start(org_id)
+    pages = 0
+    while enqueued:
+        run_id, cursor, ckan_ini_filepath = enqueued.pop()[:3]
+        bootstrap.syncronize_bootstrap(run_id, cursor, ckan_ini_filepath)
+        pages += 1
+    after = rss_kb()
+    model.Session.remove()
+    return after - before, pages
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('-c', '--config', required=True)
+    parser.add_argument('--sizes', default='1000,10000,50000')
+    args = parser.parse_args()
+
+    from ckanext.datadotworld.api import load_config
+    load_config(os.path.abspath(args.config))
+
+    print('{0:>8} {1:>14} {2:>10}'.format(
+        'packages', 'RSS growth, KB', 'pages'))
+    for size in [int(size) for size in args.sizes.split(',')]:
+        org_id = create_org(size)
+        try:
+            growth, jobs = measure(org_id)
+        finally:
+            drop_org(org_id)
+        print('{0:8d} {1:14d} {2:10d}'.format(size, growth, jobs))
+
+
+if __name__ == '__main__':
+    main()
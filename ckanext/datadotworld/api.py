@@ -12,28 +12,31 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import gzip
+import hashlib
+import io
 import json
 import os.path
 import logging
 import time
+from contextlib import contextmanager
 
 import requests
-from bleach import clean
-from markdown import markdown
-from webhelpers.text import truncate
 
 import ckan.model as model
 from ckan.logic import get_action
 from ckan.lib.munge import munge_name
 
-from ckanext.datadotworld.model import States
+from ckanext.datadotworld.model import States, CredentialsHealth
 from ckanext.datadotworld.model.extras import Extras
 from ckanext.datadotworld import __version__
+from ckanext.datadotworld import (
+    batch, breaker, options, outbox, pacing, remote, retry, sync_log, timing
+)
+from ckanext.datadotworld.model.credentials import Credentials
 from pylons import config
 import re
-from ckan.lib.helpers import url_for
-from ckan.lib.helpers import date_str_to_datetime
-from ckan.lib.helpers import render_datetime
+from datetime import datetime
 
 log = logging.getLogger(__name__)
 licenses = {
@@ -48,10 +51,15 @@ licenses = {
     # 'CC BY-NC-SA',
 }
 
-def compat_enqueue(name, fn, args=None):
+def compat_enqueue(name, fn, args=None, owner=None):
     u'''
-    Enqueue a background job using Celery or RQ.
+    Enqueue a background job using outbox table, Celery or RQ.
     '''
+    if outbox.is_enabled():
+        if owner is None and fn is syncronize:
+            owner = _owner_of(args[0])
+        outbox.put(fn, args, owner)
+        return
     try:
         # Try to use RQ
         from ckan.lib.jobs import enqueue
@@ -61,14 +69,32 @@ def compat_enqueue(name, fn, args=None):
         from ckan.lib.celery_app import celery
         celery.send_task(name, args=args)
 
+_loaded_config = None
+_ini_filepaths = {}
+
+
+def ckan_ini_filepath():
+    """Absolute path of current config file, resolved once per process.
+    """
+    source = config['__file__']
+    if source not in _ini_filepaths:
+        _ini_filepaths[source] = os.path.abspath(source)
+    return _ini_filepaths[source]
+
+
 def load_config(ckan_ini_filepath):
+    global _loaded_config
     import os
     import paste.deploy
     config_abs_path = os.path.abspath(ckan_ini_filepath)
+    if _loaded_config == config_abs_path:
+        # environment is already loaded in this process (standalone worker)
+        return
     conf = paste.deploy.appconfig('config:' + config_abs_path)
     import ckan
     ckan.config.environment.load_environment(conf.global_conf,
                                              conf.local_conf)
+    _loaded_config = config_abs_path
 
 
 def register_translator():
@@ -88,10 +114,44 @@ def register_translator():
         translator_obj = MockTranslator()
         registry.register(translator, translator_obj)
         
-def syncronize(id, ckan_ini_filepath, attempt=0):
+def syncronize(id, ckan_ini_filepath, attempt=0, enqueued_at=None):
+    with timing.SyncJob(id, attempt, enqueued_at):
+        with timing.phase('config'):
+            load_config(ckan_ini_filepath)
+            register_translator()
+        notify(id, attempt)
+
+
+def syncronize_many(ids, ckan_ini_filepath, enqueued_at=None,
+                    visibility_only=False):
+    load_config(ckan_ini_filepath)
+    register_translator()
+    with batch.CommitBatch() as unit:
+        for id in ids:
+            try:
+                with timing.SyncJob(id, 0, enqueued_at):
+                    if visibility_only:
+                        notify_visibility(id)
+                    else:
+                        notify(id)
+            except Exception as e:
+                log.error('[{0}] Sync problem: {1}'.format(id, e))
+                unit.flush()
+
+
+def syncronize_files(operations, ckan_ini_filepath, enqueued_at=None):
+    """Push file-level changes: list of (pkg_id, res_id, op, old_name).
+    """
     load_config(ckan_ini_filepath)
     register_translator()
-    notify(id, attempt)
+    with batch.CommitBatch() as unit:
+        for pkg_id, res_id, operation, old_name in operations:
+            try:
+                with timing.SyncJob(pkg_id, 0, enqueued_at):
+                    notify_file(pkg_id, res_id, operation, old_name)
+            except Exception as e:
+                log.error('[{0}] File sync problem: {1}'.format(pkg_id, e))
+                unit.flush()
 
 
 def get_context():
@@ -126,8 +186,102 @@ def _get_creds_if_must_sync(pkg_dict):
     return credentials
 
 
+def payload_fingerprint(pkg_dict):
+    """Hash of the package fields that end up in data.world payload.
+
+    Footnote is left out on purpose: it depends only on metadata_modified,
+    which changes on every edit.
+    """
+    projection = dict(
+        owner_org=pkg_dict.get('owner_org'),
+        state=pkg_dict.get('state'),
+        title=pkg_dict.get('name'),
+        description=pkg_dict.get('title'),
+        summary=pkg_dict.get('notes') or '',
+        tags=sorted(datadotworld_tags_name_normalize(
+            pkg_dict.get('tags') or [])),
+        license=licenses.get(pkg_dict.get('license_id'), 'Other'),
+        visibility='PRIVATE' if pkg_dict.get('private') else 'OPEN',
+        files=[
+            _prepare_resource_url(res)
+            for res in pkg_dict.get('resources') or []
+        ]
+    )
+    return hashlib.sha1(
+        json.dumps(projection, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def is_sync_required(pkg_dict):
+    """Cheap in-process check whether package change must be pushed.
+    """
+    if pkg_dict.get('type', 'dataset') != 'dataset':
+        return False
+    if not _get_creds_if_must_sync(pkg_dict):
+        return False
+    extras = model.Session.query(Extras).get(pkg_dict['id'])
+    if extras is None or extras.state != States.uptodate:
+        return True
+    try:
+        # hooks get validated data_dict, while stored fingerprint is taken
+        # from package_show output that sync pushes
+        pkg_dict = _package_show(pkg_dict['id'])
+        return extras.fingerprint != payload_fingerprint(pkg_dict)
+    except Exception as e:
+        log.warn('[{0}] Unable to fingerprint package: {1}'.format(
+            pkg_dict['id'], e))
+        return True
+
+
+def _owner_of(pkg_id):
+    row = model.Session.query(Credentials.owner).join(
+        model.Package, model.Package.owner_org == Credentials.organization_id
+    ).filter(model.Package.id == pkg_id).first()
+    return row.owner if row else None
+
+
+def _owners_of(pkg_ids):
+    """Map every package id to data.world owner (None without creds).
+    """
+    owners = dict.fromkeys(pkg_ids)
+    if owners:
+        rows = model.Session.query(model.Package.id, Credentials.owner).join(
+            Credentials,
+            model.Package.owner_org == Credentials.organization_id
+        ).filter(model.Package.id.in_(list(owners)))
+        owners.update(rows)
+    return owners
+
+
+def _package_show(pkg_id):
+    with timing.phase('package_show'):
+        return get_action('package_show')(get_context(), {'id': pkg_id})
+
+
+def _defer(pkg_id, owner=None):
+    """Leave package pending while data.world is unavailable.
+
+    Packages that were never synced get pending extras, so
+    ``push_pending`` can find them later.
+    """
+    timing.set_outcome('deferred', owner)
+    extras = model.Session.query(Extras).get(pkg_id)
+    if extras is None:
+        extras = Extras(
+            package_id=pkg_id, owner=owner, state=States.pending)
+        model.Session.add(extras)
+        batch.commit(extras)
+    elif extras.state != States.pending:
+        extras.state = States.pending
+        batch.commit(extras)
+    log.info('[{0}] Circuit open, sync deferred'.format(pkg_id))
+
+
 def notify(pkg_id, attempt=0):
-    pkg_dict = get_action('package_show')(get_context(), {'id': pkg_id})
+    owner = _owner_of(pkg_id)
+    if owner and not breaker.allow(owner):
+        _defer(pkg_id, owner)
+        return False
+    pkg_dict = _package_show(pkg_id)
     if pkg_dict.get('type', 'dataset') != 'dataset':
         return False
     credentials = _get_creds_if_must_sync(pkg_dict)
@@ -140,6 +294,72 @@ def notify(pkg_id, attempt=0):
     return True
 
 
+def notify_visibility(pkg_id):
+    """Lightweight variant of `notify` for visibility-only changes.
+    """
+    owner = _owner_of(pkg_id)
+    if owner and not breaker.allow(owner):
+        _defer(pkg_id, owner)
+        return False
+    entity = model.Package.get(pkg_id)
+    if entity is None or entity.type != 'dataset':
+        return False
+    if entity.state == 'draft':
+        return False
+    credentials = _get_creds_if_must_sync({'owner_org': entity.owner_org})
+    if not credentials:
+        return False
+    api = API(credentials.owner, credentials.key)
+    api.sync_visibility(entity)
+    return True
+
+
+def file_sync_mode(pkg_id):
+    """How resource change must be pushed: 'file', 'package' or None.
+
+    Only packages that are in sync with data.world can be updated file by
+    file, the rest needs full sync.
+    """
+    entity = model.Package.get(pkg_id)
+    if entity is None or entity.type != 'dataset':
+        return None
+    if entity.state != 'active':
+        return None
+    if not _get_creds_if_must_sync({'owner_org': entity.owner_org}):
+        return None
+    extras = entity.datadotworld_extras
+    if extras and extras.id and extras.state == States.uptodate:
+        return 'file'
+    return 'package'
+
+
+def notify_file(pkg_id, res_id, operation, old_name=None):
+    owner = _owner_of(pkg_id)
+    if owner and not breaker.allow(owner):
+        _defer(pkg_id, owner)
+        return False
+    pkg_dict = _package_show(pkg_id)
+    if pkg_dict.get('type', 'dataset') != 'dataset':
+        return False
+    credentials = _get_creds_if_must_sync(pkg_dict)
+    if not credentials:
+        return False
+    if pkg_dict.get('state') == 'draft':
+        return False
+    api = API(credentials.owner, credentials.key)
+    if file_sync_mode(pkg_id) == 'file':
+        api.sync_file(pkg_dict, res_id, operation, old_name)
+    else:
+        api.sync(pkg_dict)
+    return True
+
+
+def resource_file_name(res):
+    """Name of the file that represents resource on data.world.
+    """
+    return _prepare_resource_url(res)['name']
+
+
 def _prepare_resource_url(res):
     """Convert list of resources to files_list for data.world.
     """
@@ -166,23 +386,15 @@ def _prepare_resource_url(res):
     description = res.get('description', '')
 
     if description:
-
+        from webhelpers.text import truncate
         prepared_data['description'] = truncate(
             description, 120, whole_word=True)
 
     return prepared_data
 
-def _delay_request():
-    request_delay = config.get(
-        'ckan.datadotworld.request_delay', 1)
-    try:
-        request_delay = float(request_delay)
-    except Exception as e:
-        return False
-    if (request_delay > 0):
-        time.sleep(request_delay)
-
-    return True
+def _delay_request(owner):
+    with timing.phase('wait'):
+        return pacing.pause(owner)
 
 
 def _repeat_request(pkg_id, attempt):
@@ -197,13 +409,16 @@ def _repeat_request(pkg_id, attempt):
     if attempt > max_attempt:
         log.info('Max request attempt ({0}) achieved for {1}.'.format(max_attempt, pkg_id))
         return
-    ckan_ini_filepath = os.path.abspath(config['__file__'])
     compat_enqueue(
         'datadotworld.syncronize',
         syncronize,
-        args=[pkg_id, ckan_ini_filepath, attempt])
+        args=[pkg_id, ckan_ini_filepath(), attempt, timing.now()])
 
 def dataset_footnote(pkg_dict):
+    # ckan.lib.helpers is expensive to import and used only here
+    from ckan.lib.helpers import (
+        url_for, date_str_to_datetime, render_datetime
+    )
     dataset_url = url_for(controller='package', action='read', id=pkg_dict.get('id'), qualified=True)
     source_str = 'Source: {0}'.format(dataset_url)
     dataset_date = date_str_to_datetime(pkg_dict.get('metadata_modified'))
@@ -213,15 +428,54 @@ def dataset_footnote(pkg_dict):
     return '\n\n{0}  \r\n{1}'.format(source_str, date_str)
 
 
+_credentials_cache = {}
+
+
+def _credentials_cache_key(owner, key):
+    return hashlib.sha256(
+        u'{0}:{1}'.format(owner, key).encode('utf-8')).hexdigest()
+
+
+ENCODING_HINTS = ('gzip', 'encoding', 'compress')
+_gzip_state = {'rejected': False}
+
+
+def gzip_threshold():
+    """Minimal size (bytes) of request body to compress, 0 disables.
+    """
+    return options.int_option('gzip_threshold', 0)
+
+
+def _gzip_enabled(size):
+    threshold = gzip_threshold()
+    return bool(threshold) and size >= threshold and \
+        not _gzip_state['rejected']
+
+
+def is_gzip_rejected(res):
+    """Whether response rejects compression rather than the payload.
+
+    data.world answers 400 for payload validation errors too, so 400 counts
+    only when its body is about encoding.
+    """
+    if res.status_code == 415:
+        return True
+    if res.status_code != 400:
+        return False
+    content = res.content or ''
+    if isinstance(content, bytes):
+        content = content.decode('utf-8', 'replace')
+    content = content.lower()
+    return any(hint in content for hint in ENCODING_HINTS)
 
-def dataset_footnote(pkg_dict):
-    dataset_url = url_for(controller='package', action='read', id=pkg_dict.get('id'), qualified=True)
-    source_str = 'Source: {0}'.format(dataset_url)
-    dataset_date = date_str_to_datetime(pkg_dict.get('metadata_modified'))
-    date_str = 'Last updated at {0} : {1}'.format(
-        url_for(controller='home', action='index', qualified=True), 
-        render_datetime(dataset_date, '%Y-%m-%d'))
-    return '\n\n{0}  \r\n{1}'.format(source_str, date_str)
+
+def gzip_body(body):
+    if not isinstance(body, bytes):
+        body = body.encode('utf-8')
+    buf = io.BytesIO()
+    with gzip.GzipFile(fileobj=buf, mode='wb', compresslevel=6) as stream:
+        stream.write(body)
+    return buf.getvalue()
 
 
 class API:
@@ -262,6 +516,8 @@ class API:
         """
         self.owner = owner
         self.key = key
+        self.last_status_code = None
+        self.last_response = None
 
     def _default_headers(self):
         return {
@@ -270,29 +526,81 @@ class API:
             'User-Agent': self.user_agent_header
         }
 
+    def _track(self, method, record=True, **kwargs):
+        """Send request and register its outcome in circuit breaker.
+
+        With `record=False` caller registers the outcome by `_record`.
+        """
+        phase = 'dirty_check' if method is requests.get else 'write'
+        try:
+            with timing.phase(phase):
+                res = method(**kwargs)
+        except requests.RequestException:
+            breaker.record(self.owner, None)
+            raise
+        if record:
+            self._record(res)
+        return res
+
+    def _record(self, res):
+        breaker.record(self.owner, res.status_code)
+        pacing.observe(self.owner, res.status_code)
+        self.last_status_code = res.status_code
+
     def _get(self, url):
         """Simple wrapper around GET request.
         """
         headers = self._default_headers()
-        return requests.get(url=url, headers=headers)
+        return self._track(requests.get, url=url, headers=headers)
+
+    def _send(self, method, url, data):
+        """Send JSON body, gzipped when it is larger than `gzip_threshold`.
+
+        Compressed request rejected because of its encoding (see
+        `is_gzip_rejected`) is repeated uncompressed; if that one passes,
+        compression is turned off for the process. The rejected attempt is
+        not registered in circuit breaker.
+        """
+        headers = self._default_headers()
+        body = json.dumps(data)
+        if not _gzip_enabled(len(body)):
+            return self._track(method, url=url, data=body, headers=headers)
+
+        compressed = dict(headers)
+        compressed['Content-Encoding'] = 'gzip'
+        res = self._track(
+            method, record=False, url=url, data=gzip_body(body),
+            headers=compressed)
+        if not is_gzip_rejected(res):
+            self._record(res)
+            return res
+        _delay_request(self.owner)
+        res = self._track(method, url=url, data=body, headers=headers)
+        if res.status_code < 400:
+            log.warn('Compressed requests are rejected by data.world, '
+                     'sending them uncompressed from now on')
+            _gzip_state['rejected'] = True
+        return res
 
     def _post(self, url, data):
         """Simple wrapper around POST request.
         """
-        headers = self._default_headers()
-        return requests.post(url=url, data=json.dumps(data), headers=headers)
+        return self._send(requests.post, url, data)
 
     def _put(self, url, data):
         """Simple wrapper around PUT request.
         """
-        headers = self._default_headers()
-        return requests.put(url=url, data=json.dumps(data), headers=headers)
+        return self._send(requests.put, url, data)
+
+    def _patch(self, url, data):
+        """Simple wrapper around PATCH request.
+        """
+        return self._send(requests.patch, url, data)
 
     def _delete(self, url, data):
         """Simple wrapper around DELETE request.
         """
-        headers = self._default_headers()
-        return requests.delete(url=url, data=json.dumps(data), headers=headers)
+        return self._send(requests.delete, url, data)
 
     def _format_data(self, pkg_dict):
         notes = pkg_dict.get('notes') or ''
@@ -329,7 +637,7 @@ class API:
             log.warn(
                 '[{0}] Create package: {1}'.format(id, res.content))
 
-        _delay_request()
+        _delay_request(self.owner)
 
         return res
 
@@ -342,7 +650,7 @@ class API:
             log.warn(
                 '[{0}] Update package: {1}'.format(id, res.content))
         
-        _delay_request()
+        _delay_request(self.owner)
         
         return res
 
@@ -355,26 +663,32 @@ class API:
             log.warn(
                 '[{0}] Delete package: {1}'.format(id, res.content))
 
-        _delay_request()
+        _delay_request(self.owner)
 
         return res
 
     def _is_update_required(self, data, id):
+        remote_data = remote.metadata(self.owner, id)
+        if remote_data is not None:
+            return self._is_dict_changed(data, remote_data)
         url = self.api_update.format(owner=self.owner, name=id)
         remote_res = self._get(url)
         if remote_res.status_code != 200:
+            if remote_res.status_code == 404:
+                remote.remove(self.owner, id)
             log.warn(
                 '[{0}] Unable to get package for dirty check:{1}'.format(
                     id, remote_res.content))
         else:
             remote_data = remote_res.json()
+            remote.add(self.owner, id)
             if not self._is_dict_changed(data, remote_data):
                 return False
         return True
 
     def _create(self, data, extras, attempt=0):
         res = self._create_request(data, extras.id)
-        extras.message = res.content
+        self.last_response = res
         if res.status_code == 200:
             resp_json = res.json()
             if 'uri' in resp_json:
@@ -382,6 +696,7 @@ class API:
                 extras.id = new_id
 
             extras.state = States.uptodate
+            remote.add(self.owner, extras.id)
         elif res.status_code == 429:
             log.error('[{0}] Create package error (too many connections)'.format(
                 extras.id))
@@ -398,13 +713,15 @@ class API:
             return data
 
         res = self._update_request(data, extras.id)
-        extras.message = res.content
+        self.last_response = res
 
         if res.status_code == 200:
             extras.state = States.uptodate
+            remote.add(self.owner, extras.id)
         elif res.status_code == 404:
             log.warn('[{0}] Package not exists. Creating...'.format(
                 extras.id))
+            remote.remove(self.owner, extras.id)
             res = self._create(data, extras)
         elif res.status_code == 429:
             log.error('[{0}] Update package error (too many connections)'.format(
@@ -418,10 +735,12 @@ class API:
 
     def _delete_dataset(self, data, extras, attempt=0):
         res = self._delete_request(data, extras.id)
-        extras.message = res.content
+        self.last_response = res
         if res.status_code in (200, 404):
+            remote.remove(self.owner, extras.id)
             query = model.Session.query(Extras).filter(Extras.id == extras.id)
             query.delete()
+            batch.discard(extras)
             log.info('[{0}] deleted from datadotworld_extras table'.format(
                 extras.id))
         elif res.status_code == 429:
@@ -434,10 +753,54 @@ class API:
                 extras.id, res.content))
         return data
 
+    def _append_log(self, extras, package_id):
+        """Write result of the last request into sync history.
+
+        `extras` is None when package was removed from data.world.
+        """
+        res = self.last_response
+        self.last_response = None
+        if res is None:
+            return
+        if extras is not None:
+            retry.settle(extras, res.status_code, res.content)
+        state = extras.state if extras is not None else States.deleted
+        log_id = sync_log.append(
+            package_id, state, res.status_code, res.content)
+        if extras is not None:
+            extras.last_log_id = log_id
+
+    @contextmanager
+    def _logging_errors(self, package_id):
+        """Write requests that got no response into sync history.
+        """
+        try:
+            yield
+        except requests.RequestException as e:
+            self.last_response = None
+            sync_log.append(
+                package_id, States.failed, None,
+                u'{0}: {1}'.format(type(e).__name__, e))
+            raise
+
+    def _record_timing(self, extras, started_at, attempt):
+        job = timing.current()
+        if job is not None:
+            extras.enqueued_at = job.enqueued_at
+            started_at = job.started_at
+        extras.started_at = started_at
+        extras.finished_at = datetime.utcnow()
+        extras.duration_ms = timing.duration_ms(
+            started_at, extras.finished_at)
+        extras.attempts = attempt + 1
+        extras.last_status_code = self.last_status_code
+
     def sync(self, pkg_dict, attempt=0):
+        started_at = datetime.utcnow()
         entity = model.Package.get(pkg_dict['id'])
-        pkg_dict = get_action('package_show')(get_context(), {'id': entity.id})
-        data_dict = self._format_data(pkg_dict)
+        pkg_dict = _package_show(entity.id)
+        with timing.phase('format'):
+            data_dict = self._format_data(pkg_dict)
 
         extras = entity.datadotworld_extras
         pkg_state = pkg_dict.get('state')
@@ -445,6 +808,14 @@ class API:
             action = self._delete_dataset
         else:
             action = self._update if extras and extras.id else self._create
+            if batch.current() is not None:
+                # bulk run, one listing replaces lots of dirty checks
+                remote.prefetch(self)
+            if action == self._update and \
+                    remote.exists(self.owner, extras.id) is False:
+                log.info('[{0}] Package not exists. Creating...'.format(
+                    extras.id))
+                action = self._create
         if not extras:
             extras = Extras(
                 package=entity, owner=self.owner,
@@ -452,14 +823,132 @@ class API:
             model.Session.add(extras)
             extras.state = States.pending
 
-        try:
-            model.Session.commit()
-        except Exception as e:
-            model.Session.rollback()
-            log.error('[sync problem] {0}'.format(e))
+        if batch.current() is None:
+            try:
+                with timing.phase('commit'):
+                    model.Session.commit()
+            except Exception as e:
+                model.Session.rollback()
+                log.error('[sync problem] {0}'.format(e))
+
+        with self._logging_errors(entity.id):
+            action(data_dict, extras)
+        if extras.state == States.uptodate:
+            extras.fingerprint = payload_fingerprint(pkg_dict)
+        if action != self._delete_dataset or extras.state == States.failed:
+            self._record_timing(extras, started_at, attempt)
+            self._append_log(extras, entity.id)
+            timing.set_outcome(extras.state, self.owner)
+        else:
+            self._append_log(None, entity.id)
+            timing.set_outcome(States.deleted, self.owner)
+        batch.commit(extras)
+
+    def _file_request(self, extras, file_data=None, name=None):
+        """Add (replace) file from source or delete file by name.
+        """
+        if file_data is None:
+            url = self.api_res_delete.format(
+                owner=self.owner, name=extras.id, file=name)
+            res = self._delete(url, {})
+            operation = 'Delete'
+        else:
+            url = self.api_res_create.format(owner=self.owner, name=extras.id)
+            res = self._post(url, dict(files=[file_data]))
+            operation = 'Add'
+        if res.status_code in (200, 202):
+            log.info('[{0}] {1} file {2}: success'.format(
+                extras.id, operation, name or file_data['name']))
+        else:
+            log.warn('[{0}] {1} file: {2}'.format(
+                extras.id, operation, res.content))
+
+        _delay_request(self.owner)
+
+        return res
+
+    def sync_file(self, pkg_dict, res_id, operation, old_name=None,
+                  attempt=0):
+        """Push change of single resource without rewriting dataset.
+        """
+        started_at = datetime.utcnow()
+        extras = model.Package.get(pkg_dict['id']).datadotworld_extras
+        res_dict = next((
+            res for res in pkg_dict.get('resources') or []
+            if res['id'] == res_id), None)
+        file_data = None
+        if operation != 'delete' and res_dict is not None:
+            file_data = _prepare_resource_url(res_dict)
+
+        statuses = []
+        with self._logging_errors(pkg_dict['id']):
+            if old_name and (file_data is None or
+                             file_data['name'] != old_name):
+                res = self._file_request(extras, name=old_name)
+                # file that is already gone is as good as deleted
+                statuses.append(
+                    200 if res.status_code == 404 else res.status_code)
+            if file_data is not None:
+                res = self._file_request(extras, file_data)
+                statuses.append(res.status_code)
+        if not statuses:
+            return
+
+        self.last_response = res
+        if all(status in (200, 202) for status in statuses):
+            extras.fingerprint = payload_fingerprint(pkg_dict)
+        elif 404 in statuses:
+            log.warn('[{0}] Package not exists. Syncing...'.format(
+                extras.id))
+            return self.sync(pkg_dict, attempt)
+        elif 429 in statuses:
+            log.error('[{0}] File sync error (too many connections)'.format(
+                extras.id))
+            _repeat_request(pkg_dict['id'], attempt)
+        else:
+            extras.state = States.failed
+            log.error('[{0}] File sync error:{1}'.format(
+                extras.id, res.content))
+        self._record_timing(extras, started_at, attempt)
+        self._append_log(extras, extras.package_id)
+        timing.set_outcome(extras.state, self.owner)
+        batch.commit(extras)
 
-        action(data_dict, extras)
-        model.Session.commit()
+    def sync_visibility(self, entity, attempt=0):
+        """Push only visibility of already synced package.
+
+        Falls back to full sync when dataset was never created on
+        data.world or is not in sync with it.
+        """
+        extras = entity.datadotworld_extras
+        if not extras or not extras.id or extras.state != States.uptodate:
+            return self.sync({'id': entity.id}, attempt)
+        started_at = datetime.utcnow()
+        data = dict(visibility='PRIVATE' if entity.private else 'OPEN')
+        url = self.api_update.format(owner=self.owner, name=extras.id)
+        with self._logging_errors(entity.id):
+            res = self._patch(url, data)
+        _delay_request(self.owner)
+        self.last_response = res
+        if res.status_code == 200:
+            log.info('[{0}] Visibility updated'.format(extras.id))
+            extras.fingerprint = None
+        elif res.status_code == 404:
+            log.warn('[{0}] Package not exists. Creating...'.format(
+                extras.id))
+            return self.sync({'id': entity.id}, attempt)
+        elif res.status_code == 429:
+            log.error('[{0}] Update visibility error '
+                      '(too many connections)'.format(extras.id))
+            _repeat_request(entity.id, attempt)
+        else:
+            extras.state = States.failed
+            log.error('[{0}] Update visibility error:{1}'.format(
+                extras.id, res.content))
+        self._record_timing(extras, started_at, attempt)
+        self._append_log(extras, extras.package_id)
+        timing.set_outcome(extras.state, self.owner)
+        batch.commit(extras)
 
     def sync_resources(self, id):
         url = self.api_res_sync.format(
@@ -472,7 +961,20 @@ class API:
         )
         log.info(msg)
 
-    def check_credentials(self):
+    def credentials_health(self, cache=False):
+        """Check credentials against data.world.
+
+        Returns `valid`, `invalid` or `unknown` (data.world did not give a
+        definite answer). With `cache` enabled, definite results are
+        reused for `credentials_ttl` seconds (`invalid` ones for
+        `credentials_negative_ttl` seconds).
+        """
+        cache_key = _credentials_cache_key(self.owner, self.key)
+        if cache:
+            cached = _credentials_cache.get(cache_key)
+            if cached and cached[1] > time.time():
+                return cached[0]
+
         url = self.api_update.format(
             owner=self.owner,
             name='definitely-fake-dataset-name'
@@ -480,5 +982,16 @@ class API:
         resp = self._get(url)
 
         if resp.status_code == 401:
-            return False
-        return True
+            health, ttl = CredentialsHealth.invalid, options.float_option(
+                'credentials_negative_ttl', 60)
+        elif breaker.is_failure(resp.status_code):
+            return CredentialsHealth.unknown
+        else:
+            health, ttl = CredentialsHealth.valid, options.float_option(
+                'credentials_ttl', 300)
+        _credentials_cache[cache_key] = (health, time.time() + ttl)
+        return health
+
+    def check_credentials(self, cache=False):
+        health = self.credentials_health(cache)
+        return health != CredentialsHealth.invalid
@@ -0,0 +1,168 @@
+# Copyright 2017 data.world, inc
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""Unit of work for `Extras` changes made during bulk synchronization.
+
+Outside of a batch every change is committed immediately. Inside
+``with CommitBatch():`` changed rows are kept as snapshots and the
+transaction is rolled back right away, so no transaction (and no row
+lock) stays open while the next packages talk to data.world. Snapshots
+are written in one short transaction once per `size` packages or
+`interval` seconds. If it fails, changes are replayed and committed row
+by row so one broken row does not lose the whole batch.
+"""
+
+import logging
+import threading
+import time
+
+import ckan.model as model
+from ckanext.datadotworld.model.extras import Extras
+from ckanext.datadotworld import options, timing
+
+log = logging.getLogger(__name__)
+_local = threading.local()
+
+
+def batch_size():
+    return options.int_option('batch_size', 20, minimum=1)
+
+
+def batch_interval():
+    return options.float_option('batch_interval', 5.0)
+
+
+def current():
+    """Active batch of current thread or None.
+    """
+    return getattr(_local, 'batch', None)
+
+
+def commit(extras):
+    """Commit changes of extras now or as a part of active batch.
+    """
+    batch = current()
+    with timing.phase('commit'):
+        if batch is None:
+            model.Session.commit()
+        else:
+            batch.add(extras)
+
+
+def discard(extras):
+    """Remember that extras row was deleted within active batch.
+    """
+    batch = current()
+    if batch is not None:
+        batch.discard(extras)
+
+
+def _package_id(extras):
+    if extras.package_id is None and extras.package is not None:
+        return extras.package.id
+    return extras.package_id
+
+
+def _snapshot(extras):
+    values = dict(
+        (column.key, getattr(extras, column.key))
+        for column in Extras.__table__.columns
+        if column.key != 'modified'
+    )
+    values['package_id'] = _package_id(extras)
+    return values
+
+
+class CommitBatch(object):
+
+    def __init__(self, size=None, interval=None):
+        self.size = size or batch_size()
+        self.interval = interval if interval is not None else batch_interval()
+        self._rows = {}
+        self._deleted = set()
+        self._started = time.time()
+
+    def __enter__(self):
+        self._parent = current()
+        _local.batch = self
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        try:
+            self.flush()
+        finally:
+            _local.batch = self._parent
+
+    def __len__(self):
+        return len(self._rows) + len(self._deleted)
+
+    def _is_due(self):
+        return (len(self) >= self.size or
+                time.time() - self._started >= self.interval)
+
+    def add(self, extras):
+        package_id = _package_id(extras)
+        if package_id not in self._deleted:
+            self._rows[package_id] = _snapshot(extras)
+        model.Session.rollback()
+        if self._is_due():
+            self.flush()
+
+    def discard(self, extras):
+        package_id = _package_id(extras)
+        self._rows.pop(package_id, None)
+        self._deleted.add(package_id)
+
+    def flush(self):
+        if len(self):
+            try:
+                for _, change in self._changes():
+                    change()
+                model.Session.commit()
+            except Exception as e:
+                model.Session.rollback()
+                log.error('[batch problem] {0}. Committing row by row'.format(e))
+                self._replay()
+        self._rows = {}
+        self._deleted = set()
+        self._started = time.time()
+
+    def _changes(self):
+        """Pairs of package id and function that writes its change.
+        """
+        def delete(package_id):
+            return lambda: model.Session.query(Extras).filter(
+                Extras.package_id == package_id).delete()
+
+        def save(values):
+            return lambda: model.Session.merge(Extras(**values))
+
+        for package_id in self._deleted:
+            yield package_id, delete(package_id)
+        for package_id, values in self._rows.items():
+            yield package_id, save(values)
+
+    def _replay(self):
+        for package_id, change in self._changes():
+            self._apply(package_id, change)
+
+    def _apply(self, package_id, change):
+        try:
+            change()
+            model.Session.commit()
+        except Exception as e:
+            model.Session.rollback()
+            log.error('[{0}] Unable to save sync state: {1}'.format(
+                package_id, e))
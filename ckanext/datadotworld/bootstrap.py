@@ -0,0 +1,196 @@
+# Copyright 2017 data.world, inc
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Checkpointed synchronization of all packages of organization.
+
+Enabling integration for an organization with many datasets starts a
+bootstrap run. The run is a single chain of jobs: each job syncs one page
+of packages ordered by id, stores the last id as a checkpoint and
+enqueues the next page. A chain that was lost, for example when workers
+restarted, is continued from its checkpoint by `resume`. Checkpoints are
+moved with compare-and-set on the cursor, so when a slow chain was
+resumed while still running only one of the chains goes on.
+"""
+
+import logging
+from datetime import datetime, timedelta
+
+import ckan.model as model
+from ckanext.datadotworld.model import BootstrapStatus, States
+from ckanext.datadotworld.model.bootstrap import Bootstrap
+from ckanext.datadotworld.model.credentials import Credentials
+from ckanext.datadotworld.model.extras import Extras
+from ckanext.datadotworld import batch, options, timing
+import ckanext.datadotworld.api as api
+
+log = logging.getLogger(__name__)
+
+DEFAULT_PAGE_SIZE = 50
+DEFAULT_STALE_AFTER = 600
+
+
+def page_size():
+    return options.int_option(
+        'bootstrap_page_size', DEFAULT_PAGE_SIZE, minimum=1)
+
+
+def latest(org_id):
+    return model.Session.query(Bootstrap).filter(
+        Bootstrap.organization_id == org_id
+    ).order_by(Bootstrap.id.desc()).first()
+
+
+def _owner(org_id):
+    creds = model.Session.query(Credentials).get(org_id)
+    return creds.owner if creds else None
+
+
+def _enqueue(run, owner=None):
+    api.compat_enqueue(
+        'datadotworld.syncronize_bootstrap',
+        syncronize_bootstrap,
+        args=[run.id, run.cursor, api.ckan_ini_filepath(), timing.now()],
+        owner=owner)
+
+
+def start(org_id):
+    """Cancel unfinished runs of organization and start new one.
+    """
+    now = datetime.utcnow()
+    model.Session.query(Bootstrap).filter(
+        Bootstrap.organization_id == org_id,
+        Bootstrap.status == BootstrapStatus.running
+    ).update({'status': BootstrapStatus.cancelled, 'modified': now},
+             synchronize_session=False)
+    run = Bootstrap(
+        organization_id=org_id,
+        status=BootstrapStatus.running,
+        total=model.Session.query(model.Package.id).filter(
+            model.Package.owner_org == org_id).count(),
+        processed=0, failed=0, started=now, modified=now)
+    model.Session.add(run)
+    model.Session.commit()
+    _enqueue(run, _owner(org_id))
+    return run
+
+
+def resume(stale_after=None):
+    """Continue running chains that made no progress for `stale_after` sec.
+    """
+    if stale_after is None:
+        stale_after = options.int_option(
+            'bootstrap_stale_after', DEFAULT_STALE_AFTER, minimum=1)
+    threshold = datetime.utcnow() - timedelta(seconds=stale_after)
+    runs = model.Session.query(Bootstrap).filter(
+        Bootstrap.status == BootstrapStatus.running,
+        Bootstrap.modified < threshold
+    ).all()
+    for run in runs:
+        log.info('Resume bootstrap {0} of {1} after {2}'.format(
+            run.id, run.organization_id, run.cursor))
+        run.modified = datetime.utcnow()
+        model.Session.commit()
+        _enqueue(run, _owner(run.organization_id))
+    return runs
+
+
+def progress(run):
+    """Completion percentage, rate (packages/sec) and ETA (sec) of run.
+    """
+    if run is None:
+        return None
+    total = max(run.total or 0, run.processed or 0)
+    elapsed = ((run.finished or run.modified) - run.started).total_seconds()
+    rate = run.processed / elapsed if elapsed > 0 else None
+    eta = None
+    if run.status == BootstrapStatus.running and rate:
+        eta = int((total - run.processed) / rate)
+    return {
+        'status': run.status,
+        'processed': run.processed,
+        'failed': run.failed,
+        'total': total,
+        'percent': 100 * run.processed // total if total else 100,
+        'rate': rate,
+        'eta': eta,
+        'started': run.started,
+        'finished': run.finished
+    }
+
+
+def _next_page(org_id, cursor, size):
+    query = model.Session.query(model.Package.id).filter(
+        model.Package.owner_org == org_id)
+    if cursor is not None:
+        query = query.filter(model.Package.id > cursor)
+    return [row.id for row in query.order_by(model.Package.id).limit(size)]
+
+
+def syncronize_bootstrap(run_id, cursor, ckan_ini_filepath, enqueued_at=None):
+    """Sync next page of bootstrap run and enqueue the one after it.
+
+    Job whose `cursor` differs from the stored checkpoint belongs to the
+    chain that was already resumed and does nothing.
+    """
+    api.load_config(ckan_ini_filepath)
+    api.register_translator()
+    run = model.Session.query(Bootstrap).get(run_id)
+    if run is None or run.status != BootstrapStatus.running:
+        return
+    if run.cursor != cursor:
+        log.info('Bootstrap {0} moved past {1}, duplicate job skipped'.format(
+            run_id, cursor))
+        return
+
+    ids = _next_page(run.organization_id, cursor, page_size())
+    with batch.CommitBatch(size=len(ids) or 1) as unit:
+        for pkg_id in ids:
+            try:
+                with timing.SyncJob(pkg_id, 0, enqueued_at):
+                    api.notify(pkg_id)
+            except Exception as e:
+                log.error('[{0}] Bootstrap sync problem: {1}'.format(
+                    pkg_id, e))
+                unit.flush()
+
+    now = datetime.utcnow()
+    values = {'modified': now}
+    if ids:
+        values.update({
+            'failed': Bootstrap.failed + model.Session.query(Extras).filter(
+                Extras.package_id.in_(ids),
+                Extras.state.in_([States.failed, States.dead])
+            ).count(),
+            'processed': Bootstrap.processed + len(ids),
+            'cursor': ids[-1]
+        })
+    finished = len(ids) < page_size()
+    if finished:
+        values.update({
+            'status': BootstrapStatus.finished, 'finished': now})
+    moved = model.Session.query(Bootstrap).filter(
+        Bootstrap.id == run_id,
+        Bootstrap.status == BootstrapStatus.running,
+        Bootstrap.cursor == cursor
+    ).update(values, synchronize_session=False)
+    model.Session.commit()
+    model.Session.refresh(run)
+    if not moved:
+        log.info('Bootstrap {0} page after {1} checkpointed by another '
+                 'chain'.format(run_id, cursor))
+    elif finished:
+        log.info('Bootstrap {0} of {1} finished'.format(
+            run_id, run.organization_id))
+    else:
+        _enqueue(run, _owner(run.organization_id))
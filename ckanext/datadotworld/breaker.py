@@ -0,0 +1,155 @@
+# Copyright 2017 data.world, inc
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""Circuit breaker for data.world API.
+
+State is kept in the `datadotworld_circuit` table so that every worker
+sees the same breaker. There is one breaker per owner and one global
+breaker (scope ``*``). Consecutive 5xx/429 responses (or connection
+errors) open the breaker; after cooldown a single job is allowed to probe
+the API (half-open) and its result either closes or reopens the breaker.
+"""
+
+import logging
+from datetime import datetime, timedelta
+
+from sqlalchemy import and_, or_, select
+
+import ckan.model as model
+from ckanext.datadotworld.model.circuit import Circuit
+from ckanext.datadotworld import options
+
+log = logging.getLogger(__name__)
+
+GLOBAL = u'*'
+CLOSED = u'closed'
+OPEN = u'open'
+HALF_OPEN = u'half-open'
+
+table = Circuit.__table__
+
+
+def threshold():
+    return options.int_option('breaker_threshold', 5)
+
+
+def global_threshold():
+    return options.int_option('breaker_global_threshold', 20)
+
+
+def cooldown():
+    return options.int_option('breaker_cooldown', 60)
+
+
+def is_failure(status_code):
+    return status_code is None or status_code == 429 or status_code >= 500
+
+
+def _engine():
+    return model.meta.engine
+
+
+def _load(*scopes):
+    query = select([table]).where(table.c.scope.in_(scopes))
+    return dict((row.scope, row) for row in _engine().execute(query))
+
+
+def allow(owner):
+    """Check whether request for owner may be sent right now.
+
+    The first caller after cooldown becomes a half-open probe, others are
+    rejected until the probe records its result.
+    """
+    try:
+        rows = _load(GLOBAL, owner)
+        now = datetime.utcnow()
+        cutoff = now - timedelta(seconds=cooldown())
+        for scope in (GLOBAL, owner):
+            row = rows.get(scope)
+            if row is None or row.state == CLOSED:
+                continue
+            if row.opened_at and row.opened_at > cutoff:
+                return False
+            res = _engine().execute(table.update().where(and_(
+                table.c.scope == scope,
+                table.c.state == row.state,
+                table.c.opened_at == row.opened_at
+            )).values(state=HALF_OPEN, opened_at=now, modified=now))
+            if res.rowcount != 1:
+                return False
+            log.info('[{0}] Circuit half-open, probing'.format(scope))
+    except Exception as e:
+        log.error('[circuit problem] {0}'.format(e))
+    return True
+
+
+def _success(scope, now):
+    _engine().execute(table.update().where(and_(
+        table.c.scope == scope,
+        or_(table.c.failures > 0, table.c.state != CLOSED)
+    )).values(failures=0, state=CLOSED, opened_at=None, modified=now))
+
+
+def _failure(scope, limit, now):
+    engine = _engine()
+    res = engine.execute(table.update().where(
+        table.c.scope == scope
+    ).values(failures=table.c.failures + 1, modified=now))
+    if res.rowcount == 0:
+        engine.execute(table.insert().values(
+            scope=scope, state=CLOSED, failures=1, modified=now))
+    res = engine.execute(table.update().where(and_(
+        table.c.scope == scope,
+        or_(
+            table.c.state == HALF_OPEN,
+            and_(table.c.state == CLOSED, table.c.failures >= limit)
+        )
+    )).values(state=OPEN, opened_at=now))
+    if res.rowcount:
+        log.warn('[{0}] Circuit opened'.format(scope))
+
+
+def record(owner, status_code):
+    """Register result of request made on behalf of owner.
+    """
+    now = datetime.utcnow()
+    try:
+        if is_failure(status_code):
+            _failure(owner, threshold(), now)
+            _failure(GLOBAL, global_threshold(), now)
+        else:
+            _success(owner, now)
+            _success(GLOBAL, now)
+    except Exception as e:
+        log.error('[circuit problem] {0}'.format(e))
+
+
+def status(owner):
+    """Breaker state of owner and global breaker for settings page.
+    """
+    try:
+        rows = _load(GLOBAL, owner)
+    except Exception as e:
+        log.error('[circuit problem] {0}'.format(e))
+        rows = {}
+    result = {}
+    for key, scope in (('owner', owner), ('global', GLOBAL)):
+        row = rows.get(scope)
+        result[key] = {
+            'state': row.state if row else CLOSED,
+            'failures': row.failures if row else 0,
+            'opened_at': row.opened_at if row else None
+        }
+    return result
@@ -15,15 +15,23 @@
 from ckan.lib.cli import CkanCommand
 from pylons import config
 import ckan.model as model
-from ckanext.datadotworld.model.extras import Extras
 from ckanext.datadotworld.api import API
-from ckanext.datadotworld.api import compat_enqueue
-from ckanext.datadotworld.api import syncronize
+from ckanext.datadotworld.model import States, CredentialsHealth
+from ckanext.datadotworld.model.credentials import Credentials
+import ckanext.datadotworld.scheduler as scheduler
+from ckanext.datadotworld.worker import SyncWorker
 import paste.script
 import logging
 from migrate.versioning.shell import main
 from migrate.exceptions import DatabaseAlreadyControlledError
 import os.path as path
+import sys
+from datetime import datetime
+from multiprocessing.pool import ThreadPool
+from ckan.lib.helpers import date_str_to_datetime
+from ckanext.datadotworld import (
+    bootstrap, export, freshness, planner, retry, sync_log, timing
+)
 
 log = logging.getLogger('ckanext.datadotworld')
 repository = path.realpath(path.join(
@@ -41,6 +49,28 @@ class DataDotWorldCommand(CkanCommand):
         downgrade - delete tables provided by datadotworld
         upgrade - create/update required tables
         push_failed - try to push prefiously failed datasets to data.world
+            (only those whose retry backoff expired)
+        requeue_dead - push again datasets permanently rejected by
+            data.world [--org ORG]
+        push_pending - push datasets deferred while data.world was unavailable
+        worker - run jobs from outbox table (ckan.datadotworld.queue = outbox)
+            [--processes N] [--threads M] [--max-jobs-per-child K]
+        verify_credentials - check credentials of all organizations
+            [--concurrency N]
+        export_state - stream sync state as NDJSON or CSV
+            [--format ndjson|csv] [--state S] [--org ORG] [--since DATE]
+            [--output FILE]
+        sync_resources - make data.world re-fetch changed or outdated
+            linked resources [--limit N] [--concurrency N] [--force]
+        timing_report - slowest phases, owners and datasets from timing
+            log records [--input FILE] [--limit N]
+        prune_sync_log - delete sync history older than N days
+            (ckan.datadotworld.sync_log_retention) [--days N]
+        plan - offline dry run of organization sync, lists datasets that
+            would be created, updated or deleted [--org ORG] [--processes N]
+        bootstrap - sync all datasets of organization in resumable pages,
+            without --org resume runs that stopped making progress
+            [--org ORG]
     """
 
     summary = __doc__.split('\n')[0]
@@ -50,6 +80,34 @@ class DataDotWorldCommand(CkanCommand):
     parser.add_option('-c', '--config', dest='config',
                       default='development.ini',
                       help='Config file to use.')
+    parser.add_option('--processes', dest='processes', type='int',
+                      default=1, help='Number of worker processes.')
+    parser.add_option('--threads', dest='threads', type='int',
+                      default=1, help='Number of threads per process.')
+    parser.add_option('--max-jobs-per-child', dest='max_jobs_per_child',
+                      type='int', default=None,
+                      help='Restart worker process after that many jobs.')
+    parser.add_option('--concurrency', dest='concurrency', type='int',
+                      default=8, help='Number of concurrent requests.')
+    parser.add_option('--format', dest='format', default='ndjson',
+                      choices=export.FORMATS, help='Export format.')
+    parser.add_option('--state', dest='state', default=None,
+                      help='Export only datasets in this state.')
+    parser.add_option('--org', dest='org', default=None,
+                      help='Limit command to this organization.')
+    parser.add_option('--since', dest='since', default=None,
+                      help='Export only rows modified since this date.')
+    parser.add_option('--limit', dest='limit', type='int', default=None,
+                      help='Check at most that many datasets.')
+    parser.add_option('--force', dest='force', action='store_true',
+                      default=False,
+                      help='Re-fetch resources even if they are unchanged.')
+    parser.add_option('--days', dest='days', type='int', default=None,
+                      help='Keep sync history for that many days.')
+    parser.add_option('--input', dest='input', default=None,
+                      help='Read log from file instead of stdin.')
+    parser.add_option('--output', dest='output', default=None,
+                      help='Write export into file instead of stdout.')
 
     def command(self):
         self._load_config()
@@ -68,8 +126,26 @@ class DataDotWorldCommand(CkanCommand):
             self._downgrade()
         elif self.args[0] == 'push_failed':
             self._push_failed()
+        elif self.args[0] == 'requeue_dead':
+            self._requeue_dead()
+        elif self.args[0] == 'push_pending':
+            self._push_pending()
+        elif self.args[0] == 'worker':
+            self._worker()
+        elif self.args[0] == 'verify_credentials':
+            self._verify_credentials()
+        elif self.args[0] == 'export_state':
+            self._export_state()
         elif self.args[0] == 'sync_resources':
             self._sync_resources()
+        elif self.args[0] == 'bootstrap':
+            self._bootstrap()
+        elif self.args[0] == 'timing_report':
+            self._timing_report()
+        elif self.args[0] == 'prune_sync_log':
+            self._prune_sync_log()
+        elif self.args[0] == 'plan':
+            self._plan()
         else:
             print(self.usage)
 
@@ -78,28 +154,153 @@ class DataDotWorldCommand(CkanCommand):
         # use incorrect config then and you'll receive error like
         # "no section app:main in config file"
         # from ckan.lib.celery_app import celery
-        ckan_ini_filepath = path.abspath(config['__file__'])
-        failed = model.Session.query(Extras).filter_by(state='failed')
+        scheduler.dispatch_state(States.failed)
 
-        for record in failed:
-            compat_enqueue(
-                'datadotworld.syncronize',
-                syncronize,
-                args=[record.package_id, ckan_ini_filepath])
+    def _push_pending(self):
+        scheduler.dispatch_state(States.pending)
 
-    def _sync_resources(self):
+    def _requeue_dead(self):
+        org_id = None
+        if self.options.org:
+            org = model.Group.get(self.options.org)
+            if org is None:
+                print('Organization {0} not found'.format(self.options.org))
+                sys.exit(1)
+            org_id = org.id
+        amount = retry.requeue(org_id)
+        print('{0} datasets requeued'.format(amount))
+        scheduler.dispatch_state(States.pending)
+
+    def _bootstrap(self):
+        if self.options.org:
+            org = model.Group.get(self.options.org)
+            if org is None:
+                print('Organization {0} not found'.format(self.options.org))
+                sys.exit(1)
+            run = bootstrap.start(org.id)
+            print('Bootstrap {0} started: {1} datasets'.format(
+                run.id, run.total))
+            return
+        for run in bootstrap.resume():
+            print('Bootstrap {0} of {1} resumed after {2}/{3}'.format(
+                run.id, run.organization_id, run.processed, run.total))
+
+    def _plan(self):
+        org = model.Group.get(self.options.org or '')
+        if org is None or not org.is_organization:
+            print('Organization {0} not found'.format(self.options.org))
+            sys.exit(1)
+        plans = []
+        for plan in planner.plan_org(org.id, self.options.processes):
+            plans.append(plan)
+            if plan['action'] in (planner.NONE, planner.SKIP) \
+                    and not self.verbose:
+                continue
+            print('{0:<8}{1:<60}{2:>6} files  {3}'.format(
+                plan['action'], plan['name'] or plan['id'], plan['files'],
+                plan['reason'] or ''))
+        summary = planner.summarize(plans)
+        print('\n{0} datasets: {1} create, {2} update, {3} delete, '
+              '{4} unchanged, {5} skipped; {6} file operations'.format(
+                  len(plans), summary.get(planner.CREATE, 0),
+                  summary.get(planner.UPDATE, 0),
+                  summary.get(planner.DELETE, 0),
+                  summary.get(planner.NONE, 0),
+                  summary.get(planner.SKIP, 0), summary.get('files', 0)))
+
+    def _prune_sync_log(self):
+        deleted = sync_log.prune(self.options.days)
+        print('{0} sync log entries deleted'.format(deleted))
+
+    def _timing_report(self):
+        stream = open(self.options.input) if self.options.input \
+            else sys.stdin
+        try:
+            report = timing.analyze(stream, top=self.options.limit or 10)
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+        print('{0} syncs: {1}'.format(report['records'], ', '.join(
+            '{0} {1}'.format(amount, outcome)
+            for outcome, amount in sorted(report['outcomes'].items()))))
+        print('\n{0:<16}{1:>12}{2:>10}{3:>10}'.format(
+            'phase', 'total, ms', 'p50', 'p95'))
+        for row in report['phases']:
+            print('{0:<16}{1:>12}{2:>10}{3:>10}'.format(*row))
+        print('\n{0:<32}{1:>8}{2:>10}{3:>10}'.format(
+            'owner', 'syncs', 'mean, ms', 'p95'))
+        for row in report['owners']:
+            print('{0:<32}{1:>8}{2:>10}{3:>10}'.format(*row))
+        print('\n{0:<40}{1:>10}'.format('dataset', 'total, ms'))
+        for total, pkg_id in report['packages']:
+            print('{0:<40}{1:>10}'.format(pkg_id, total))
+
+    def _worker(self):
+        worker = SyncWorker(
+            path.abspath(config['__file__']),
+            processes=self.options.processes,
+            threads=self.options.threads,
+            max_jobs_per_child=self.options.max_jobs_per_child)
+        worker.run()
+
+    def _verify_credentials(self):
+        creds = model.Session.query(Credentials).filter(
+            Credentials.owner != None, Credentials.key != None  # noqa
+        ).all()
 
-        queue = model.Session.query(Extras).join(model.Package).join(
-            model.Resource).filter(model.Resource.url_type == None)
-        for record in queue:
+        def check(item):
             try:
-                creds = record.package.get_groups(
-                    'organization').pop().datadotworld_credentials
+                return API(item.owner, item.key).credentials_health()
             except Exception as e:
-                print(e)
-                continue
-            api = API(creds.owner, creds.key)
-            api.sync_resources(record.id)
+                log.error('[{0}] Credentials check problem: {1}'.format(
+                    item.owner, e))
+                return CredentialsHealth.unknown
+
+        pool = ThreadPool(max(self.options.concurrency, 1))
+        try:
+            results = pool.map(check, creds)
+        finally:
+            pool.close()
+        checked_at = datetime.utcnow()
+        for item, health in zip(creds, results):
+            item.health = health
+            item.checked_at = checked_at
+            print('{0:40} {1}'.format(item.organization.name, health))
+        model.Session.commit()
+
+    def _export_state(self):
+        org_ids = None
+        if self.options.org:
+            org = model.Group.get(self.options.org)
+            if org is None:
+                print('Organization {0} not found'.format(self.options.org))
+                return
+            org_ids = [org.id]
+        since = None
+        if self.options.since:
+            try:
+                since = date_str_to_datetime(self.options.since)
+            except (TypeError, ValueError):
+                print('Incorrect --since date: {0}'.format(
+                    self.options.since))
+                sys.exit(1)
+        rows = export.iter_rows(
+            state=self.options.state, org_ids=org_ids, since=since)
+        out = open(self.options.output, 'w') if self.options.output \
+            else sys.stdout
+        try:
+            for chunk in export.serialize(rows, self.options.format):
+                out.write(chunk)
+        finally:
+            if out is not sys.stdout:
+                out.close()
+
+    def _sync_resources(self):
+        checked, synced = freshness.refresh(
+            limit=self.options.limit,
+            concurrency=self.options.concurrency,
+            force=self.options.force)
+        print('{0} datasets checked, {1} re-fetched'.format(checked, synced))
 
     def _init(self):
         try:
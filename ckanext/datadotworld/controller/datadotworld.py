@@ -14,36 +14,50 @@
 
 import json
 import logging
+from datetime import datetime
 import ckan.lib.base as base
 import ckan.model as model
 import ckan.logic as logic
 import ckan.plugins.toolkit as tk
 from ckanext.datadotworld.model.credentials import Credentials
 from ckanext.datadotworld.model.extras import Extras
-from ckan.common import _, request, c
+from ckanext.datadotworld.model.sync_log import SyncLog
+from ckan.common import _, request, response, c
 import ckan.lib.helpers as h
 from ckanext.datadotworld.api import API
-from ckanext.datadotworld.api import compat_enqueue
-from ckanext.datadotworld.api import syncronize
+from ckanext.datadotworld.model import States, CredentialsHealth
 from pylons import config
 import os
-from ckan.lib.celery_app import celery
 from sqlalchemy import func
 import ckanext.datadotworld.helpers as dh
+from ckanext.datadotworld import bootstrap, breaker, export, pacing
+import ckanext.datadotworld.logic.action as action
+from webob.datetime_utils import UTC
+
+try:
+    import ckan.authz as authz
+except ImportError:
+    # CKAN < 2.5
+    import ckan.new_authz as authz
 
 logger = logging.getLogger(__name__)
 
 
-def syncronize_org(id):
-    ckan_ini_filepath = os.path.abspath(config['__file__'])
-    packages = model.Session.query(model.Package).filter_by(
-        owner_org=id
-    )
-    for pkg in packages:
-        compat_enqueue(
-            'datadotworld.syncronize',
-            syncronize,
-            args=[pkg.id, ckan_ini_filepath])
+def mark_org_pending(id):
+    """Mark all synced packages of organization as pending.
+
+    Single UPDATE statement, no ORM objects are loaded.
+    """
+    package_ids = model.Session.query(model.Package.id).filter(
+        model.Package.owner_org == id
+    ).subquery()
+    model.Session.query(Extras).filter(
+        Extras.package_id.in_(package_ids)
+    ).update({
+        'state': States.pending,
+        'failures': 0,
+        'next_attempt_at': None
+    }, synchronize_session=False)
 
 
 class DataDotWorldController(base.BaseController):
@@ -60,11 +74,13 @@ class DataDotWorldController(base.BaseController):
         query = model.Session.query(
             model.Package.name,
             model.Package.title,
-            Extras.message
+            SyncLog.body.label('message')
         ).join(
             model.Group, model.Package.owner_org == model.Group.id
         ).join(
             Extras
+        ).outerjoin(
+            SyncLog, SyncLog.id == Extras.last_log_id
         ).filter(
             Extras.state == state
         )
@@ -86,6 +102,75 @@ class DataDotWorldController(base.BaseController):
                 }
         return base.render('datadotworld/list_sync.html', extra_vars=extra)
 
+    def status(self, org_id, action_name):
+        """JSON view of status actions with conditional GET support.
+
+        ETag and Last-Modified are checked before the action runs, so
+        pollers receive 304 without any counting queries.
+        """
+        context = {
+            'model': model,
+            'session': model.Session,
+            'user': c.user or c.author,
+            'auth_user_obj': c.userobj}
+        data_dict = dict(request.params, id=org_id)
+        try:
+            logic.check_access(action_name, context, {'id': org_id})
+            org = model.Group.get(org_id)
+            if org is None:
+                raise logic.NotFound
+            last_modified, etag = action.version_for(
+                action_name, org.id, data_dict)
+        except logic.NotFound:
+            base.abort(404, _('Organization not found'))
+        except logic.ValidationError as e:
+            base.abort(400, e.error_summary)
+        except logic.NotAuthorized:
+            base.abort(401, _('User %r not authorized to see this page') % (
+                c.user))
+
+        response.headers['Content-Type'] = 'application/json;charset=utf-8'
+        response.etag = etag
+        if last_modified:
+            response.last_modified = last_modified.replace(
+                tzinfo=UTC, microsecond=0)
+        if etag in request.if_none_match or (
+                last_modified and request.if_modified_since and
+                request.if_modified_since >= response.last_modified):
+            response.status_int = 304
+            return ''
+        try:
+            result = logic.get_action(action_name)(context, data_dict)
+        except logic.ValidationError as e:
+            base.abort(400, e.error_summary)
+        return json.dumps(result)
+
+    def export_state(self, format, org_id=None):
+        org = model.Group.get(org_id)
+        if authz.is_sysadmin(c.user):
+            if org_id and org is None:
+                base.abort(404, _('Organization not found'))
+            org_ids = [org.id] if org else None
+        else:
+            orgs = dh.admin_in_orgs(c.user)
+            if not orgs or (org_id and org not in orgs):
+                base.abort(401, _(
+                    'User %r not authorized to see this page') % c.user)
+            org_ids = [org.id] if org else [o.id for o in orgs]
+        since = request.params.get('since')
+        if since:
+            try:
+                since = h.date_str_to_datetime(since)
+            except (TypeError, ValueError):
+                base.abort(400, _('Incorrect `since` date'))
+        rows = export.iter_rows(
+            state=request.params.get('state'),
+            org_ids=org_ids, since=since)
+        response.headers['Content-Type'] = export.CONTENT_TYPES[format]
+        response.headers['Content-Disposition'] = (
+            'attachment; filename="datadotworld-state.{0}"'.format(format))
+        return export.serialize(rows, format)
+
     def edit(self, id):
         def validate(data):
             error_dict = {}
@@ -104,8 +189,10 @@ class DataDotWorldController(base.BaseController):
                         'if credentials are provided']
             if not error_dict:
                 api = API(has_owner, has_key)
-                check = api.check_credentials()
-                if not check:
+                health = api.credentials_health(cache=True)
+                c.credentials.health = health
+                c.credentials.checked_at = datetime.utcnow()
+                if health == CredentialsHealth.invalid:
                     error_dict['key'] = ['Incorrect key']
             if error_dict:
                 raise logic.ValidationError(error_dict)
@@ -151,18 +238,11 @@ class DataDotWorldController(base.BaseController):
                 extra['error_summary'] = e.error_summary
             else:
 
-                query = model.Session.query(Extras).join(
-                    model.Package
-                ).join(
-                    model.Group, model.Package.owner_org == model.Group.id
-                ).filter(model.Group.id == c.group.id)
-                for item in query:
-                    item.state = 'pending'
-
+                mark_org_pending(c.group.id)
                 model.Session.commit()
                 h.flash_success('Saved')
                 if tk.asbool(c.credentials.integration):
-                    syncronize_org(c.group.id)
+                    bootstrap.start(c.group.id)
                 return base.redirect_to('organization_dataworld', id=id)
 
         query = model.Session.query(
@@ -174,5 +254,10 @@ class DataDotWorldController(base.BaseController):
 
         for amount, state in query:
             stats[state] = amount
+        if c.credentials.owner:
+            extra['circuit'] = breaker.status(c.credentials.owner)
+            extra['pacing'] = pacing.status(c.credentials.owner)
+        extra['latency'] = action.latency_stats(c.group.id)
+        extra['bootstrap'] = bootstrap.progress(bootstrap.latest(c.group.id))
         return base.render(
             'organization/edit_credentials.html', extra_vars=extra)
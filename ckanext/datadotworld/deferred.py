@@ -0,0 +1,186 @@
+# Copyright 2017 data.world, inc
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Transaction-aware enqueueing of sync jobs.
+
+Package hooks run inside the transaction of the action that changed the
+package. Instead of enqueueing a job right away, package ids are
+collected in the session and a single batched job is dispatched after
+the transaction is committed. Rolled back transactions dispatch nothing
+and repeated changes of the same package collapse into one sync.
+
+Resource changes are collected separately as file operations, which are
+dropped when the whole package is going to be synced anyway. Resource
+hooks that run after the action has already committed use `push_file`
+instead. Changes scheduled after the last commit are dispatched when
+the session is closed, so they are never lost silently.
+
+When the outbox queue is used, jobs are grouped by data.world owner. Owners
+are looked up right before the commit, because SQL is not allowed once
+the session is committed.
+"""
+
+import logging
+
+from sqlalchemy import event
+
+import ckan.model as model
+from ckanext.datadotworld import api, outbox, timing
+
+log = logging.getLogger(__name__)
+
+INFO_KEY = 'datadotworld_package_ids'
+FILES_KEY = 'datadotworld_files'
+OWNERS_KEY = 'datadotworld_owners'
+MAX_JOB_SIZE = 100
+
+
+def add(pkg_id):
+    """Schedule sync of package after the current transaction commits.
+    """
+    model.Session().info.setdefault(INFO_KEY, set()).add(pkg_id)
+
+
+def add_file(pkg_id, res_id, operation, old_name=None):
+    """Schedule push of single resource after the transaction commits.
+
+    `old_name` is the name file had on data.world before the change.
+    """
+    files = model.Session().info.setdefault(FILES_KEY, {})
+    previous = files.get((pkg_id, res_id))
+    if previous is not None:
+        old_name = previous[1]
+    files[(pkg_id, res_id)] = (operation, old_name)
+
+
+def push_file(pkg_id, res_id, operation, old_name=None):
+    """Enqueue push of single resource right away.
+
+    For hooks called after the action has committed its changes.
+    """
+    operations = [[pkg_id, res_id, operation, old_name]]
+    try:
+        enqueue_files(operations)
+    except Exception as e:
+        log.error('Unable to enqueue sync of {0}: {1}'.format(operations, e))
+
+
+def _by_owner(pkg_ids, owners=None):
+    """Group package ids by owner. Single group without outbox queue.
+    """
+    if not outbox.is_enabled():
+        return {None: list(pkg_ids)}
+    if owners is None:
+        owners = api._owners_of(pkg_ids)
+    groups = {}
+    for pkg_id in pkg_ids:
+        groups.setdefault(owners.get(pkg_id), []).append(pkg_id)
+    return groups
+
+
+def enqueue(ids, visibility_only=False, owners=None):
+    """Enqueue batched sync of packages, splitting large batches.
+
+    `owners` maps package ids to owners, when they are already known.
+    """
+    ckan_ini_filepath = api.ckan_ini_filepath()
+    enqueued_at = timing.now()
+    for owner, owned in _by_owner(ids, owners).items():
+        for start in range(0, len(owned), MAX_JOB_SIZE):
+            chunk = owned[start:start + MAX_JOB_SIZE]
+            api.compat_enqueue(
+                'datadotworld.syncronize_many',
+                api.syncronize_many,
+                args=[chunk, ckan_ini_filepath, enqueued_at,
+                      visibility_only],
+                owner=owner)
+
+
+def enqueue_files(operations, owners=None):
+    """Enqueue jobs for list of (pkg_id, res_id, op, old_name).
+
+    One job per owner, `owners` as in `enqueue`.
+    """
+    groups = _by_owner(
+        sorted(set(operation[0] for operation in operations)), owners)
+    for owner, pkg_ids in groups.items():
+        pkg_ids = set(pkg_ids)
+        owned = [
+            operation for operation in operations
+            if operation[0] in pkg_ids
+        ]
+        api.compat_enqueue(
+            'datadotworld.syncronize_files',
+            api.syncronize_files,
+            args=[owned, api.ckan_ini_filepath(), timing.now()],
+            owner=owner)
+
+
+@event.listens_for(model.Session, 'before_commit')
+def _before_commit(session):
+    if not outbox.is_enabled():
+        return
+    ids = set(session.info.get(INFO_KEY, ()))
+    ids.update(pkg_id for pkg_id, _ in session.info.get(FILES_KEY, {}))
+    if ids:
+        session.info[OWNERS_KEY] = api._owners_of(ids)
+
+
+def _dispatch(info):
+    ids = info.pop(INFO_KEY, None) or set()
+    files = info.pop(FILES_KEY, None) or {}
+    owners = info.pop(OWNERS_KEY, None) or {}
+    operations = sorted(
+        [pkg_id, res_id, operation, old_name]
+        for (pkg_id, res_id), (operation, old_name) in files.items()
+        if pkg_id not in ids)
+    try:
+        if ids:
+            enqueue(sorted(ids), owners=owners)
+        if operations:
+            enqueue_files(operations, owners)
+    except Exception as e:
+        log.error('Unable to enqueue sync of {0}: {1}'.format(
+            ids or operations, e))
+
+
+@event.listens_for(model.Session, 'after_commit')
+def _after_commit(session):
+    _dispatch(session.info)
+
+
+@event.listens_for(model.Session, 'after_transaction_end')
+def _after_transaction_end(session, transaction):
+    """Dispatch changes scheduled after the last commit of the session.
+
+    Committed and rolled back transactions have nothing left here. Owners
+    are not looked up, because SQL is not allowed while session closes.
+    """
+    if transaction._parent is not None:
+        return
+    info = session.info
+    if info.get(INFO_KEY) or info.get(FILES_KEY):
+        log.warn('Sync of {0} scheduled outside of transaction'.format(
+            list(info.get(INFO_KEY) or ()) or list(info.get(FILES_KEY))))
+        _dispatch(info)
+
+
+@event.listens_for(model.Session, 'after_rollback')
+def _after_rollback(session):
+    ids = session.info.pop(INFO_KEY, None)
+    files = session.info.pop(FILES_KEY, None)
+    session.info.pop(OWNERS_KEY, None)
+    if ids or files:
+        log.debug('Transaction rolled back, sync of {0} skipped'.format(
+            ids or list(files)))
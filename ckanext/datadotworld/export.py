@@ -0,0 +1,107 @@
+# Copyright 2017 data.world, inc
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""Streaming export of synchronization state.
+
+Rows are read through a dedicated session with server-side cursor
+(`yield_per`) and serialized one by one, so memory usage does not depend
+on the number of exported rows.
+"""
+
+import csv
+import json
+from cStringIO import StringIO
+
+from sqlalchemy.orm import Session
+
+import ckan.model as model
+from ckanext.datadotworld.model.extras import Extras
+
+FORMATS = ('ndjson', 'csv')
+FIELDS = (
+    'package_id', 'name', 'organization', 'owner', 'remote_id', 'state',
+    'modified'
+)
+CONTENT_TYPES = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv'
+}
+CHUNK_SIZE = 1000
+
+
+def _query(session, state=None, org_ids=None, since=None):
+    query = session.query(
+        Extras.package_id,
+        model.Package.name,
+        model.Group.name.label('organization'),
+        Extras.owner,
+        Extras.id.label('remote_id'),
+        Extras.state,
+        Extras.modified
+    ).join(
+        model.Package, model.Package.id == Extras.package_id
+    ).join(
+        model.Group, model.Package.owner_org == model.Group.id
+    )
+    if state:
+        query = query.filter(Extras.state == state)
+    if org_ids is not None:
+        query = query.filter(model.Group.id.in_(org_ids))
+    if since:
+        query = query.filter(Extras.modified >= since)
+    return query.order_by(Extras.package_id).yield_per(CHUNK_SIZE)
+
+
+def iter_rows(state=None, org_ids=None, since=None):
+    """Yield exported rows as dicts.
+    """
+    session = Session(bind=model.meta.engine)
+    try:
+        for row in _query(session, state, org_ids, since):
+            data = dict(zip(FIELDS, row))
+            if data['modified']:
+                data['modified'] = data['modified'].isoformat()
+            yield data
+    finally:
+        session.close()
+
+
+def _encode(value):
+    if isinstance(value, unicode):
+        return value.encode('utf-8')
+    return value
+
+
+def iter_ndjson(rows):
+    for row in rows:
+        yield json.dumps(row) + '\n'
+
+
+def iter_csv(rows):
+    buf = StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(FIELDS)
+    yield buf.getvalue()
+    for row in rows:
+        buf.seek(0)
+        buf.truncate()
+        writer.writerow([_encode(row[field]) for field in FIELDS])
+        yield buf.getvalue()
+
+
+def serialize(rows, fmt):
+    if fmt == 'csv':
+        return iter_csv(rows)
+    return iter_ndjson(rows)
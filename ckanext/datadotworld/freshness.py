@@ -0,0 +1,224 @@
+# Copyright 2017 data.world, inc
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Change detection for linked resources of synced datasets.
+
+`sync_resources` asks data.world to re-fetch sources of a dataset only when
+one of them changed or when the dataset was not refreshed for
+`resource_max_age` seconds. A source is considered changed when its URL,
+CKAN's `last_modified` or validators returned by conditional HEAD request
+(ETag, Last-Modified) differ from the stored ones. Every run checks at most
+`resource_sync_limit` datasets, least recently checked first, so the load
+is spread over several runs.
+
+Requests (HEAD probes and re-fetch calls) are made outside of database
+transactions. Results of the check and the re-fetch time of a dataset are
+written afterwards in a single transaction, without touching
+`Extras.modified`, which tracks changes of sync state only.
+"""
+
+import hashlib
+import logging
+from collections import namedtuple
+from datetime import datetime, timedelta
+from multiprocessing.pool import ThreadPool
+
+import requests
+
+import ckan.model as model
+from ckanext.datadotworld.model import States
+from ckanext.datadotworld.model.extras import Extras
+from ckanext.datadotworld.model.resource_state import ResourceState
+from ckanext.datadotworld import options
+import ckanext.datadotworld.api as api
+
+log = logging.getLogger(__name__)
+
+DEFAULT_MAX_AGE = 7 * 24 * 3600
+DEFAULT_LIMIT = 500
+HEAD_TIMEOUT = 10
+
+_Source = namedtuple('_Source', 'id url last_modified')
+
+
+def max_age():
+    return options.int_option('resource_max_age', DEFAULT_MAX_AGE)
+
+
+def run_limit():
+    return options.int_option('resource_sync_limit', DEFAULT_LIMIT)
+
+
+def probe(url, etag=None):
+    """Conditional HEAD request to resource source.
+
+    Returns (etag, last_modified) of changed source or None when source
+    is not modified or its state is unknown.
+    """
+    headers = {'User-Agent': api.API.user_agent_header}
+    if etag:
+        headers['If-None-Match'] = etag
+    try:
+        resp = requests.head(
+            url, headers=headers, allow_redirects=True, timeout=HEAD_TIMEOUT)
+    except (requests.RequestException, ValueError) as e:
+        log.debug('HEAD {0} failed: {1}'.format(url, e))
+        return None
+    if resp.status_code != 200:
+        return None
+    return resp.headers.get('ETag'), resp.headers.get('Last-Modified')
+
+
+def fingerprint(resource, etag, remote_modified):
+    parts = [resource.url, resource.last_modified, etag, remote_modified]
+    return hashlib.sha1(u'\n'.join(
+        u'{0}'.format(part or u'') for part in parts
+    ).encode('utf-8')).hexdigest()
+
+
+def due_packages(limit):
+    """Synced datasets with linked resources, least recently checked first.
+    """
+    linked = model.Session.query(model.Resource.package_id).filter(
+        model.Resource.url_type == None,  # noqa
+        model.Resource.state == 'active'
+    )
+    return model.Session.query(Extras).join(model.Package).filter(
+        Extras.id != None,  # noqa
+        Extras.state == States.uptodate,
+        model.Package.state == 'active',
+        Extras.package_id.in_(linked)
+    ).order_by(
+        Extras.resources_checked_at.nullsfirst(), Extras.package_id
+    ).limit(limit).all()
+
+
+def _probe_task(args):
+    resource_id, url, etag = args
+    return resource_id, probe(url, etag)
+
+
+def _touch(package_id, **values):
+    """Update columns of extras, leaving `modified` as it is.
+    """
+    table = Extras.__table__
+    model.Session.execute(table.update().where(
+        table.c.package_id == package_id
+    ).values(modified=table.c.modified, **values))
+
+
+def check(package_id, pool):
+    """Probe linked resources of package.
+
+    Returns whether any resource changed and new states of resources,
+    {resource_id: (etag, remote_modified, fingerprint)}, stored later by
+    `save`. Nothing is written here.
+    """
+    resources = [
+        _Source(res.id, res.url, res.last_modified)
+        for res in model.Session.query(model.Resource).filter(
+            model.Resource.package_id == package_id,
+            model.Resource.url_type == None,  # noqa
+            model.Resource.state == 'active'
+        ).all()
+    ]
+    stored = dict(
+        (state.resource_id,
+         (state.etag, state.remote_modified, state.fingerprint))
+        for state in model.Session.query(ResourceState).filter(
+            ResourceState.package_id == package_id))
+    # don't keep transaction open while waiting for remote servers
+    model.Session.commit()
+    validators = dict(pool.map(_probe_task, [
+        (res.id, res.url, stored[res.id][0] if res.id in stored else None)
+        for res in resources
+    ]))
+
+    changed = bool(set(stored) - set(res.id for res in resources))
+    states = {}
+    for res in resources:
+        etag, remote_modified, old_fingerprint = stored.get(
+            res.id, (None, None, None))
+        if validators.get(res.id):
+            etag, remote_modified = validators[res.id]
+        new_fingerprint = fingerprint(res, etag, remote_modified)
+        changed = changed or new_fingerprint != old_fingerprint
+        states[res.id] = (etag, remote_modified, new_fingerprint)
+    return changed, states
+
+
+def save(package_id, states, checked_at, synced_at=None):
+    """Store results of `check` and sync time in one transaction.
+    """
+    states = dict(states)
+    for state in model.Session.query(ResourceState).filter(
+            ResourceState.package_id == package_id):
+        if state.resource_id in states:
+            state.etag, state.remote_modified, state.fingerprint = (
+                states.pop(state.resource_id))
+            state.checked_at = checked_at
+    for resource_id, (etag, remote_modified, value) in states.items():
+        model.Session.add(ResourceState(
+            resource_id=resource_id, package_id=package_id, etag=etag,
+            remote_modified=remote_modified, fingerprint=value,
+            checked_at=checked_at))
+    values = dict(resources_checked_at=checked_at)
+    if synced_at is not None:
+        values['resources_synced_at'] = synced_at
+    _touch(package_id, **values)
+    model.Session.commit()
+
+
+def refresh(limit=None, concurrency=8, force=False):
+    """Trigger re-fetch of changed or too old sources on data.world.
+
+    :returns: (checked, synced) amount of datasets
+    """
+    limit = run_limit() if limit is None else limit
+    threshold = datetime.utcnow() - timedelta(seconds=max_age())
+    due = [
+        (extras.package_id, extras.id, extras.package.owner_org,
+         extras.resources_synced_at)
+        for extras in due_packages(limit)
+    ]
+    model.Session.commit()
+    pool = ThreadPool(max(concurrency, 1))
+    checked = synced = 0
+    try:
+        for package_id, remote_id, owner_org, synced_at in due:
+            credentials = api._get_creds_if_must_sync(
+                {'owner_org': owner_org})
+            if not credentials:
+                continue
+            try:
+                changed, states = check(package_id, pool)
+                now = datetime.utcnow()
+                sync = (force or changed or synced_at is None or
+                        synced_at < threshold)
+                if sync:
+                    client = api.API(credentials.owner, credentials.key)
+                    client.sync_resources(remote_id)
+                save(package_id, states, now, now if sync else None)
+            except Exception as e:
+                log.error('[{0}] Resource check problem: {1}'.format(
+                    package_id, e))
+                model.Session.rollback()
+                continue
+            checked += 1
+            if sync:
+                synced += 1
+    finally:
+        pool.close()
+        pool.join()
+    return checked, synced
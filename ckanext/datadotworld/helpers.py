@@ -13,9 +13,76 @@
 # limitations under the License.
 
 import ckan.model as model
+from ckan.common import c
+from ckanext.datadotworld.model.credentials import Credentials
+from ckanext.datadotworld.model.extras import Extras
+
 
 def admin_in_orgs(name):
     user = model.User.get(name)
     if not user:
         return []
     return user.get_groups('organization', 'admin')
+
+
+def _request_cache():
+    """Per-request storage kept on template context.
+    """
+    try:
+        cache = getattr(c, 'datadotworld_cache', None)
+        if not cache:
+            cache = c.datadotworld_cache = {'creds': {}, 'extras': {}}
+        return cache
+    except TypeError:
+        # outside of request
+        return {'creds': {}, 'extras': {}}
+
+
+def preload(packages):
+    """Load credentials and remote ids for all packages in two queries.
+
+    Call it once before rendering a list of packages, so that
+    `datadotworld_creds` and `datadotworld_remote_id` do not hit the
+    database for every item.
+    """
+    cache = _request_cache()
+    pkg_ids = [
+        pkg['id'] for pkg in packages if pkg['id'] not in cache['extras']
+    ]
+    org_ids = set(
+        pkg.get('owner_org') for pkg in packages
+        if pkg.get('owner_org') and pkg['owner_org'] not in cache['creds']
+    )
+    if pkg_ids:
+        found = dict(model.Session.query(
+            Extras.package_id, Extras.id
+        ).filter(Extras.package_id.in_(pkg_ids)))
+        for pkg_id in pkg_ids:
+            cache['extras'][pkg_id] = found.get(pkg_id)
+    if org_ids:
+        for creds in model.Session.query(Credentials).filter(
+                Credentials.organization_id.in_(org_ids)):
+            cache['creds'][creds.organization_id] = creds
+        for org_id in org_ids:
+            cache['creds'].setdefault(org_id, None)
+    return ''
+
+
+def creds_from_id(org_id):
+    """Request-cached version of API.creds_from_id.
+    """
+    cache = _request_cache()['creds']
+    if org_id not in cache:
+        org = model.Group.get(org_id)
+        cache[org_id] = org.datadotworld_credentials if org else None
+    return cache[org_id]
+
+
+def remote_id(pkg_id):
+    """Id of package on data.world or None.
+    """
+    cache = _request_cache()['extras']
+    if pkg_id not in cache:
+        extras = model.Session.query(Extras).get(pkg_id)
+        cache[pkg_id] = extras.id if extras else None
+    return cache[pkg_id]
@@ -0,0 +1,257 @@
+# Copyright 2017 data.world, inc
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import hashlib
+
+from sqlalchemy import func
+
+import ckan.model as model
+import ckan.plugins.toolkit as tk
+import ckan.logic.action.update as update_core
+from ckanext.datadotworld.model.extras import Extras
+from ckanext.datadotworld.model.credentials import Credentials
+from ckanext.datadotworld import deferred, pacing, timing
+
+MAX_LIMIT = 1000
+
+
+def _get_org(data_dict):
+    org = model.Group.get(tk.get_or_bust(data_dict, 'id'))
+    if org is None or not org.is_organization:
+        raise tk.ObjectNotFound('Organization not found')
+    return org
+
+
+def _extras_query(org_id, *columns):
+    return model.Session.query(*columns).join(
+        model.Package, model.Package.id == Extras.package_id
+    ).filter(model.Package.owner_org == org_id)
+
+
+def version(org_id, *parts):
+    """Newest change of org's sync state and ETag derived from it.
+
+    Row count is part of ETag, because removed rows do not change the
+    newest modification date. Package changes count too, because names
+    and titles of packages are part of the sync list.
+    """
+    extras_modified, package_modified, amount = _extras_query(
+        org_id, func.max(Extras.modified),
+        func.max(model.Package.metadata_modified),
+        func.count(Extras.package_id)
+    ).one()
+    key = u':'.join(
+        [org_id, unicode(extras_modified), unicode(package_modified),
+         unicode(amount)] +
+        [unicode(part) for part in parts])
+    etag = hashlib.md5(key.encode('utf-8')).hexdigest()
+    dates = [date for date in (extras_modified, package_modified) if date]
+    return (max(dates) if dates else None), etag
+
+
+def _non_negative(data_dict, name, default):
+    try:
+        value = int(data_dict.get(name, default))
+    except (TypeError, ValueError):
+        raise tk.ValidationError({name: ['Must be an integer']})
+    if value < 0:
+        raise tk.ValidationError({name: ['Must be a natural number']})
+    return value
+
+
+def _paging(data_dict):
+    limit = min(_non_negative(data_dict, 'limit', 100), MAX_LIMIT)
+    offset = _non_negative(data_dict, 'offset', 0)
+    return data_dict.get('state'), limit, offset
+
+
+def _credentials_state(org_id):
+    """Credentials of org and pacing of their owner.
+    """
+    creds = model.Session.query(Credentials).get(org_id)
+    pacing_status = None
+    if creds is not None and creds.owner:
+        pacing_status = pacing.status(creds.owner)
+    return creds, pacing_status
+
+
+def _status_version(org_id, creds, pacing_status):
+    """Version of status, which also shows credentials and pacing.
+    """
+    return version(
+        org_id, creds.owner if creds else None,
+        bool(creds and creds.integration),
+        pacing_status['request_delay'] if pacing_status else None)
+
+
+def version_for(action_name, org_id, data_dict):
+    """Version of result that `action_name` returns for `data_dict`.
+    """
+    if action_name == 'datadotworld_sync_list':
+        return version(org_id, *_paging(data_dict))
+    return _status_version(org_id, *_credentials_state(org_id))
+
+
+def _percentiles(values, points=(50, 90, 99)):
+    values = sorted(values)
+    if not values:
+        return None
+    return dict(
+        ('p{0}'.format(point),
+         values[min(len(values) * point // 100, len(values) - 1)])
+        for point in points)
+
+
+def latency_stats(org_id, sample=1000):
+    """Percentiles of queue wait, sync duration and end-to-end lag (ms).
+
+    Computed over the `sample` most recently finished syncs of org.
+    """
+    rows = _extras_query(
+        org_id, Extras.enqueued_at, Extras.started_at, Extras.duration_ms
+    ).filter(
+        Extras.finished_at != None  # noqa
+    ).order_by(Extras.finished_at.desc()).limit(sample).all()
+    wait, duration, lag = [], [], []
+    for enqueued_at, started_at, duration_ms in rows:
+        if duration_ms is not None:
+            duration.append(duration_ms)
+        if enqueued_at and started_at:
+            wait.append(timing.duration_ms(enqueued_at, started_at))
+            if duration_ms is not None:
+                lag.append(wait[-1] + duration_ms)
+    return {
+        'sample': len(rows),
+        'queue_wait': _percentiles(wait),
+        'duration': _percentiles(duration),
+        'lag': _percentiles(lag)
+    }
+
+
+def _isoformat(date):
+    return date.isoformat() if date else None
+
+
+@tk.side_effect_free
+def datadotworld_status_show(context, data_dict):
+    """Replication stats of organization.
+
+    :param id: id or name of organization
+    :returns: dict with amount of datasets per sync state, newest change
+        date and ETag of the result
+    """
+    org = _get_org(data_dict)
+    tk.check_access('datadotworld_status_show', context, {'id': org.id})
+    creds, pacing_status = _credentials_state(org.id)
+    last_modified, etag = _status_version(org.id, creds, pacing_status)
+    query = _extras_query(
+        org.id, Extras.state, func.count(Extras.package_id)
+    ).group_by(Extras.state)
+    return {
+        'organization': org.name,
+        'owner': creds.owner if creds else None,
+        'integration': bool(creds and creds.integration),
+        'stats': dict((state, amount) for state, amount in query),
+        'latency': latency_stats(org.id),
+        'pacing': pacing_status,
+        'last_modified': _isoformat(last_modified),
+        'etag': etag
+    }
+
+
+@tk.side_effect_free
+def datadotworld_sync_list(context, data_dict):
+    """Paged list of organization's datasets with their sync state.
+
+    :param id: id or name of organization
+    :param state: return only datasets in this state (optional)
+    :param limit: page size, up to 1000 (optional, default: 100)
+    :param offset: (optional, default: 0)
+    """
+    org = _get_org(data_dict)
+    tk.check_access('datadotworld_sync_list', context, {'id': org.id})
+    state, limit, offset = _paging(data_dict)
+    last_modified, etag = version(org.id, state, limit, offset)
+
+    query = _extras_query(
+        org.id, model.Package.name, model.Package.title,
+        Extras.id, Extras.state, Extras.modified)
+    if state:
+        query = query.filter(Extras.state == state)
+    results = [{
+        'name': name,
+        'title': title,
+        'remote_id': remote_id,
+        'state': pkg_state,
+        'modified': _isoformat(modified)
+    } for name, title, remote_id, pkg_state, modified in query.order_by(
+        model.Package.name).limit(limit).offset(offset)]
+    return {
+        'count': query.count(),
+        'results': results,
+        'last_modified': _isoformat(last_modified),
+        'etag': etag
+    }
+
+
+def _chained(func):
+    """Chain `func` to core action with the same name.
+
+    CKAN before 2.7 has no `chained_action`, so core action is called
+    directly there.
+    """
+    if hasattr(tk, 'chained_action'):
+        return tk.chained_action(func)
+    core = getattr(update_core, func.__name__)
+
+    def action(context, data_dict):
+        return func(core, context, data_dict)
+    action.__name__ = func.__name__
+    action.__doc__ = func.__doc__
+    return action
+
+
+def _sync_bulk(data_dict, visibility_only=False):
+    """Enqueue one batched sync for datasets changed by bulk action.
+
+    Bulk actions bypass IPackageController hooks.
+    """
+    creds = model.Session.query(Credentials).get(data_dict.get('org_id'))
+    if creds is None or not creds.integration:
+        return
+    ids = sorted(set(data_dict.get('datasets') or []))
+    if ids:
+        deferred.enqueue(ids, visibility_only)
+
+
+@_chained
+def bulk_update_private(up_func, context, data_dict):
+    result = up_func(context, data_dict)
+    _sync_bulk(data_dict, visibility_only=True)
+    return result
+
+
+@_chained
+def bulk_update_public(up_func, context, data_dict):
+    result = up_func(context, data_dict)
+    _sync_bulk(data_dict, visibility_only=True)
+    return result
+
+
+@_chained
+def bulk_update_delete(up_func, context, data_dict):
+    result = up_func(context, data_dict)
+    _sync_bulk(data_dict)
+    return result
@@ -0,0 +1,31 @@
+# Copyright 2017 data.world, inc
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import ckan.plugins.toolkit as tk
+
+
+def datadotworld_status_show(context, data_dict):
+    try:
+        tk.check_access('organization_update', context, data_dict)
+    except tk.NotAuthorized:
+        return {
+            'success': False,
+            'msg': 'Only organization admins can see its data.world status'
+        }
+    return {'success': True}
+
+
+def datadotworld_sync_list(context, data_dict):
+    return datadotworld_status_show(context, data_dict)
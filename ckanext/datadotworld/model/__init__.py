@@ -10,3 +10,16 @@ class States:
     failed = u'failed'
     pending = u'pending'
     deleted = u'deleted'
+    dead = u'dead'
+
+
+class CredentialsHealth:
+    valid = u'valid'
+    invalid = u'invalid'
+    unknown = u'unknown'
+
+
+class BootstrapStatus:
+    running = u'running'
+    finished = u'finished'
+    cancelled = u'cancelled'
@@ -0,0 +1,42 @@
+# Copyright 2017 data.world, inc
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+from sqlalchemy import (
+    UnicodeText,
+    Integer,
+    DateTime,
+    Column
+)
+from ckanext.datadotworld.model import Base
+
+
+class Bootstrap(Base):
+    __tablename__ = 'datadotworld_bootstrap'
+
+    id = Column(Integer, primary_key=True)
+    organization_id = Column(UnicodeText)
+    status = Column(UnicodeText)
+    cursor = Column(UnicodeText)
+    total = Column(Integer, default=0)
+    processed = Column(Integer, default=0)
+    failed = Column(Integer, default=0)
+    started = Column(DateTime)
+    modified = Column(DateTime)
+    finished = Column(DateTime)
+
+    def __repr__(self):
+        return '<DataDotWorldBootstrap:id={0},status={1}>'.format(
+            self.id, self.status
+        )
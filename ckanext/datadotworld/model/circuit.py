@@ -0,0 +1,39 @@
+# Copyright 2017 data.world, inc
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+from sqlalchemy import (
+    UnicodeText,
+    Integer,
+    Float,
+    DateTime,
+    Column
+)
+from ckanext.datadotworld.model import Base
+
+
+class Circuit(Base):
+    __tablename__ = 'datadotworld_circuit'
+
+    scope = Column(UnicodeText, primary_key=True)
+    state = Column(UnicodeText)
+    failures = Column(Integer, default=0)
+    opened_at = Column(DateTime)
+    modified = Column(DateTime)
+    request_delay = Column(Float)
+
+    def __repr__(self):
+        return '<DataDotWorldCircuit:scope={0},state={1}>'.format(
+            self.scope, self.state
+        )
@@ -18,7 +18,8 @@ from sqlalchemy import (
     UnicodeText,
     ForeignKey,
     Column,
-    Boolean
+    Boolean,
+    DateTime
 )
 from ckanext.datadotworld.model import Base
 
@@ -32,6 +33,8 @@ class Credentials(Base):
     show_links = Column(Boolean)
     key = Column(UnicodeText)
     owner = Column(UnicodeText)
+    health = Column(UnicodeText)
+    checked_at = Column(DateTime)
 
     organization = relationship(
         Group, backref=backref(
@@ -12,13 +12,16 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+from datetime import datetime
+
 from ckan.model import Package
 from sqlalchemy.orm import relationship, backref
 from sqlalchemy import (
     UnicodeText,
     ForeignKey,
+    DateTime,
+    Integer,
     Column
-
 )
 from ckanext.datadotworld.model import Base, States
 
@@ -32,7 +35,20 @@ class Extras(Base):
     owner = Column(UnicodeText)
     id = Column(UnicodeText)
     state = Column(UnicodeText, default=States.uptodate)
-    message = Column(UnicodeText)
+    fingerprint = Column(UnicodeText)
+    modified = Column(
+        DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    enqueued_at = Column(DateTime)
+    started_at = Column(DateTime)
+    finished_at = Column(DateTime)
+    duration_ms = Column(Integer)
+    attempts = Column(Integer)
+    last_status_code = Column(Integer)
+    resources_checked_at = Column(DateTime)
+    resources_synced_at = Column(DateTime)
+    last_log_id = Column(Integer)
+    failures = Column(Integer, default=0)
+    next_attempt_at = Column(DateTime)
 
     package = relationship(
         Package, backref=backref(
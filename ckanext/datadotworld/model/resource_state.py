@@ -0,0 +1,37 @@
+# Copyright 2017 data.world, inc
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+from sqlalchemy import (
+    UnicodeText,
+    DateTime,
+    Column
+)
+from ckanext.datadotworld.model import Base
+
+
+class ResourceState(Base):
+    """Last known version of resource source, see freshness.py.
+    """
+    __tablename__ = 'datadotworld_resource_state'
+
+    resource_id = Column(UnicodeText, primary_key=True)
+    package_id = Column(UnicodeText)
+    fingerprint = Column(UnicodeText)
+    etag = Column(UnicodeText)
+    remote_modified = Column(UnicodeText)
+    checked_at = Column(DateTime)
+
+    def __repr__(self):
+        return '<DataDotWorldResourceState:id={0}>'.format(self.resource_id)
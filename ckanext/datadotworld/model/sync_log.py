@@ -0,0 +1,39 @@
+# Copyright 2017 data.world, inc
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+from sqlalchemy import (
+    UnicodeText,
+    Integer,
+    DateTime,
+    Column
+)
+from ckanext.datadotworld.model import Base
+
+
+class SyncLog(Base):
+    __tablename__ = 'datadotworld_sync_log'
+
+    id = Column(Integer, primary_key=True)
+    package_id = Column(UnicodeText)
+    created = Column(DateTime)
+    state = Column(UnicodeText)
+    status_code = Column(Integer)
+    error_class = Column(UnicodeText)
+    body = Column(UnicodeText)
+
+    def __repr__(self):
+        return '<DataDotWorldSyncLog:pkg={0},status={1}>'.format(
+            self.package_id, self.status_code
+        )
@@ -0,0 +1,46 @@
+# Copyright 2017 data.world, inc
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Typed access to ``ckan.datadotworld.*`` config options.
+
+Values that can't be converted are logged and replaced with the default.
+"""
+
+import logging
+
+from pylons import config
+
+log = logging.getLogger(__name__)
+
+PREFIX = 'ckan.datadotworld.'
+
+
+def _option(name, default, type_):
+    value = config.get(PREFIX + name, default)
+    try:
+        return type_(value)
+    except (TypeError, ValueError):
+        log.info('Wrong variable format for {0}.'.format(name))
+        return default
+
+
+def int_option(name, default, minimum=None):
+    value = _option(name, default, int)
+    if minimum is not None:
+        return max(value, minimum)
+    return value
+
+
+def float_option(name, default):
+    return _option(name, default, float)
@@ -0,0 +1,110 @@
+# Copyright 2017 data.world, inc
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""Database-backed job queue used instead of Celery/RQ.
+
+Enabled with ``ckan.datadotworld.queue = outbox``. Jobs are stored in
+`datadotworld_outbox` and executed by ``paster datadotworld worker``.
+All statements go through the engine directly, so they never interfere
+with the state of `model.Session`.
+"""
+
+import json
+import logging
+from datetime import datetime, timedelta
+from importlib import import_module
+
+from pylons import config
+from sqlalchemy import and_, or_, select
+
+import ckan.model as model
+from ckanext.datadotworld.model.outbox import Outbox
+
+log = logging.getLogger(__name__)
+
+table = Outbox.__table__
+
+
+def is_enabled():
+    return config.get('ckan.datadotworld.queue') == 'outbox'
+
+
+def _engine():
+    return model.meta.engine
+
+
+def _path(fn):
+    return u'{0}:{1}'.format(fn.__module__, fn.__name__)
+
+
+def resolve(path):
+    module, name = path.split(':')
+    return getattr(import_module(module), name)
+
+
+def put(fn, args=None, owner=None):
+    _engine().execute(table.insert().values(
+        fn=_path(fn), args=json.dumps(args or []),
+        owner=owner or u'', created=datetime.utcnow()))
+
+
+def _available(stale_after):
+    cutoff = datetime.utcnow() - timedelta(seconds=stale_after)
+    return or_(table.c.taken_at == None, table.c.taken_at < cutoff)  # noqa
+
+
+def claim(per_owner, exclude=(), stale_after=3600):
+    """Take up to `per_owner` jobs of every owner. Returns [(id, owner)].
+
+    Owners from `exclude` are skipped. Jobs taken by a worker that died
+    are available again after `stale_after` seconds.
+    """
+    engine = _engine()
+    owners = engine.execute(
+        select([table.c.owner]).where(_available(stale_after)).distinct()
+    ).fetchall()
+    claimed = []
+    for owner, in owners:
+        if owner in exclude:
+            continue
+        query = select([table.c.id]).where(and_(
+            table.c.owner == owner, _available(stale_after)
+        )).order_by(table.c.id).limit(per_owner)
+        for row in engine.execute(query).fetchall():
+            res = engine.execute(table.update().where(and_(
+                table.c.id == row.id, _available(stale_after)
+            )).values(taken_at=datetime.utcnow()))
+            if res.rowcount == 1:
+                claimed.append((row.id, owner))
+    return claimed
+
+
+def get(job_id):
+    row = _engine().execute(
+        select([table.c.fn, table.c.args]).where(table.c.id == job_id)
+    ).first()
+    if row is None:
+        return None
+    return row.fn, json.loads(row.args)
+
+
+def done(job_id):
+    _engine().execute(table.delete().where(table.c.id == job_id))
+
+
+def release(job_ids):
+    if job_ids:
+        _engine().execute(table.update().where(
+            table.c.id.in_(job_ids)).values(taken_at=None))
@@ -0,0 +1,147 @@
+# Copyright 2017 data.world, inc
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""Adaptive delay between data.world requests (AIMD).
+
+Every owner has its own pacer. Successful responses shorten the delay by
+a constant step (additive increase of request rate), 429 responses
+multiply it (multiplicative decrease), so each data.world account runs
+close to its actual rate limit. ``ckan.datadotworld.request_delay`` is
+the initial delay; zero or negative value disables pacing.
+
+Pacers live in worker processes; their current delay is periodically
+(and right after every 429) published into
+`datadotworld_circuit.request_delay`, so it is visible on the
+organization page and through the status action. New pacers start from
+the published delay, so the adaptation carries over between jobs even
+when every job runs in a fresh process.
+"""
+
+import logging
+import threading
+import time
+from datetime import datetime
+
+import ckan.model as model
+from ckanext.datadotworld.model.circuit import Circuit
+from ckanext.datadotworld import options
+
+log = logging.getLogger(__name__)
+
+PUBLISH_INTERVAL = 10
+
+table = Circuit.__table__
+_pacers = {}
+_lock = threading.Lock()
+
+
+def is_enabled():
+    return options.float_option('request_delay', 1) > 0
+
+
+class Pacer(object):
+
+    def __init__(self, delay, min_delay=0.1, max_delay=60, step=0.05,
+                 backoff=2):
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.step = step
+        self.backoff = backoff
+        self.delay = min(max(delay, min_delay), max_delay)
+        self.published = 0
+
+    @property
+    def rate(self):
+        return 1.0 / self.delay if self.delay else None
+
+    def observe(self, status_code):
+        if status_code == 429:
+            self.delay = min(self.delay * self.backoff, self.max_delay)
+        elif status_code is not None and status_code < 500:
+            self.delay = max(self.delay - self.step, self.min_delay)
+
+
+def get(owner):
+    with _lock:
+        pacer = _pacers.get(owner)
+    if pacer is not None:
+        return pacer
+    delay = _stored_delay(owner) or options.float_option('request_delay', 1)
+    with _lock:
+        pacer = _pacers.get(owner)
+        if pacer is None:
+            pacer = _pacers[owner] = Pacer(
+                delay,
+                options.float_option('request_delay_min', 0.1),
+                options.float_option('request_delay_max', 60),
+                options.float_option('pacing_step', 0.05),
+                options.float_option('pacing_backoff', 2))
+        return pacer
+
+
+def observe(owner, status_code):
+    """Feed response status of owner's request into its pacer.
+    """
+    pacer = get(owner)
+    with _lock:
+        pacer.observe(status_code)
+    if status_code == 429 or \
+            time.time() - pacer.published >= PUBLISH_INTERVAL:
+        pacer.published = time.time()
+        _publish(owner, pacer.delay)
+
+
+def pause(owner):
+    """Sleep for the current delay of owner.
+    """
+    if not is_enabled():
+        return False
+    time.sleep(get(owner).delay)
+    return True
+
+
+def _publish(owner, delay):
+    try:
+        engine = model.meta.engine
+        res = engine.execute(table.update().where(
+            table.c.scope == owner
+        ).values(request_delay=delay))
+        if res.rowcount == 0:
+            engine.execute(table.insert().values(
+                scope=owner, state=u'closed', failures=0,
+                modified=datetime.utcnow(), request_delay=delay))
+        log.debug('[{0}] Request rate: {1:.2f}/s'.format(owner, 1.0 / delay))
+    except Exception as e:
+        log.error('[pacing problem] {0}'.format(e))
+
+
+def _stored_delay(owner):
+    try:
+        return model.meta.engine.execute(
+            table.select().with_only_columns([table.c.request_delay]).where(
+                table.c.scope == owner)).scalar()
+    except Exception as e:
+        log.error('[pacing problem] {0}'.format(e))
+        return None
+
+
+def status(owner):
+    """Last published delay and rate of owner.
+    """
+    delay = _stored_delay(owner)
+    return {
+        'request_delay': delay,
+        'rate': 1.0 / delay if delay else None
+    }
@@ -0,0 +1,136 @@
+# Copyright 2017 data.world, inc
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Offline dry run of organization sync.
+
+For every package of organization the planner builds data.world payload
+and compares it with the fingerprint stored after the last successful
+push, without any requests to data.world. Packages are processed by a
+pool of processes, each of them handles chunks of package ids.
+"""
+
+import logging
+from collections import defaultdict
+from multiprocessing import Pool
+
+import ckan.model as model
+from ckan.logic import NotFound, get_action
+from ckanext.datadotworld.model import States
+from ckanext.datadotworld.model.extras import Extras
+import ckanext.datadotworld.api as api
+
+log = logging.getLogger(__name__)
+
+CREATE = 'create'
+UPDATE = 'update'
+DELETE = 'delete'
+NONE = 'none'
+SKIP = 'skip'
+CHUNK_SIZE = 200
+
+
+def plan_package(pkg_id):
+    """Action that sync of package would perform.
+
+    Every create and update sends the full list of files, so `files` is
+    the number of file operations data.world would run.
+    """
+    plan = dict(id=pkg_id, name=None, action=SKIP, files=0, reason=None)
+    try:
+        pkg_dict = get_action('package_show')(
+            api.get_context(), {'id': pkg_id})
+    except NotFound:
+        return plan
+    plan['name'] = pkg_dict['name']
+    if pkg_dict.get('type', 'dataset') != 'dataset':
+        return plan
+    if not api._get_creds_if_must_sync(pkg_dict):
+        plan['reason'] = 'integration disabled'
+        return plan
+    if pkg_dict.get('state') == 'draft':
+        return plan
+
+    extras = model.Session.query(Extras).get(pkg_id)
+    synced = extras is not None and extras.id
+    if pkg_dict.get('state') == 'deleted':
+        plan['action'] = DELETE if synced else NONE
+        return plan
+
+    files = len(pkg_dict.get('resources') or [])
+    if not synced:
+        plan.update(action=CREATE, files=files, reason='new')
+    elif extras.state != States.uptodate:
+        plan.update(action=UPDATE, files=files, reason=extras.state)
+    elif extras.fingerprint != api.payload_fingerprint(pkg_dict):
+        plan.update(action=UPDATE, files=files, reason='changed')
+    else:
+        plan['action'] = NONE
+    return plan
+
+
+def _init_child(ckan_ini_filepath):
+    # connections inherited from parent must not be shared
+    model.meta.engine.dispose()
+    api.load_config(ckan_ini_filepath)
+    api.register_translator()
+
+
+def _plan_chunk(ids):
+    try:
+        return [plan_package(pkg_id) for pkg_id in ids]
+    finally:
+        model.Session.remove()
+
+
+def _chunks(ids, size):
+    for start in range(0, len(ids), size):
+        yield ids[start:start + size]
+
+
+def plan_org(org_id, processes=1, chunk_size=CHUNK_SIZE):
+    """Iterate over plans of every package of organization.
+    """
+    ids = [row.id for row in model.Session.query(model.Package.id).filter(
+        model.Package.owner_org == org_id
+    ).order_by(model.Package.id)]
+    if processes <= 1:
+        for chunk in _chunks(ids, chunk_size):
+            for plan in _plan_chunk(chunk):
+                yield plan
+        return
+    # forked children must not inherit connection of the session
+    model.Session.remove()
+    model.meta.engine.dispose()
+    pool = Pool(processes, _init_child, (api.ckan_ini_filepath(),))
+    try:
+        for plans in pool.imap_unordered(
+                _plan_chunk, _chunks(ids, chunk_size)):
+            for plan in plans:
+                yield plan
+        pool.close()
+    except BaseException:
+        pool.terminate()
+        raise
+    finally:
+        pool.join()
+
+
+def summarize(plans):
+    """Totals of actions and file operations.
+    """
+    summary = defaultdict(int)
+    for plan in plans:
+        summary[plan['action']] += 1
+        summary['files'] += plan['files']
+    return dict(summary)
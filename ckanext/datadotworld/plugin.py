@@ -17,28 +17,55 @@ import ckan.plugins.toolkit as toolkit
 from ckanext.datadotworld.model.credentials import Credentials
 import ckan.model as model
 import logging
-import ckanext.datadotworld.tasks as tasks
 import ckanext.datadotworld.api as api
+from ckanext.datadotworld import deferred
 import ckanext.datadotworld.helpers as dh
-import os
-from pylons import config
+import ckanext.datadotworld.logic.action as action
+import ckanext.datadotworld.logic.auth as auth
 
 
 log = logging.getLogger(__name__)
 
+FILE_SYNC_KEY = 'datadotworld_file_sync'
+FILE_NAME_KEY = 'datadotworld_file_name'
+
 
 class DatadotworldPlugin(plugins.SingletonPlugin):
     plugins.implements(plugins.IConfigurer)
     plugins.implements(plugins.IRoutes, inherit=True)
     plugins.implements(plugins.IPackageController, inherit=True)
+    plugins.implements(plugins.IResourceController, inherit=True)
     plugins.implements(plugins.ITemplateHelpers)
+    plugins.implements(plugins.IActions)
+    plugins.implements(plugins.IAuthFunctions)
+
+    # IActions
+
+    def get_actions(self):
+        return {
+            'datadotworld_status_show': action.datadotworld_status_show,
+            'datadotworld_sync_list': action.datadotworld_sync_list,
+            'bulk_update_private': action.bulk_update_private,
+            'bulk_update_public': action.bulk_update_public,
+            'bulk_update_delete': action.bulk_update_delete
+        }
+
+    # IAuthFunctions
+
+    def get_auth_functions(self):
+        return {
+            'datadotworld_status_show': auth.datadotworld_status_show,
+            'datadotworld_sync_list': auth.datadotworld_sync_list
+        }
 
     # ITemplateHelpers
 
     def get_helpers(self):
         return {
             'datadotworld_link': api.API.generate_link,
-            'datadotworld_creds': api.API.creds_from_id,
+            'datadotworld_creds': dh.creds_from_id,
+            'datadotworld_remote_id': dh.remote_id,
+            'datadotworld_preload': dh.preload,
             'datadotworld_admin_in_orgs': dh.admin_in_orgs
         }
 
@@ -57,42 +84,102 @@ class DatadotworldPlugin(plugins.SingletonPlugin):
             '/organization/edit/{id}/data.world',
             controller='ckanext.datadotworld.controller:DataDotWorldController',
             action='edit')
+        map.connect(
+            'export_dataworld_state',
+            '/data.world/export.{format:ndjson|csv}',
+            controller='ckanext.datadotworld.controller:DataDotWorldController',
+            action='export_state')
+        map.connect(
+            'export_dataworld_state_for_org',
+            '/data.world/{org_id}/export.{format:ndjson|csv}',
+            controller='ckanext.datadotworld.controller:DataDotWorldController',
+            action='export_state')
+        map.connect(
+            'dataworld_status',
+            '/data.world/{org_id}/status.json',
+            controller='ckanext.datadotworld.controller:DataDotWorldController',
+            action='status', action_name='datadotworld_status_show')
+        map.connect(
+            'dataworld_sync_list',
+            '/data.world/{org_id}/sync.json',
+            controller='ckanext.datadotworld.controller:DataDotWorldController',
+            action='status', action_name='datadotworld_sync_list')
         map.connect(
             'list_dataworld_sync',
-            '/data.world/{state:failed|pending|up-to-date|deleted}',
+            '/data.world/{state:failed|dead|pending|up-to-date|deleted}',
             controller='ckanext.datadotworld.controller:DataDotWorldController',
             action='list_sync')
         map.connect(
             'list_dataworld_sync_for_org',
-            '/data.world/{org_id}/{state:failed|pending|up-to-date|deleted}',
+            '/data.world/{org_id}/{state:failed|dead|pending|up-to-date|deleted}',
             controller='ckanext.datadotworld.controller:DataDotWorldController',
             action='list_sync')
 
 
         return map
 
-    # IPackageController
+    # IPackageController and IResourceController
+    #
+    # Both interfaces use the same names for `after_*` hooks, so hooks
+    # below tell package from resource by their arguments.
+
+    def _enqueue(self, data_dict):
+        deferred.add(data_dict['id'])
+
+    def _file_sync(self, context, pkg_id):
+        """Decide whether resource change can be pushed as single file.
+
+        Package hooks triggered by the resource action see the flag and
+        skip full sync.
+        """
+        context[FILE_SYNC_KEY] = api.file_sync_mode(pkg_id) == 'file'
+        return context[FILE_SYNC_KEY]
+
+    def before_create(self, context, resource):
+        self._file_sync(context, resource.get('package_id'))
+
+    def before_update(self, context, current, resource):
+        if self._file_sync(context, current['package_id']):
+            context[FILE_NAME_KEY] = api.resource_file_name(current)
+
+    def before_delete(self, context, resource, resources):
+        current = model.Resource.get(resource['id'])
+        if current is None:
+            return
+        if self._file_sync(context, current.package_id):
+            # nothing is sent before commit, so it's safe to schedule here
+            deferred.add_file(
+                current.package_id, current.id, 'delete',
+                api.resource_file_name(dict(
+                    url=current.url, name=current.name,
+                    format=current.format)))
 
     def after_create(self, context, data_dict):
-        ckan_ini_filepath = os.path.abspath(config['__file__'])
-        api.compat_enqueue(
-            'datadotworld.syncronize',
-            tasks.syncronize,
-            args=[data_dict['id'], ckan_ini_filepath])
+        if 'package_id' in data_dict:
+            if context.get(FILE_SYNC_KEY):
+                # resource hooks run after the action committed
+                deferred.push_file(
+                    data_dict['package_id'], data_dict['id'], 'create')
+        elif api.is_sync_required(data_dict):
+            self._enqueue(data_dict)
         return data_dict
 
     def after_update(self, context, data_dict):
-        ckan_ini_filepath = os.path.abspath(config['__file__'])
-        api.compat_enqueue(
-            'datadotworld.syncronize',
-            tasks.syncronize,
-            args=[data_dict['id'], ckan_ini_filepath])
+        if 'package_id' in data_dict:
+            if context.get(FILE_SYNC_KEY):
+                deferred.push_file(
+                    data_dict['package_id'], data_dict['id'], 'update',
+                    context.get(FILE_NAME_KEY))
+        elif context.get(FILE_SYNC_KEY):
+            # changed file is pushed by resource hooks
+            return data_dict
+        elif api.is_sync_required(data_dict):
+            self._enqueue(data_dict)
         return data_dict
 
     def after_delete(self, context, data_dict):
-        ckan_ini_filepath = os.path.abspath(config['__file__'])
-        api.compat_enqueue(
-            'datadotworld.syncronize',
-            tasks.syncronize,
-            args=[data_dict['id'], ckan_ini_filepath])
+        # resource hook gets list of remaining resources, deleted one is
+        # already scheduled by `before_delete`
+        if not isinstance(data_dict, list):
+            self._enqueue(data_dict)
         return data_dict
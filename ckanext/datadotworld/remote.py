@@ -0,0 +1,171 @@
+# Copyright 2017 data.world, inc
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Per-owner cache of datasets that exist on data.world.
+
+`API.sync` uses it to choose between create and update without the
+GET/PUT/404 round trips for datasets removed on data.world, and the dirty
+check uses prefetched metadata instead of GET when it is available. Ids
+are collected from successful requests and, for bulk runs, ids and
+metadata are prefetched from dataset listings of the owner. Only prefetched owners have a complete
+list of ids, so a dataset can be reported as missing only for them.
+Entries expire after ``ckan.datadotworld.remote_cache_ttl`` seconds and
+are dropped from memory when the next prefetch runs.
+"""
+
+import logging
+import threading
+import time
+
+import requests
+
+from ckanext.datadotworld import options
+
+log = logging.getLogger(__name__)
+
+LISTINGS = ('/user/datasets/own', '/user/datasets/contributing')
+PAGE_SIZE = 100
+
+_lock = threading.Lock()
+_owners = {}
+
+
+def ttl():
+    return options.float_option('remote_cache_ttl', 300.0)
+
+
+class _Owner(object):
+
+    def __init__(self):
+        self.datasets = {}
+        self.complete_until = 0
+        self.failed_until = 0
+
+    @property
+    def complete(self):
+        return self.complete_until > time.time()
+
+
+def _get(owner):
+    entry = _owners.get(owner)
+    if entry is None:
+        entry = _owners[owner] = _Owner()
+    return entry
+
+
+def exists(owner, id):
+    """True/False when known, None when the cache can't tell.
+    """
+    with _lock:
+        entry = _owners.get(owner)
+        if entry is None:
+            return None
+        cached = entry.datasets.get(id)
+        if cached is not None and cached[0] > time.time():
+            return True
+        return False if entry.complete else None
+
+
+def metadata(owner, id):
+    """Cached remote dataset (as returned by data.world) or None.
+    """
+    with _lock:
+        cached = _owners.get(owner, _Owner()).datasets.get(id)
+    if cached is None or cached[0] <= time.time():
+        return None
+    return cached[1]
+
+
+def add(owner, id, data=None):
+    with _lock:
+        _get(owner).datasets[id] = (time.time() + ttl(), data)
+
+
+def remove(owner, id):
+    with _lock:
+        entry = _owners.get(owner)
+        if entry is not None:
+            entry.datasets.pop(id, None)
+
+
+def clear():
+    with _lock:
+        _owners.clear()
+
+
+def _prune(now):
+    """Drop expired entries. Must be called with `_lock` held.
+    """
+    for owner, entry in list(_owners.items()):
+        entry.datasets = dict(
+            (id, cached) for id, cached in entry.datasets.items()
+            if cached[0] > now)
+        if not entry.datasets and entry.complete_until <= now \
+                and entry.failed_until <= now:
+            del _owners[owner]
+
+
+def _failed(owner, reason):
+    log.warn('[{0}] Unable to list datasets: {1}'.format(owner, reason))
+    with _lock:
+        _get(owner).failed_until = time.time() + ttl()
+    return False
+
+
+def prefetch(api):
+    """Load every dataset of `api.owner` visible to its key.
+
+    Does nothing if the owner was prefetched (or listing failed) less
+    than `ttl` ago. Returns False when listing failed.
+    """
+    with _lock:
+        entry = _get(api.owner)
+        if entry.complete:
+            return True
+        if entry.failed_until > time.time():
+            return False
+        _prune(time.time())
+    datasets = {}
+    for path in LISTINGS:
+        url = api.api_root + path + '?limit={0}'.format(PAGE_SIZE)
+        next_token = None
+        while True:
+            page_url = url
+            if next_token:
+                page_url += '&next={0}'.format(next_token)
+            try:
+                res = api._get(page_url)
+                if res.status_code != 200:
+                    return _failed(api.owner, res.status_code)
+                body = res.json()
+            except (requests.RequestException, ValueError) as e:
+                return _failed(api.owner, e)
+            for record in body.get('records', []):
+                if record.get('owner') == api.owner:
+                    datasets[record['id']] = record
+            next_token = body.get('nextPageToken')
+            if not next_token:
+                break
+    expires = time.time() + ttl()
+    with _lock:
+        entry = _get(api.owner)
+        for id, record in datasets.items():
+            # listings contain files only for some datasets, partial
+            # records are good only for existence checks
+            entry.datasets[id] = (
+                expires, record if 'files' in record else None)
+        entry.complete_until = expires
+    log.info('[{0}] Prefetched {1} remote datasets'.format(
+        api.owner, len(datasets)))
+    return True
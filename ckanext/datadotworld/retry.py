@@ -0,0 +1,106 @@
+# Copyright 2017 data.world, inc
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Classification of failed pushes and retry schedule.
+
+Failures that can't go away by themselves (invalid payload, name
+conflicts, rejected credentials) are permanent: the dataset moves to the
+``dead`` state and is retried only by ``paster datadotworld requeue_dead``
+or when the dataset is updated. Other failures are transient and
+are retried by ``push_failed`` with exponential backoff between
+``ckan.datadotworld.retry_base`` and ``ckan.datadotworld.retry_max``
+seconds.
+"""
+
+import logging
+from datetime import datetime, timedelta
+
+import ckan.model as model
+from ckanext.datadotworld.model import States
+from ckanext.datadotworld.model.extras import Extras
+from ckanext.datadotworld import options
+
+log = logging.getLogger(__name__)
+
+TRANSIENT = 'transient'
+PERMANENT = 'permanent'
+
+PERMANENT_CODES = (400, 401, 403, 409, 410, 413, 422)
+TRANSIENT_HINTS = (
+    'try again', 'timeout', 'timed out', 'temporarily', 'rate limit',
+    'unavailable'
+)
+
+
+def classify(status_code, body=None):
+    """Whether failure with given response is transient or permanent.
+    """
+    if status_code not in PERMANENT_CODES:
+        return TRANSIENT
+    if body:
+        if isinstance(body, bytes):
+            body = body.decode('utf-8', 'replace')
+        text = body.lower()
+        if any(hint in text for hint in TRANSIENT_HINTS):
+            return TRANSIENT
+    return PERMANENT
+
+
+def backoff(failures):
+    """Delay (sec) before the next attempt after `failures` in a row.
+    """
+    base = options.int_option('retry_base', 300)
+    limit = options.int_option('retry_max', 24 * 3600)
+    return min(base * 2 ** min(max(failures - 1, 0), 30), limit)
+
+
+def settle(extras, status_code, body=None):
+    """Update retry bookkeeping of extras after push.
+    """
+    if extras.state == States.uptodate:
+        extras.failures = 0
+        extras.next_attempt_at = None
+        return
+    if extras.state != States.failed:
+        return
+    if classify(status_code, body) == PERMANENT:
+        extras.state = States.dead
+        extras.next_attempt_at = None
+        log.error('[{0}] Permanent failure ({1}), moved to dead state'.format(
+            extras.id, status_code))
+        return
+    extras.failures = (extras.failures or 0) + 1
+    extras.next_attempt_at = datetime.utcnow() + timedelta(
+        seconds=backoff(extras.failures))
+
+
+def requeue(org_id=None):
+    """Move dead datasets back to pending and reset their retry schedule.
+
+    Returns number of requeued datasets. Single UPDATE statement, no ORM
+    objects are loaded.
+    """
+    query = model.Session.query(Extras).filter(Extras.state == States.dead)
+    if org_id:
+        package_ids = model.Session.query(model.Package.id).filter(
+            model.Package.owner_org == org_id
+        ).subquery()
+        query = query.filter(Extras.package_id.in_(package_ids))
+    amount = query.update({
+        'state': States.pending,
+        'failures': 0,
+        'next_attempt_at': None
+    }, synchronize_session=False)
+    model.Session.commit()
+    return amount
@@ -0,0 +1,303 @@
+# Copyright 2017 data.world, inc
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Fair dispatching of bulk synchronization across data.world owners.
+
+Bulk operations (push_failed, push_pending) never put the whole backlog into
+the job queue. Instead every owner gets at most ``owner_in_flight`` job
+chains: each job syncs a batch of packages and enqueues the rest of its
+range, so one owner never has more than that many jobs waiting in the
+queue and small organizations keep low latency.
+
+Every range is stored in `datadotworld_range` together with the id of the
+last synced package. A chain that died mid-range is continued from that
+checkpoint by the next dispatch once it made no progress for
+``range_stale_after`` seconds; finished ranges are removed.
+"""
+
+import logging
+from collections import OrderedDict, deque
+from datetime import datetime, timedelta
+
+from sqlalchemy import or_
+
+import ckan.model as model
+from ckanext.datadotworld.model import States
+from ckanext.datadotworld.model.credentials import Credentials
+from ckanext.datadotworld.model.extras import Extras
+from ckanext.datadotworld.model.sync_range import SyncRange
+from ckanext.datadotworld import batch, options, timing
+import ckanext.datadotworld.api as api
+from ckanext.datadotworld.api import (
+    compat_enqueue, load_config, register_translator, notify
+)
+
+log = logging.getLogger(__name__)
+
+DEFAULT_IN_FLIGHT = 2
+DEFAULT_STALE_AFTER = 600
+
+
+def owner_in_flight_limit():
+    return options.int_option(
+        'owner_in_flight', DEFAULT_IN_FLIGHT, minimum=1)
+
+
+def range_stale_after():
+    return options.int_option(
+        'range_stale_after', DEFAULT_STALE_AFTER, minimum=1)
+
+
+class FairScheduler(object):
+    """Round-robin queue of work items grouped by owner.
+
+    Each owner has its own FIFO. ``pop`` visits owners in turn, taking up
+    to ``weights[owner]`` (default 1) items per turn, and skips owners
+    that already have ``limit`` items in flight until ``release`` is
+    called for them.
+    """
+
+    def __init__(self, limit=DEFAULT_IN_FLIGHT, weights=None):
+        self.limit = limit
+        self.weights = weights or {}
+        self._queues = OrderedDict()
+        self._in_flight = {}
+        self._quantum = 0
+
+    def __len__(self):
+        return sum(len(queue) for queue in self._queues.values())
+
+    def add(self, owner, item):
+        self._queues.setdefault(owner, deque()).append(item)
+
+    def in_flight(self, owner):
+        return self._in_flight.get(owner, 0)
+
+    def busy_owners(self):
+        """Owners that either have queued items or reached the limit.
+        """
+        owners = set(self._queues)
+        owners.update(
+            owner for owner, amount in self._in_flight.items()
+            if amount >= self.limit)
+        return owners
+
+    def release(self, owner):
+        if self._in_flight.get(owner):
+            self._in_flight[owner] -= 1
+
+    def pop(self):
+        """Return next ``(owner, item)`` pair or None.
+
+        None means either that there is no work left or that every owner
+        with queued work is at its in-flight limit.
+        """
+        for _ in range(len(self._queues)):
+            if not self._queues:
+                break
+            owner, queue = next(iter(self._queues.items()))
+            if queue and self.in_flight(owner) < self.limit:
+                item = queue.popleft()
+                self._in_flight[owner] = self.in_flight(owner) + 1
+                self._quantum += 1
+                if not queue:
+                    del self._queues[owner]
+                    self._quantum = 0
+                elif self._quantum >= self.weights.get(owner, 1):
+                    self._rotate()
+                return owner, item
+            if not queue:
+                del self._queues[owner]
+            else:
+                self._rotate()
+        return None
+
+    def _rotate(self):
+        owner, queue = self._queues.popitem(last=False)
+        self._queues[owner] = queue
+        self._quantum = 0
+
+
+def _package_query(owner, state=None):
+    query = model.Session.query(model.Package.id).join(
+        Credentials,
+        Credentials.organization_id == model.Package.owner_org
+    ).filter(
+        Credentials.owner == owner,
+        Credentials.integration == True  # noqa
+    )
+    if state:
+        query = query.join(
+            Extras, Extras.package_id == model.Package.id
+        ).filter(Extras.state == state)
+        if state == States.failed:
+            query = query.filter(or_(
+                Extras.next_attempt_at == None,  # noqa
+                Extras.next_attempt_at <= datetime.utcnow()))
+    return query
+
+
+def _split_offsets(total, parts):
+    """Offsets of last rows of the first `parts - 1` ranges of `total` rows.
+    """
+    if not total:
+        return None
+    size = max(total // parts, 1)
+    return list(range(size - 1, total, size))[:parts - 1]
+
+
+def _range_heads(owner, state=None):
+    """Split packages into (after, upper) ranges without loading them.
+    """
+    query = _package_query(owner, state)
+    offsets = _split_offsets(query.count(), owner_in_flight_limit())
+    if offsets is None:
+        return []
+    ordered = query.order_by(model.Package.id)
+    uppers = [
+        ordered.offset(offset).limit(1).scalar() for offset in offsets
+    ] + [None]
+    ranges = []
+    after = None
+    for upper in uppers:
+        ranges.append((after, upper))
+        after = upper
+    return ranges
+
+
+def _enqueue_range(sync_range, ckan_ini_filepath):
+    compat_enqueue(
+        'datadotworld.syncronize_range',
+        syncronize_range,
+        args=[sync_range.id, sync_range.cursor, ckan_ini_filepath,
+              timing.now()],
+        owner=sync_range.owner)
+
+
+def _dispatch(scheduler, ckan_ini_filepath):
+    while True:
+        task = scheduler.pop()
+        if task is None:
+            break
+        _, sync_range = task
+        _enqueue_range(sync_range, ckan_ini_filepath)
+
+
+def _owner_ranges(owner, state, threshold):
+    """Ranges of owner that have to be (re)started.
+
+    Stale ranges are resumed from their checkpoints. Owner whose ranges
+    are still making progress gets nothing, otherwise the packages are
+    split into new ranges.
+    """
+    ranges = model.Session.query(SyncRange).filter(
+        SyncRange.owner == owner, SyncRange.state == state
+    ).order_by(SyncRange.id).all()
+    if ranges:
+        stale = [
+            sync_range for sync_range in ranges
+            if sync_range.modified is None or sync_range.modified < threshold
+        ]
+        for sync_range in stale:
+            log.info('[{0}] Resume range ({1}, {2}]'.format(
+                owner, sync_range.cursor, sync_range.upper))
+        return stale
+    now = datetime.utcnow()
+    ranges = [
+        SyncRange(owner=owner, state=state, cursor=after, upper=upper,
+                  modified=now)
+        for after, upper in _range_heads(owner, state=state)
+    ]
+    model.Session.add_all(ranges)
+    return ranges
+
+
+def dispatch_state(state):
+    """Start fair synchronization of packages in given state for all owners.
+    """
+    ckan_ini_filepath = api.ckan_ini_filepath()
+    scheduler = FairScheduler(owner_in_flight_limit())
+    threshold = datetime.utcnow() - timedelta(seconds=range_stale_after())
+    owners = model.Session.query(Credentials.owner).filter(
+        Credentials.integration == True  # noqa
+    ).distinct()
+    for owner, in owners:
+        for sync_range in _owner_ranges(owner, state, threshold):
+            sync_range.modified = datetime.utcnow()
+            scheduler.add(owner, sync_range)
+    model.Session.commit()
+    _dispatch(scheduler, ckan_ini_filepath)
+
+
+def next_in_range(owner, state, after, upper):
+    query = _package_query(owner, state)
+    if after is not None:
+        query = query.filter(model.Package.id > after)
+    if upper is not None:
+        query = query.filter(model.Package.id <= upper)
+    row = query.order_by(model.Package.id).first()
+    return row.id if row else None
+
+
+def syncronize_range(range_id, cursor, ckan_ini_filepath, enqueued_at=None):
+    """Sync next batch of packages from the range and enqueue the rest.
+
+    Job whose `cursor` differs from the stored checkpoint belongs to the
+    chain that was already resumed and does nothing.
+    """
+    load_config(ckan_ini_filepath)
+    register_translator()
+    sync_range = model.Session.query(SyncRange).get(range_id)
+    if sync_range is None:
+        return
+    if sync_range.cursor != cursor:
+        log.info('Range {0} moved past {1}, duplicate job skipped'.format(
+            range_id, cursor))
+        return
+    owner, state, upper = (
+        sync_range.owner, sync_range.state, sync_range.upper)
+
+    after = cursor
+    finished = False
+    with batch.CommitBatch() as unit:
+        for _ in range(unit.size):
+            pkg_id = next_in_range(owner, state, after, upper)
+            if pkg_id is None:
+                finished = True
+                break
+            try:
+                with timing.SyncJob(pkg_id, 0, enqueued_at):
+                    notify(pkg_id)
+            except Exception as e:
+                log.error('[{0}] Range sync problem: {1}'.format(pkg_id, e))
+                unit.flush()
+            after = pkg_id
+
+    query = model.Session.query(SyncRange).filter(
+        SyncRange.id == range_id, SyncRange.cursor == cursor)
+    if finished:
+        moved = query.delete(synchronize_session=False)
+    else:
+        moved = query.update(
+            {'cursor': after, 'modified': datetime.utcnow()},
+            synchronize_session=False)
+    model.Session.commit()
+    if not moved:
+        log.info('Range {0} after {1} checkpointed by another chain'.format(
+            range_id, cursor))
+    elif finished:
+        log.info('[{0}] Range {1} finished'.format(owner, range_id))
+    else:
+        model.Session.refresh(sync_range)
+        _enqueue_range(sync_range, ckan_ini_filepath)
@@ -0,0 +1,107 @@
+# Copyright 2017 data.world, inc
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Append-only history of sync attempts.
+
+Every attempt to push a package writes one row with resulting state,
+HTTP status, error class and response body cut to
+``ckan.datadotworld.sync_log_body_size`` characters. `Extras.last_log_id`
+points to the newest row. Rows are written with the engine, outside of
+`model.Session`, so history survives rollbacks of batched sync state.
+Rows older than ``ckan.datadotworld.sync_log_retention`` days, except the
+ones referenced from `Extras`, are removed by `prune`.
+"""
+
+from datetime import datetime, timedelta
+
+from sqlalchemy import select
+
+import ckan.model as model
+from ckanext.datadotworld.model.extras import Extras
+from ckanext.datadotworld.model.sync_log import SyncLog
+from ckanext.datadotworld import options
+
+table = SyncLog.__table__
+
+
+def body_size():
+    return options.int_option('sync_log_body_size', 2048)
+
+
+def retention():
+    return options.int_option('sync_log_retention', 30)
+
+
+def error_class(status_code):
+    if status_code is None:
+        return u'connection'
+    if status_code < 400:
+        return None
+    if status_code == 404:
+        return u'not_found'
+    if status_code == 429:
+        return u'rate_limited'
+    if status_code < 500:
+        return u'client_error'
+    return u'server_error'
+
+
+def _truncate(body):
+    if body is None:
+        return None
+    if isinstance(body, bytes):
+        body = body.decode('utf-8', 'replace')
+    return body[:body_size()]
+
+
+def append(package_id, state, status_code=None, body=None):
+    """Write log entry and return its id.
+    """
+    result = model.meta.engine.execute(table.insert().values(
+        package_id=package_id,
+        created=datetime.utcnow(),
+        state=state,
+        status_code=status_code,
+        error_class=error_class(status_code),
+        body=_truncate(body)))
+    return result.inserted_primary_key[0]
+
+
+def history(package_id, limit=20):
+    return model.Session.query(SyncLog).filter(
+        SyncLog.package_id == package_id
+    ).order_by(SyncLog.created.desc()).limit(limit).all()
+
+
+def prune(days=None, chunk=1000):
+    """Delete old entries in chunks, keeping the latest one of package.
+
+    :returns: amount of deleted rows
+    """
+    days = retention() if days is None else days
+    threshold = datetime.utcnow() - timedelta(days=days)
+    latest = select([Extras.last_log_id]).where(
+        Extras.last_log_id != None)  # noqa
+    engine = model.meta.engine
+    deleted = 0
+    while True:
+        ids = [row.id for row in engine.execute(
+            select([table.c.id]).where(
+                table.c.created < threshold
+            ).where(~table.c.id.in_(latest)).limit(chunk))]
+        if not ids:
+            break
+        engine.execute(table.delete().where(table.c.id.in_(ids)))
+        deleted += len(ids)
+    return deleted
@@ -13,9 +13,33 @@
 # limitations under the License.
 
 from ckan.lib.celery_app import celery
-from ckanext.datadotworld.api import syncronize
+from ckanext.datadotworld.api import (
+    syncronize, syncronize_many, syncronize_files
+)
+from ckanext.datadotworld.scheduler import syncronize_range
+from ckanext.datadotworld.bootstrap import syncronize_bootstrap
 
 
 @celery.task(name="datadotworld.syncronize")
 def datadotworld_syncronize(*args, **kwargs):
     syncronize(*args, **kwargs)
+
+
+@celery.task(name="datadotworld.syncronize_range")
+def datadotworld_syncronize_range(*args, **kwargs):
+    syncronize_range(*args, **kwargs)
+
+
+@celery.task(name="datadotworld.syncronize_many")
+def datadotworld_syncronize_many(*args, **kwargs):
+    syncronize_many(*args, **kwargs)
+
+
+@celery.task(name="datadotworld.syncronize_files")
+def datadotworld_syncronize_files(*args, **kwargs):
+    syncronize_files(*args, **kwargs)
+
+
+@celery.task(name="datadotworld.syncronize_bootstrap")
+def datadotworld_syncronize_bootstrap(*args, **kwargs):
+    syncronize_bootstrap(*args, **kwargs)
@@ -0,0 +1,135 @@
+# Copyright 2017 data.world, inc
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for logic/action.py."""
+import ckan.model as model
+from ckan.logic import ValidationError
+from ckan.tests.factories import Dataset, Organization
+from ckan.tests.helpers import reset_db, call_action
+from ckanext.datadotworld.model.extras import Extras
+from ckanext.datadotworld.model import States
+from ckanext.datadotworld.command import DataDotWorldCommand
+from unittest import TestCase
+import mock
+import ckanext.datadotworld.logic.action as action
+from ckanext.datadotworld.model.credentials import Credentials
+import os.path as path
+
+BASE = path.basename(path.abspath(__file__)) + '../../'
+cmd = DataDotWorldCommand(None)
+
+
+def setup_module():
+    reset_db()
+    cmd.run(['init', '-c', BASE + 'test.ini'])
+    cmd.run(['upgrade', '-c', BASE + 'test.ini'])
+
+
+def teardown_module():
+    cmd.run(['downgrade', '-c', BASE + 'test.ini'])
+
+
+class TestStatusActions(TestCase):
+
+    def test_status_and_list(self):
+        org = Organization()
+        for state in (States.uptodate, States.uptodate, States.failed):
+            pkg = Dataset(owner_org=org['id'])
+            model.Session.add(Extras(
+                package_id=pkg['id'], owner='owner', id=pkg['name'],
+                state=state))
+        model.Session.commit()
+
+        status = call_action('datadotworld_status_show', id=org['name'])
+        self.assertEqual({States.uptodate: 2, States.failed: 1},
+                         status['stats'])
+        self.assertTrue(status['etag'])
+
+        result = call_action(
+            'datadotworld_sync_list', id=org['id'], state=States.uptodate,
+            limit=1)
+        self.assertEqual(2, result['count'])
+        self.assertEqual(1, len(result['results']))
+
+        same = call_action(
+            'datadotworld_sync_list', id=org['id'], state=States.uptodate,
+            limit=1)
+        self.assertEqual(result['etag'], same['etag'])
+        other = call_action(
+            'datadotworld_sync_list', id=org['id'], state=States.uptodate,
+            limit=1, offset=1)
+        self.assertNotEqual(result['etag'], other['etag'])
+
+    def test_rename_changes_etag(self):
+        org = Organization()
+        pkg = Dataset(owner_org=org['id'])
+        model.Session.add(Extras(
+            package_id=pkg['id'], owner='owner', id=pkg['name'],
+            state=States.uptodate))
+        model.Session.commit()
+        before = call_action('datadotworld_sync_list', id=org['id'])
+        call_action('package_patch', id=pkg['id'], title='Renamed')
+        after = call_action('datadotworld_sync_list', id=org['id'])
+        self.assertEqual('Renamed', after['results'][0]['title'])
+        self.assertNotEqual(before['etag'], after['etag'])
+
+    def test_credentials_and_pacing_change_etag(self):
+        org = Organization()
+        creds = Credentials(
+            organization_id=org['id'], owner='etag-owner', key='key',
+            integration=True)
+        model.Session.add(creds)
+        model.Session.commit()
+        before = call_action('datadotworld_status_show', id=org['id'])
+
+        creds.integration = False
+        model.Session.commit()
+        disabled = call_action('datadotworld_status_show', id=org['id'])
+        self.assertNotEqual(before['etag'], disabled['etag'])
+        _, etag = action.version_for(
+            'datadotworld_status_show', org['id'], {})
+        self.assertEqual(disabled['etag'], etag)
+
+        with mock.patch(action.__name__ + '.pacing.status',
+                        return_value={'request_delay': 5, 'rate': 0.2}):
+            paced = call_action('datadotworld_status_show', id=org['id'])
+        self.assertNotEqual(disabled['etag'], paced['etag'])
+
+    def test_invalid_paging(self):
+        org = Organization()
+        for field in ('limit', 'offset'):
+            for value in ('-1', 'x'):
+                with self.assertRaises(ValidationError) as cm:
+                    call_action(
+                        'datadotworld_sync_list', id=org['id'],
+                        **{field: value})
+                self.assertEqual([field], list(cm.exception.error_dict))
+
+
+class TestBulkActions(TestCase):
+
+    @mock.patch(action.__name__ + '.deferred.enqueue')
+    def test_bulk_visibility_change_enqueued_once(self, enqueue):
+        org = Organization()
+        pkgs = [Dataset(owner_org=org['id']) for _ in range(3)]
+        ids = sorted(pkg['id'] for pkg in pkgs)
+        action._sync_bulk({'org_id': org['id'], 'datasets': ids})
+        self.assertFalse(enqueue.called)
+
+        model.Session.add(Credentials(
+            organization_id=org['id'], owner='owner', key='key',
+            integration=True))
+        model.Session.commit()
+        call_action('bulk_update_private', org_id=org['id'], datasets=ids)
+        enqueue.assert_called_once_with(ids, True)
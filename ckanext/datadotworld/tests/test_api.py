@@ -17,12 +17,16 @@ import ckan.model as model
 from ckan.tests.factories import Dataset, Organization, User
 from ckanext.datadotworld.model.credentials import Credentials
 from ckanext.datadotworld.model.extras import Extras
+from ckanext.datadotworld.model.sync_log import SyncLog
 import ckanext.datadotworld.api as api
+import ckanext.datadotworld.scheduler as scheduler
 from ckan.tests.helpers import (
-    reset_db
+    reset_db, call_action
 )
 from ckanext.datadotworld.model import States
 from json import dumps, loads
+import gzip
+import io
 from ckanext.datadotworld.command import DataDotWorldCommand
 import mock
 from unittest import TestCase
@@ -119,6 +123,59 @@ class TestAPI(TestCase):
         self.assertTrue(api.notify(pkg['id']))
         sync.assert_called_with(pkg, attempt)
 
+    @mock.patch(api.__name__ + '.API.sync')
+    @mock.patch(api.__name__ + '.breaker.allow')
+    def test_notify_circuit_open(self, allow, sync):
+        allow.return_value = False
+        pkg = Dataset(owner_org=self.org['id'])
+        self.assertFalse(api.notify(pkg['id']))
+        allow.assert_called_once_with(self.creds.owner)
+        self.assertFalse(sync.called)
+
+    @mock.patch(api.__name__ + '.API.sync')
+    @mock.patch(api.__name__ + '.breaker.allow', return_value=False)
+    def test_new_dataset_deferred_while_circuit_open(self, allow, sync):
+        pkg = Dataset(owner_org=self.org['id'])
+        model.Session.query(Extras).filter(
+            Extras.package_id == pkg['id']).delete()
+        model.Session.commit()
+
+        self.assertFalse(api.notify(pkg['id']))
+        extras = model.Session.query(Extras).get(pkg['id'])
+        self.assertEqual(States.pending, extras.state)
+        self.assertEqual(self.creds.owner, extras.owner)
+        pending = scheduler._package_query(
+            self.creds.owner, state=States.pending)
+        self.assertIn(pkg['id'], [row.id for row in pending])
+
+    def test_payload_fingerprint(self):
+        pkg = Dataset()
+        fingerprint = api.payload_fingerprint(pkg)
+        self.assertEqual(fingerprint, api.payload_fingerprint(dict(pkg)))
+
+        changed = dict(pkg, extras=[{'key': 'x', 'value': 'y'}])
+        self.assertEqual(fingerprint, api.payload_fingerprint(changed))
+
+        changed = dict(pkg, title='Changed')
+        self.assertNotEqual(fingerprint, api.payload_fingerprint(changed))
+
+    def test_is_sync_required(self):
+        pkg = Dataset()
+        self.assertFalse(api.is_sync_required(pkg))
+
+        pkg = Dataset(owner_org=self.org['id'])
+        self.assertTrue(api.is_sync_required(pkg))
+
+        extras = Extras(
+            package_id=pkg['id'], owner='owner', id=pkg['name'],
+            state=States.uptodate, fingerprint=api.payload_fingerprint(pkg))
+        model.Session.add(extras)
+        model.Session.commit()
+        self.assertFalse(api.is_sync_required(pkg))
+        with mock.patch(api.__name__ + '.compat_enqueue'):
+            call_action('package_patch', id=pkg['id'], notes='Changed')
+        self.assertTrue(api.is_sync_required(pkg))
+
     def test_prepare_resource_url(self):
         res = {'url': 'a/b/c.csv', 'name': 'File'}
         expect = {
@@ -204,6 +261,13 @@ class TestAPI(TestCase):
         headers = self.api._default_headers()
         get.assert_called_once_with(url='url', headers=headers)
 
+    @mock.patch(api.__name__ + '.breaker.record')
+    @mock.patch('requests.get')
+    def test_get_records_circuit(self, get, record):
+        get.return_value = Response(503)
+        self.api._get('url')
+        record.assert_called_once_with(self.api.owner, 503)
+
     @mock.patch('requests.post')
     def test_post(self, post):
         self.api._post('url', {'a': 1})
@@ -218,6 +282,58 @@ class TestAPI(TestCase):
         data = '{"a": 1}'
         put.assert_called_once_with(url='url', headers=headers, data=data)
 
+    @mock.patch.dict(api.config, {'ckan.datadotworld.gzip_threshold': '8'})
+    @mock.patch('requests.put')
+    def test_put_gzip(self, put):
+        put.return_value = Response(200)
+        self.api._put('url', {'a': 1})
+        headers = put.call_args[1]['headers']
+        self.assertEqual('gzip', headers['Content-Encoding'])
+        data = put.call_args[1]['data']
+        self.assertEqual('{"a": 1}', gzip.GzipFile(
+            fileobj=io.BytesIO(data)).read().decode('utf-8'))
+
+        put.reset_mock()
+        self.api._put('url', {})
+        self.assertNotIn('Content-Encoding', put.call_args[1]['headers'])
+
+    @mock.patch.dict(api.config, {'ckan.datadotworld.gzip_threshold': '1'})
+    @mock.patch.dict(api._gzip_state, {'rejected': False})
+    @mock.patch(api.__name__ + '._delay_request')
+    @mock.patch('requests.put')
+    def test_put_gzip_fallback(self, put, delay):
+        put.side_effect = [Response(415), Response(200), Response(200)]
+        res = self.api._put('url', {'a': 1})
+        self.assertEqual(200, res.status_code)
+        self.assertEqual(2, put.call_count)
+        self.assertEqual('{"a": 1}', put.call_args[1]['data'])
+        self.assertTrue(api._gzip_state['rejected'])
+        self.api._put('url', {'a': 1})
+        self.assertNotIn('Content-Encoding', put.call_args[1]['headers'])
+
+    @mock.patch.dict(api.config, {'ckan.datadotworld.gzip_threshold': '1'})
+    @mock.patch.dict(api._gzip_state, {'rejected': False})
+    @mock.patch(api.__name__ + '._delay_request')
+    @mock.patch(api.__name__ + '.breaker.record')
+    @mock.patch('requests.put')
+    def test_put_gzip_validation_error(self, put, record, delay):
+        put.return_value = Response(400, {'message': 'Invalid license'})
+        res = self.api._put('url', {'a': 1})
+        self.assertEqual(400, res.status_code)
+        self.assertEqual(1, put.call_count)
+        record.assert_called_once_with(self.api.owner, 400)
+        self.assertFalse(api._gzip_state['rejected'])
+
+        put.reset_mock()
+        record.reset_mock()
+        put.side_effect = [
+            Response(400, {'message': 'Unsupported Content-Encoding'}),
+            Response(200)]
+        self.assertEqual(200, self.api._put('url', {'a': 1}).status_code)
+        self.assertEqual(2, put.call_count)
+        record.assert_called_once_with(self.api.owner, 200)
+        delay.assert_called_once_with(self.api.owner)
+
     @mock.patch('requests.delete')
     def test_delete(self, delete):
         self.api._delete('url', {'a': 1})
@@ -358,14 +474,14 @@ class TestAPI(TestCase):
 
         update_required.return_value = False
         self.api._update(data, extras)
-        self.assertEqual(None, extras.message)
+        self.assertFalse(update.called)
         update_required.return_value = True
 
         update.return_value = Response(200, data)
         result = self.api._update(data, extras)
         update.assert_called_once_with(data, 'id')
         self.assertEqual(data, result)
-        self.assertEqual(dumps(data), extras.message)
+        self.assertEqual(dumps(data), self.api.last_response.content)
         self.assertEqual(States.uptodate, extras.state)
 
         extras.state = States.pending
@@ -452,6 +568,73 @@ class TestAPI(TestCase):
         self.assertFalse(create.called)
         self.assertFalse(update.called)
 
+    @mock.patch(api.__name__ + '.API._create_request')
+    def test_sync_writes_log(self, create):
+        pkg = Dataset()
+        create.return_value = Response(500, {'message': 'x' * 5000})
+        self.api.sync(pkg)
+        extras = model.Package.get(pkg['id']).datadotworld_extras
+        entry = model.Session.query(SyncLog).get(extras.last_log_id)
+        self.assertEqual(pkg['id'], entry.package_id)
+        self.assertEqual(States.failed, entry.state)
+        self.assertEqual(500, entry.status_code)
+        self.assertEqual('server_error', entry.error_class)
+        self.assertEqual(2048, len(entry.body))
+
+    @mock.patch('requests.post')
+    def test_sync_logs_connection_error(self, post):
+        pkg = Dataset()
+        post.side_effect = api.requests.ConnectionError('reset')
+        with self.assertRaises(api.requests.ConnectionError):
+            self.api.sync(pkg)
+        entry = model.Session.query(SyncLog).filter(
+            SyncLog.package_id == pkg['id']).one()
+        self.assertEqual(None, entry.status_code)
+        self.assertEqual('connection', entry.error_class)
+        self.assertIn('reset', entry.body)
+
+    @mock.patch(api.__name__ + '.API._create')
+    def test_sync_records_timing(self, create):
+        pkg = Dataset()
+        with api.timing.SyncJob(pkg['id'], 2, api.timing.now() - 5):
+            self.api.sync(pkg, 2)
+        extras = model.Package.get(pkg['id']).datadotworld_extras
+        self.assertEqual(3, extras.attempts)
+        self.assertTrue(extras.duration_ms >= 0)
+        self.assertTrue(extras.enqueued_at < extras.started_at)
+        self.assertTrue(extras.started_at <= extras.finished_at)
+
+    @mock.patch(api.__name__ + '.API._delete')
+    @mock.patch(api.__name__ + '.API._post')
+    def test_sync_file(self, post, delete):
+        pkg = Dataset()
+        model.Session.add(Extras(
+            package_id=pkg['id'], owner='owner', id='remote',
+            state=States.uptodate))
+        model.Session.commit()
+        res = {'id': 'res', 'url': 'http://example.com/new.csv',
+               'name': 'new.csv', 'format': 'csv'}
+        pkg['resources'] = [res]
+
+        post.return_value = Response(200)
+        delete.return_value = Response(404)
+        self.api.sync_file(pkg, 'res', 'update', 'old.csv')
+        delete.assert_called_once_with(
+            'https://api.data.world/v0/datasets/owner/remote/files/old.csv',
+            {})
+        post.assert_called_once_with(
+            'https://api.data.world/v0/datasets/owner/remote/files',
+            {'files': [api._prepare_resource_url(res)]})
+        extras = model.Package.get(pkg['id']).datadotworld_extras
+        self.assertEqual(States.uptodate, extras.state)
+        self.assertEqual(api.payload_fingerprint(pkg), extras.fingerprint)
+
+        post.reset_mock()
+        delete.reset_mock()
+        self.api.sync_file(pkg, 'res', 'delete', 'new.csv')
+        self.assertFalse(post.called)
+        self.assertEqual(1, delete.call_count)
+
     @mock.patch(api.__name__ + '.API._get')
     def test_sync_resources(self, get):
         url = 'https://api.data.world/v0/datasets/owner/x/sync'
@@ -469,6 +652,26 @@ class TestAPI(TestCase):
         check = self.api.check_credentials()
         self.assertFalse(check)
 
+    @mock.patch(api.__name__ + '.API._get')
+    def test_check_credentials_cache(self, get):
+        client = api.API('cached-owner', 'cached-key')
+        get.return_value = Response(200)
+        self.assertTrue(client.check_credentials(cache=True))
+        get.return_value = Response(401)
+        self.assertTrue(client.check_credentials(cache=True))
+        self.assertEqual(1, get.call_count)
+        self.assertFalse(client.check_credentials())
+
+        client = api.API('cached-owner', 'other-key')
+        get.reset_mock()
+        get.return_value = Response(503)
+        self.assertEqual('unknown', client.credentials_health(cache=True))
+        get.return_value = Response(401)
+        self.assertEqual('invalid', client.credentials_health(cache=True))
+        get.return_value = Response(200)
+        self.assertEqual('invalid', client.credentials_health(cache=True))
+        self.assertEqual(2, get.call_count)
+
     @classmethod
     def setUpClass(cls):
         user = User()
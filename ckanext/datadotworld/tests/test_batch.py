@@ -0,0 +1,60 @@
+# Copyright 2017 data.world, inc
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for batch.py."""
+from unittest import TestCase
+import mock
+import ckanext.datadotworld.batch as batch
+from ckanext.datadotworld.model.extras import Extras
+
+
+class TestCommitBatch(TestCase):
+
+    @mock.patch(batch.__name__ + '.model.Session.commit')
+    def test_commit_outside_of_batch(self, commit):
+        batch.commit(Extras(package_id='x'))
+        commit.assert_called_once_with()
+
+    @mock.patch(batch.__name__ + '.model.Session')
+    def test_commit_every_n_packages(self, session):
+        with batch.CommitBatch(size=2, interval=60) as unit:
+            self.assertIs(unit, batch.current())
+            batch.commit(Extras(package_id='a'))
+            self.assertFalse(session.commit.called)
+            batch.commit(Extras(package_id='b'))
+            self.assertEqual(1, session.commit.call_count)
+            batch.commit(Extras(package_id='c'))
+        self.assertEqual(2, session.commit.call_count)
+        self.assertEqual(3, session.merge.call_count)
+        self.assertEqual(None, batch.current())
+
+    @mock.patch(batch.__name__ + '.model.Session')
+    def test_no_transaction_between_packages(self, session):
+        with batch.CommitBatch(size=10, interval=60):
+            batch.commit(Extras(package_id='a', state=u'failed'))
+            # snapshot is kept, transaction of the package is closed
+            session.rollback.assert_called_once_with()
+            self.assertFalse(session.commit.called)
+        merged, = session.merge.call_args[0]
+        self.assertEqual('a', merged.package_id)
+        self.assertEqual(u'failed', merged.state)
+
+    @mock.patch(batch.__name__ + '.CommitBatch._replay')
+    @mock.patch(batch.__name__ + '.model.Session')
+    def test_fallback_to_row_commits(self, session, replay):
+        session.commit.side_effect = Exception('boom')
+        with batch.CommitBatch(size=10, interval=60):
+            batch.commit(Extras(package_id='a'))
+        self.assertEqual(2, session.rollback.call_count)
+        replay.assert_called_once_with()
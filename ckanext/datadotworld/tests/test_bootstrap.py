@@ -0,0 +1,125 @@
+# Copyright 2017 data.world, inc
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for bootstrap.py."""
+from datetime import datetime, timedelta
+from unittest import TestCase
+import os.path as path
+import mock
+import ckan.model as model
+from ckan.tests.factories import Dataset, Organization
+from ckan.tests.helpers import reset_db
+import ckanext.datadotworld.bootstrap as bootstrap
+from ckanext.datadotworld.model import BootstrapStatus, States
+from ckanext.datadotworld.model.bootstrap import Bootstrap
+from ckanext.datadotworld.model.extras import Extras
+from ckanext.datadotworld.command import DataDotWorldCommand
+
+BASE = path.basename(path.abspath(__file__)) + '../../'
+cmd = DataDotWorldCommand(None)
+
+
+def setup_module():
+    reset_db()
+    cmd.run(['init', '-c', BASE + 'test.ini'])
+    cmd.run(['upgrade', '-c', BASE + 'test.ini'])
+
+
+def teardown_module():
+    cmd.run(['downgrade', '-c', BASE + 'test.ini'])
+
+
+class TestProgress(TestCase):
+
+    def test_eta(self):
+        started = datetime(2017, 1, 1)
+        run = Bootstrap(
+            status=BootstrapStatus.running, total=100, processed=25,
+            started=started, modified=started + timedelta(seconds=50))
+        progress = bootstrap.progress(run)
+        self.assertEqual(25, progress['percent'])
+        self.assertEqual(0.5, progress['rate'])
+        self.assertEqual(150, progress['eta'])
+
+
+@mock.patch(bootstrap.__name__ + '.page_size', return_value=2)
+@mock.patch(bootstrap.__name__ + '.api.load_config')
+@mock.patch(bootstrap.__name__ + '.api.notify')
+@mock.patch(bootstrap.__name__ + '._enqueue')
+class TestBootstrap(TestCase):
+
+    def test_checkpointed_run(self, enqueue, notify, load_config, size):
+        org = Organization()
+        ids = sorted(Dataset(owner_org=org['id'])['id'] for _ in range(3))
+        run = bootstrap.start(org['id'])
+        self.assertEqual(3, run.total)
+        enqueue.assert_called_once_with(run, None)
+
+        bootstrap.syncronize_bootstrap(run.id, None, 'ini')
+        self.assertEqual(ids[1], run.cursor)
+        self.assertEqual(2, run.processed)
+        self.assertEqual(2, enqueue.call_count)
+
+        # job of a chain that was already resumed
+        bootstrap.syncronize_bootstrap(run.id, None, 'ini')
+        self.assertEqual(2, notify.call_count)
+
+        bootstrap.syncronize_bootstrap(run.id, ids[1], 'ini')
+        self.assertEqual(BootstrapStatus.finished, run.status)
+        self.assertEqual(3, run.processed)
+        self.assertEqual(2, enqueue.call_count)
+
+    def test_page_checkpointed_by_resumed_chain(self, enqueue, notify,
+                                                load_config, size):
+        org = Organization()
+        ids = sorted(Dataset(owner_org=org['id'])['id'] for _ in range(3))
+        run = bootstrap.start(org['id'])
+
+        def resumed_chain_finished_page(pkg_id):
+            if notify.call_count == 1:
+                table = Bootstrap.__table__
+                model.meta.engine.execute(table.update().where(
+                    table.c.id == run.id
+                ).values(cursor=ids[1], processed=2))
+        notify.side_effect = resumed_chain_finished_page
+
+        bootstrap.syncronize_bootstrap(run.id, None, 'ini')
+        self.assertEqual(ids[1], run.cursor)
+        self.assertEqual(2, run.processed)
+        self.assertEqual(1, enqueue.call_count)
+
+    def test_dead_datasets_counted_as_failed(self, enqueue, notify,
+                                             load_config, size):
+        org = Organization()
+        ids = sorted(Dataset(owner_org=org['id'])['id'] for _ in range(2))
+        for pkg_id, state in zip(ids, (States.failed, States.dead)):
+            model.Session.add(Extras(
+                package_id=pkg_id, owner='owner', state=state))
+        model.Session.commit()
+        run = bootstrap.start(org['id'])
+        bootstrap.syncronize_bootstrap(run.id, None, 'ini')
+        self.assertEqual(2, run.failed)
+
+    def test_resume_stale(self, enqueue, notify, load_config, size):
+        org = Organization()
+        run = bootstrap.start(org['id'])
+        self.assertEqual([], bootstrap.resume(stale_after=60))
+        run.modified = datetime.utcnow() - timedelta(seconds=120)
+        model.Session.commit()
+        self.assertEqual([run], bootstrap.resume(stale_after=60))
+        self.assertEqual(2, enqueue.call_count)
+
+        bootstrap.start(org['id'])
+        self.assertEqual(BootstrapStatus.cancelled,
+                         model.Session.query(Bootstrap).get(run.id).status)
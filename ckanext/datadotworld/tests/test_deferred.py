@@ -0,0 +1,136 @@
+# Copyright 2017 data.world, inc
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for deferred.py."""
+import json
+from unittest import TestCase
+import os.path as path
+import mock
+from sqlalchemy import select
+import ckan.model as model
+from ckan.tests.factories import Dataset, Organization
+from ckan.tests.helpers import reset_db
+import ckanext.datadotworld.deferred as deferred
+import ckanext.datadotworld.outbox as outbox
+from ckanext.datadotworld.model.credentials import Credentials
+from ckanext.datadotworld.command import DataDotWorldCommand
+
+BASE = path.basename(path.abspath(__file__)) + '../../'
+cmd = DataDotWorldCommand(None)
+
+
+def setup_module():
+    reset_db()
+    cmd.run(['init', '-c', BASE + 'test.ini'])
+    cmd.run(['upgrade', '-c', BASE + 'test.ini'])
+
+
+def teardown_module():
+    cmd.run(['downgrade', '-c', BASE + 'test.ini'])
+
+
+class TestDeferred(TestCase):
+
+    def setUp(self):
+        self.session = mock.Mock(info={})
+
+    @mock.patch(deferred.__name__ + '.enqueue')
+    def test_commit_dispatches_unique_ids(self, enqueue):
+        with mock.patch(deferred.__name__ + '.model.Session',
+                        return_value=self.session):
+            deferred.add('b')
+            deferred.add('a')
+            deferred.add('b')
+        deferred._after_commit(self.session)
+        enqueue.assert_called_once_with(['a', 'b'], owners={})
+        self.assertNotIn(deferred.INFO_KEY, self.session.info)
+
+    @mock.patch(deferred.__name__ + '.enqueue')
+    def test_rollback_dispatches_nothing(self, enqueue):
+        self.session.info[deferred.INFO_KEY] = set(['a'])
+        deferred._after_rollback(self.session)
+        deferred._after_commit(self.session)
+        self.assertFalse(enqueue.called)
+
+    @mock.patch(deferred.__name__ + '.enqueue')
+    def test_close_dispatches_changes_after_commit(self, enqueue):
+        model.Session.commit()
+        deferred.add('late')
+        model.Session.remove()
+        enqueue.assert_called_once_with(['late'], owners={})
+
+    @mock.patch(deferred.__name__ + '.enqueue_files')
+    @mock.patch(deferred.__name__ + '.enqueue')
+    def test_file_operations_dropped_on_full_sync(self, enqueue,
+                                                  enqueue_files):
+        with mock.patch(deferred.__name__ + '.model.Session',
+                        return_value=self.session):
+            deferred.add_file('a', 'r1', 'update', 'old.csv')
+            deferred.add_file('a', 'r1', 'update', 'newer.csv')
+            deferred.add_file('b', 'r2', 'delete', 'x.csv')
+            deferred.add('b')
+        deferred._after_commit(self.session)
+        enqueue.assert_called_once_with(['b'], owners={})
+        enqueue_files.assert_called_once_with(
+            [['a', 'r1', 'update', 'old.csv']], {})
+
+    @mock.patch(deferred.__name__ + '.outbox.is_enabled', return_value=False)
+    @mock.patch(deferred.__name__ + '.api')
+    def test_large_commit_split_into_jobs(self, api, is_enabled):
+        ids = [str(i) for i in range(deferred.MAX_JOB_SIZE + 1)]
+        deferred.enqueue(ids)
+        self.assertEqual(2, api.compat_enqueue.call_count)
+
+
+@mock.patch.dict(outbox.config, {'ckan.datadotworld.queue': 'outbox'})
+@mock.patch(deferred.__name__ + '.api.ckan_ini_filepath',
+            return_value='ini')
+class TestOutboxCommit(TestCase):
+
+    def _jobs(self, fn):
+        rows = outbox._engine().execute(
+            select([outbox.table.c.owner, outbox.table.c.args]).where(
+                outbox.table.c.fn == outbox._path(fn))).fetchall()
+        return dict((row.owner, json.loads(row.args)[0]) for row in rows)
+
+    def setUp(self):
+        self.datasets = {}
+        for owner in (u'first', u'second'):
+            org = Organization()
+            model.Session.add(Credentials(
+                organization_id=org['id'], owner=owner, key='key',
+                integration=True))
+            model.Session.commit()
+            self.datasets[owner] = Dataset(owner_org=org['id'])['id']
+        outbox._engine().execute(outbox.table.delete())
+
+    def test_jobs_grouped_by_owner(self, ckan_ini_filepath):
+        datasets = self.datasets
+        for pkg_id in datasets.values():
+            deferred.add(pkg_id)
+        model.Session.commit()
+        self.assertEqual({
+            u'first': [datasets[u'first']],
+            u'second': [datasets[u'second']]
+        }, self._jobs(deferred.api.syncronize_many))
+
+    def test_file_jobs_grouped_by_owner(self, ckan_ini_filepath):
+        first, second = self.datasets[u'first'], self.datasets[u'second']
+        deferred.add_file(first, 'r1', 'update', 'a.csv')
+        deferred.add_file(second, 'r2', 'delete', 'b.csv')
+        model.Session.commit()
+        self.assertEqual({
+            u'first': [[first, 'r1', 'update', 'a.csv']],
+            u'second': [[second, 'r2', 'delete', 'b.csv']]
+        }, self._jobs(deferred.api.syncronize_files))
@@ -0,0 +1,133 @@
+# Copyright 2017 data.world, inc
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for export.py."""
+from datetime import datetime, timedelta
+from json import loads
+from unittest import TestCase
+import os.path as path
+import ckan.model as model
+from ckan.tests.factories import Dataset, Organization, Sysadmin, User
+from ckan.tests.helpers import reset_db, _get_test_app
+import ckanext.datadotworld.export as export
+from ckanext.datadotworld.model import States
+from ckanext.datadotworld.model.extras import Extras
+from ckanext.datadotworld.command import DataDotWorldCommand
+
+BASE = path.basename(path.abspath(__file__)) + '../../'
+cmd = DataDotWorldCommand(None)
+
+
+def setup_module():
+    reset_db()
+    cmd.run(['init', '-c', BASE + 'test.ini'])
+    cmd.run(['upgrade', '-c', BASE + 'test.ini'])
+
+
+def teardown_module():
+    cmd.run(['downgrade', '-c', BASE + 'test.ini'])
+
+
+def _rows():
+    for i in range(3):
+        yield dict(
+            (field, u'{0}-{1}'.format(field, i)) for field in export.FIELDS)
+
+
+class TestExport(TestCase):
+
+    def test_ndjson(self):
+        lines = list(export.serialize(_rows(), 'ndjson'))
+        self.assertEqual(3, len(lines))
+        self.assertEqual(u'name-1', loads(lines[1])['name'])
+
+    def test_csv(self):
+        lines = list(export.serialize(_rows(), 'csv'))
+        self.assertEqual(4, len(lines))
+        self.assertEqual(','.join(export.FIELDS) + '\r\n', lines[0])
+        self.assertTrue(lines[3].startswith('package_id-2,name-2,'))
+
+
+class TestExportQuery(TestCase):
+
+    def setUp(self):
+        self.now = datetime.utcnow()
+        self.first, self.second = Organization(), Organization()
+        self.names = {}
+        for org, state, age in (
+                (self.first, States.uptodate, 0),
+                (self.first, States.failed, 10),
+                (self.second, States.failed, 0)):
+            pkg = Dataset(owner_org=org['id'])
+            model.Session.add(Extras(
+                package_id=pkg['id'], owner='owner', id=pkg['name'],
+                state=state, modified=self.now - timedelta(days=age)))
+            self.names[(org['id'], state)] = pkg['name']
+        model.Session.commit()
+        self.org_ids = [self.first['id'], self.second['id']]
+
+    def _names(self, **filters):
+        filters.setdefault('org_ids', self.org_ids)
+        return sorted(row['name'] for row in export.iter_rows(**filters))
+
+    def test_filters(self):
+        self.assertEqual(sorted(self.names.values()), self._names())
+        self.assertEqual(sorted([
+            self.names[(self.first['id'], States.failed)],
+            self.names[(self.second['id'], States.failed)]
+        ]), self._names(state=States.failed))
+        self.assertEqual(
+            [self.names[(self.second['id'], States.failed)]],
+            self._names(state=States.failed, org_ids=[self.second['id']]))
+        self.assertEqual(sorted([
+            self.names[(self.first['id'], States.uptodate)],
+            self.names[(self.second['id'], States.failed)]
+        ]), self._names(since=self.now - timedelta(days=1)))
+
+    def test_row_fields(self):
+        row, = export.iter_rows(
+            state=States.uptodate, org_ids=[self.first['id']])
+        self.assertEqual(self.first['name'], row['organization'])
+        self.assertEqual(row['name'], row['remote_id'])
+        self.assertEqual(self.now.isoformat(), row['modified'])
+
+
+class TestExportController(TestCase):
+
+    def setUp(self):
+        self.app = _get_test_app()
+        self.org = Organization()
+        pkg = Dataset(owner_org=self.org['id'])
+        model.Session.add(Extras(
+            package_id=pkg['id'], owner='owner', id=pkg['name'],
+            state=States.uptodate))
+        model.Session.commit()
+        self.name = pkg['name']
+
+    def _get(self, user, url, status=200):
+        return self.app.get(
+            url, status=status,
+            extra_environ={'REMOTE_USER': str(user['name'])})
+
+    def test_sysadmin_without_orgs(self):
+        sysadmin = Sysadmin()
+        res = self._get(sysadmin, '/data.world/export.ndjson')
+        self.assertIn(self.name, res.body)
+        res = self._get(
+            sysadmin, '/data.world/{0}/export.csv'.format(self.org['id']))
+        self.assertIn(self.name, res.body)
+        self._get(sysadmin, '/data.world/missing/export.csv', 404)
+
+    def test_user_without_orgs(self):
+        self._get(User(), '/data.world/export.ndjson', 401)
@@ -0,0 +1,88 @@
+# Copyright 2017 data.world, inc
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for freshness.py."""
+from datetime import datetime
+from unittest import TestCase
+import mock
+import ckanext.datadotworld.freshness as freshness
+from ckanext.datadotworld.model.resource_state import ResourceState
+
+
+class Pool(object):
+    def map(self, fn, items):
+        return [fn(item) for item in items]
+
+
+class Response(object):
+    def __init__(self, status_code, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+
+
+class TestFreshness(TestCase):
+
+    @mock.patch(freshness.__name__ + '.requests.head')
+    def test_probe(self, head):
+        head.return_value = Response(
+            200, {'ETag': '"v2"', 'Last-Modified': 'today'})
+        self.assertEqual(('"v2"', 'today'),
+                         freshness.probe('http://x', '"v1"'))
+        self.assertEqual(
+            '"v1"', head.call_args[1]['headers']['If-None-Match'])
+
+        head.return_value = Response(304)
+        self.assertEqual(None, freshness.probe('http://x', '"v1"'))
+
+        head.side_effect = freshness.requests.ConnectionError()
+        self.assertEqual(None, freshness.probe('http://x'))
+
+    @mock.patch(freshness.__name__ + '.probe')
+    @mock.patch(freshness.__name__ + '.model.Session')
+    def test_check(self, session, probe):
+        res = mock.Mock(id='r', url='http://x', last_modified=None)
+        state = ResourceState(resource_id='r', package_id='p', etag='"v1"')
+        state.fingerprint = freshness.fingerprint(res, '"v1"', None)
+        query = session.query.return_value.filter.return_value
+        query.all.return_value = [res]
+        query.__iter__ = mock.Mock(return_value=iter([state]))
+        probe.return_value = None
+        changed, states = freshness.check('p', Pool())
+        self.assertFalse(changed)
+        probe.assert_called_once_with('http://x', '"v1"')
+
+        query.__iter__ = mock.Mock(return_value=iter([state]))
+        probe.return_value = ('"v2"', None)
+        changed, states = freshness.check('p', Pool())
+        self.assertTrue(changed)
+        self.assertEqual('"v2"', states['r'][0])
+        # nothing is written until `save`
+        self.assertEqual('"v1"', state.etag)
+        self.assertFalse(session.execute.called)
+
+    @mock.patch(freshness.__name__ + '.model.Session')
+    def test_save_in_one_commit(self, session):
+        state = ResourceState(resource_id='r', package_id='p')
+        query = session.query.return_value.filter.return_value
+        query.__iter__ = mock.Mock(return_value=iter([state]))
+        now = datetime.utcnow()
+        freshness.save('p', {
+            'r': ('"v2"', None, 'f1'), 'new': (None, 'today', 'f2')
+        }, now, now)
+        self.assertEqual(('"v2"', 'f1', now),
+                         (state.etag, state.fingerprint, state.checked_at))
+        added, = session.add.call_args[0]
+        self.assertEqual(('new', 'f2'), (added.resource_id, added.fingerprint))
+        session.execute.assert_called_once_with(mock.ANY)
+        session.commit.assert_called_once_with()
@@ -0,0 +1,78 @@
+# Copyright 2017 data.world, inc
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for helpers.py."""
+from unittest import TestCase
+import os.path as path
+import mock
+from sqlalchemy import event
+import ckan.model as model
+from ckan.tests.factories import Dataset, Organization
+from ckan.tests.helpers import reset_db
+import ckanext.datadotworld.helpers as helpers
+from ckanext.datadotworld.model.credentials import Credentials
+from ckanext.datadotworld.model.extras import Extras
+from ckanext.datadotworld.command import DataDotWorldCommand
+
+BASE = path.basename(path.abspath(__file__)) + '../../'
+cmd = DataDotWorldCommand(None)
+
+
+def setup_module():
+    reset_db()
+    cmd.run(['init', '-c', BASE + 'test.ini'])
+    cmd.run(['upgrade', '-c', BASE + 'test.ini'])
+
+
+def teardown_module():
+    cmd.run(['downgrade', '-c', BASE + 'test.ini'])
+
+
+class Context(object):
+    pass
+
+
+class TestPreload(TestCase):
+
+    def setUp(self):
+        self.statements = []
+        event.listen(model.meta.engine, 'before_cursor_execute',
+                     self._count)
+
+    def tearDown(self):
+        event.remove(model.meta.engine, 'before_cursor_execute',
+                     self._count)
+
+    def _count(self, conn, cursor, statement, *args):
+        self.statements.append(statement)
+
+    @mock.patch(helpers.__name__ + '.c', Context())
+    def test_helpers_use_preloaded_values(self):
+        linked, plain = Organization(), Organization()
+        model.Session.add(Credentials(
+            organization_id=linked['id'], owner='owner', key='key',
+            integration=True, show_links=True))
+        synced = Dataset(owner_org=linked['id'])
+        model.Session.add(Extras(
+            package_id=synced['id'], owner='owner', id='remote-name'))
+        model.Session.commit()
+        other = Dataset(owner_org=plain['id'])
+
+        helpers.preload([synced, other])
+        del self.statements[:]
+        self.assertEqual('owner', helpers.creds_from_id(linked['id']).owner)
+        self.assertEqual(None, helpers.creds_from_id(plain['id']))
+        self.assertEqual('remote-name', helpers.remote_id(synced['id']))
+        self.assertEqual(None, helpers.remote_id(other['id']))
+        self.assertEqual([], self.statements)
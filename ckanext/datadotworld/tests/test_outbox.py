@@ -0,0 +1,89 @@
+# Copyright 2017 data.world, inc
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for outbox.py."""
+from unittest import TestCase
+import os.path as path
+import ckanext.datadotworld.outbox as outbox
+from ckan.tests.helpers import reset_db
+from ckanext.datadotworld.command import DataDotWorldCommand
+
+BASE = path.basename(path.abspath(__file__)) + '../../'
+cmd = DataDotWorldCommand(None)
+
+
+def setup_module():
+    reset_db()
+    cmd.run(['init', '-c', BASE + 'test.ini'])
+    cmd.run(['upgrade', '-c', BASE + 'test.ini'])
+
+
+def teardown_module():
+    cmd.run(['downgrade', '-c', BASE + 'test.ini'])
+
+
+def job(*args):
+    return args
+
+
+class TestOutbox(TestCase):
+
+    def setUp(self):
+        outbox._engine().execute(outbox.table.delete())
+
+    def _put(self, owner, amount=1):
+        for i in range(amount):
+            outbox.put(job, [owner, i], owner)
+
+    def _owners(self, claimed):
+        return sorted(owner for _, owner in claimed)
+
+    def test_put_and_get(self):
+        self._put(u'a')
+        (job_id, owner), = outbox.claim(1)
+        self.assertEqual(u'a', owner)
+        fn, args = outbox.get(job_id)
+        self.assertEqual(job, outbox.resolve(fn))
+        self.assertEqual([u'a', 0], args)
+
+        outbox.done(job_id)
+        self.assertEqual(None, outbox.get(job_id))
+        self.assertEqual([], outbox.claim(1))
+
+    def test_claim_per_owner(self):
+        self._put(u'a', 3)
+        self._put(u'b')
+        claimed = outbox.claim(2)
+        self.assertEqual([u'a', u'a', u'b'], self._owners(claimed))
+        self.assertEqual([u'a'], self._owners(outbox.claim(2)))
+        self.assertEqual([], outbox.claim(2))
+
+    def test_claim_excluded_owners(self):
+        self._put(u'a')
+        self._put(u'b')
+        self.assertEqual([u'b'], self._owners(outbox.claim(1, [u'a'])))
+
+    def test_stale_jobs_are_reclaimed(self):
+        self._put(u'a')
+        (job_id, _), = outbox.claim(1)
+        self.assertEqual([], outbox.claim(1, stale_after=3600))
+        self.assertEqual([job_id], [
+            claimed for claimed, _ in outbox.claim(1, stale_after=-1)])
+
+    def test_release(self):
+        self._put(u'a', 2)
+        claimed = [job_id for job_id, _ in outbox.claim(2)]
+        outbox.release(claimed)
+        self.assertEqual(claimed, sorted(
+            job_id for job_id, _ in outbox.claim(2)))
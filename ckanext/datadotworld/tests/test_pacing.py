@@ -0,0 +1,67 @@
+# Copyright 2017 data.world, inc
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for pacing.py."""
+from unittest import TestCase
+import mock
+import ckanext.datadotworld.pacing as pacing
+from ckanext.datadotworld.pacing import Pacer
+
+
+class TestPacer(TestCase):
+
+    def test_additive_increase(self):
+        pacer = Pacer(1, min_delay=0.5, step=0.2)
+        pacer.observe(200)
+        self.assertAlmostEqual(0.8, pacer.delay)
+        for _ in range(10):
+            pacer.observe(200)
+        self.assertAlmostEqual(0.5, pacer.delay)
+        self.assertAlmostEqual(2, pacer.rate)
+
+    def test_multiplicative_decrease(self):
+        pacer = Pacer(1, max_delay=3, backoff=2)
+        pacer.observe(429)
+        self.assertAlmostEqual(2, pacer.delay)
+        pacer.observe(429)
+        self.assertAlmostEqual(3, pacer.delay)
+
+    def test_server_errors_are_ignored(self):
+        pacer = Pacer(1)
+        pacer.observe(503)
+        pacer.observe(None)
+        self.assertAlmostEqual(1, pacer.delay)
+
+
+class TestPersistedDelay(TestCase):
+
+    def setUp(self):
+        self.stored = {}
+        pacing._pacers.clear()
+
+    def tearDown(self):
+        pacing._pacers.clear()
+
+    def test_new_process_starts_from_published_delay(self):
+        with mock.patch.object(
+                pacing, '_publish', side_effect=self.stored.__setitem__), \
+                mock.patch.object(
+                    pacing, '_stored_delay', side_effect=self.stored.get):
+            start = pacing.get('owner').delay
+            pacing.observe('owner', 429)
+            self.assertAlmostEqual(start * 2, self.stored['owner'])
+
+            # work-horse of the next job has no pacers in memory
+            pacing._pacers.clear()
+            self.assertAlmostEqual(start * 2, pacing.get('owner').delay)
@@ -0,0 +1,98 @@
+# Copyright 2017 data.world, inc
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for planner.py."""
+from unittest import TestCase
+import os.path as path
+import ckan.model as model
+from ckan.tests.factories import Dataset, Organization, Resource
+from ckan.tests.helpers import reset_db, call_action
+import ckanext.datadotworld.api as api
+import ckanext.datadotworld.planner as planner
+from ckanext.datadotworld.model import States
+from ckanext.datadotworld.model.credentials import Credentials
+from ckanext.datadotworld.model.extras import Extras
+from ckanext.datadotworld.command import DataDotWorldCommand
+
+BASE = path.basename(path.abspath(__file__)) + '../../'
+cmd = DataDotWorldCommand(None)
+
+
+def setup_module():
+    reset_db()
+    cmd.run(['init', '-c', BASE + 'test.ini'])
+    cmd.run(['upgrade', '-c', BASE + 'test.ini'])
+
+
+def teardown_module():
+    cmd.run(['downgrade', '-c', BASE + 'test.ini'])
+
+
+def organization(integration=True):
+    org = Organization()
+    model.Session.add(Credentials(
+        organization_id=org['id'], owner='owner', key='key',
+        integration=integration))
+    model.Session.commit()
+    return org
+
+
+class TestPlanner(TestCase):
+
+    def test_plan_org(self):
+        org = organization()
+        new = Dataset(owner_org=org['id'])
+        Resource(package_id=new['id'])
+        same = Dataset(owner_org=org['id'])
+        changed = Dataset(owner_org=org['id'])
+        gone = Dataset(owner_org=org['id'])
+        for pkg in (same, changed, gone):
+            pkg = call_action('package_show', id=pkg['id'])
+            model.Session.add(Extras(
+                package_id=pkg['id'], owner='owner', id=pkg['name'],
+                state=States.uptodate,
+                fingerprint=api.payload_fingerprint(pkg)))
+        model.Session.commit()
+        call_action('package_patch', id=changed['id'], title='New title')
+        call_action('package_delete', id=gone['id'])
+
+        plans = dict(
+            (plan['id'], plan) for plan in planner.plan_org(org['id']))
+        self.assertEqual(planner.CREATE, plans[new['id']]['action'])
+        self.assertEqual(1, plans[new['id']]['files'])
+        self.assertEqual(planner.NONE, plans[same['id']]['action'])
+        self.assertEqual(planner.UPDATE, plans[changed['id']]['action'])
+        self.assertEqual(planner.DELETE, plans[gone['id']]['action'])
+        self.assertEqual(
+            {planner.CREATE: 1, planner.NONE: 1, planner.UPDATE: 1,
+             planner.DELETE: 1, 'files': 1},
+            planner.summarize(plans.values()))
+
+    def test_plan_org_in_processes(self):
+        org = organization()
+        ids = sorted(Dataset(owner_org=org['id'])['id'] for _ in range(3))
+        plans = list(planner.plan_org(org['id'], processes=2, chunk_size=1))
+        self.assertEqual(ids, sorted(plan['id'] for plan in plans))
+        self.assertEqual(
+            set([planner.CREATE]), set(plan['action'] for plan in plans))
+        # parent session is usable after the pool is gone
+        self.assertEqual(3, model.Session.query(model.Package).filter(
+            model.Package.owner_org == org['id']).count())
+
+    def test_skip_without_integration(self):
+        for org in (Organization(), organization(integration=False)):
+            pkg = Dataset(owner_org=org['id'])
+            plan = planner.plan_package(pkg['id'])
+            self.assertEqual(planner.SKIP, plan['action'])
+            self.assertEqual('integration disabled', plan['reason'])
@@ -0,0 +1,114 @@
+# Copyright 2017 data.world, inc
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for plugin.py."""
+from unittest import TestCase
+import os.path as path
+import mock
+import ckan.model as model
+from ckan.tests.factories import Dataset, Organization, Resource
+from ckan.tests.helpers import reset_db, call_action
+import ckanext.datadotworld.api as api
+import ckanext.datadotworld.deferred as deferred
+from ckanext.datadotworld.model import States
+from ckanext.datadotworld.model.credentials import Credentials
+from ckanext.datadotworld.model.extras import Extras
+from ckanext.datadotworld.command import DataDotWorldCommand
+
+BASE = path.basename(path.abspath(__file__)) + '../../'
+cmd = DataDotWorldCommand(None)
+
+
+def setup_module():
+    reset_db()
+    cmd.run(['init', '-c', BASE + 'test.ini'])
+    cmd.run(['upgrade', '-c', BASE + 'test.ini'])
+
+
+def teardown_module():
+    cmd.run(['downgrade', '-c', BASE + 'test.ini'])
+
+
+class TestPackageHooks(TestCase):
+
+    def setUp(self):
+        patcher = mock.patch(deferred.__name__ + '.api.compat_enqueue')
+        self.compat_enqueue = patcher.start()
+        self.addCleanup(patcher.stop)
+        org = Organization()
+        model.Session.add(Credentials(
+            organization_id=org['id'], owner='owner', key='key',
+            integration=True))
+        pkg = Dataset(owner_org=org['id'])
+        Resource(package_id=pkg['id'], url='http://example.com/a.csv')
+        self.pkg = call_action('package_show', id=pkg['id'])
+        model.Session.add(Extras(
+            package_id=self.pkg['id'], owner='owner', id=self.pkg['name'],
+            state=States.uptodate,
+            fingerprint=api.payload_fingerprint(self.pkg)))
+        model.Session.commit()
+        self.compat_enqueue.reset_mock()
+
+    def test_unchanged_update_not_enqueued(self):
+        call_action('package_update', **self.pkg)
+        self.assertFalse(self.compat_enqueue.called)
+
+    def test_changed_update_enqueued(self):
+        call_action('package_patch', id=self.pkg['id'], title='Changed')
+        self.assertEqual(1, self.compat_enqueue.call_count)
+
+
+class TestResourceHooks(TestCase):
+
+    def setUp(self):
+        patcher = mock.patch(deferred.__name__ + '.api.compat_enqueue')
+        self.compat_enqueue = patcher.start()
+        self.addCleanup(patcher.stop)
+        org = Organization()
+        model.Session.add(Credentials(
+            organization_id=org['id'], owner='owner', key='key',
+            integration=True))
+        self.pkg = Dataset(owner_org=org['id'])
+        self.res = Resource(
+            package_id=self.pkg['id'], url='http://example.com/a.csv')
+        model.Session.add(Extras(
+            package_id=self.pkg['id'], owner='owner', id=self.pkg['name'],
+            state=States.uptodate))
+        model.Session.commit()
+        self.compat_enqueue.reset_mock()
+
+    def _jobs(self, fn):
+        return [
+            kwargs['args'][0]
+            for args, kwargs in self.compat_enqueue.call_args_list
+            if args[0] == fn]
+
+    def test_resource_create_pushes_file(self):
+        res = call_action(
+            'resource_create', package_id=self.pkg['id'],
+            url='http://example.com/b.csv')
+        self.assertEqual(
+            [[[self.pkg['id'], res['id'], 'create', None]]],
+            self._jobs('datadotworld.syncronize_files'))
+        self.assertEqual([], self._jobs('datadotworld.syncronize_many'))
+
+    def test_resource_update_pushes_file(self):
+        old_name = api.resource_file_name(self.res)
+        call_action(
+            'resource_update', id=self.res['id'],
+            url='http://example.com/c.csv')
+        self.assertEqual(
+            [[[self.pkg['id'], self.res['id'], 'update', old_name]]],
+            self._jobs('datadotworld.syncronize_files'))
+        self.assertEqual([], self._jobs('datadotworld.syncronize_many'))
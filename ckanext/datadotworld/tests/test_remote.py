@@ -0,0 +1,95 @@
+# Copyright 2017 data.world, inc
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for remote.py."""
+from unittest import TestCase
+import mock
+import requests
+import ckanext.datadotworld.remote as remote
+from ckanext.datadotworld.api import API
+
+
+class Response(object):
+    def __init__(self, status_code, body=None):
+        self.status_code = status_code
+        self.body = body or {}
+
+    def json(self):
+        return self.body
+
+
+class TestRemoteCache(TestCase):
+
+    def setUp(self):
+        remote.clear()
+        self.api = API('owner', 'key')
+
+    def tearDown(self):
+        remote.clear()
+
+    def test_known_ids(self):
+        self.assertEqual(None, remote.exists('owner', 'a'))
+        remote.add('owner', 'a')
+        self.assertTrue(remote.exists('owner', 'a'))
+        self.assertEqual(None, remote.exists('owner', 'b'))
+        self.assertEqual(None, remote.metadata('owner', 'a'))
+        remote.remove('owner', 'a')
+        self.assertEqual(None, remote.exists('owner', 'a'))
+
+    @mock.patch.object(API, '_get')
+    def test_prefetch(self, get):
+        full = {'owner': 'owner', 'id': 'a', 'files': []}
+        get.side_effect = [
+            Response(200, {'records': [full], 'nextPageToken': 'x'}),
+            Response(200, {'records': [
+                {'owner': 'owner', 'id': 'b'},
+                {'owner': 'other', 'id': 'c'}]}),
+            Response(200, {'records': []}),
+        ]
+        self.assertTrue(remote.prefetch(self.api))
+        self.assertEqual(3, get.call_count)
+        self.assertIn('next=x', get.call_args_list[1][0][0])
+        self.assertTrue(remote.exists('owner', 'a'))
+        self.assertTrue(remote.exists('owner', 'b'))
+        self.assertFalse(remote.exists('owner', 'c'))
+        self.assertEqual(full, remote.metadata('owner', 'a'))
+        self.assertEqual(None, remote.metadata('owner', 'b'))
+
+        self.assertTrue(remote.prefetch(self.api))
+        self.assertEqual(3, get.call_count)
+
+    @mock.patch.object(API, '_get')
+    def test_failed_prefetch(self, get):
+        get.return_value = Response(401)
+        self.assertFalse(remote.prefetch(self.api))
+        self.assertFalse(remote.prefetch(self.api))
+        self.assertEqual(1, get.call_count)
+        self.assertEqual(None, remote.exists('owner', 'a'))
+
+    @mock.patch.object(API, '_get')
+    def test_prefetch_connection_error(self, get):
+        get.side_effect = requests.ConnectionError('reset')
+        self.assertFalse(remote.prefetch(self.api))
+        self.assertFalse(remote.prefetch(self.api))
+        self.assertEqual(1, get.call_count)
+
+    @mock.patch.object(API, '_get')
+    def test_prefetch_drops_expired_entries(self, get):
+        get.return_value = Response(200, {'records': []})
+        with mock.patch.object(remote, 'ttl', return_value=-1):
+            remote.add('other', 'a')
+        remote.add('another', 'b')
+        self.assertTrue(remote.prefetch(self.api))
+        self.assertNotIn('other', remote._owners)
+        self.assertTrue(remote.exists('another', 'b'))
@@ -0,0 +1,100 @@
+# Copyright 2017 data.world, inc
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for retry.py."""
+from datetime import datetime
+from unittest import TestCase
+import os.path as path
+import mock
+import ckan.model as model
+from ckan.tests.factories import Dataset, Organization
+from ckan.tests.helpers import reset_db
+import ckanext.datadotworld.retry as retry
+from ckanext.datadotworld.model import States
+from ckanext.datadotworld.model.extras import Extras
+from ckanext.datadotworld.command import DataDotWorldCommand
+
+BASE = path.basename(path.abspath(__file__)) + '../../'
+cmd = DataDotWorldCommand(None)
+
+
+def setup_module():
+    reset_db()
+    cmd.run(['init', '-c', BASE + 'test.ini'])
+    cmd.run(['upgrade', '-c', BASE + 'test.ini'])
+
+
+def teardown_module():
+    cmd.run(['downgrade', '-c', BASE + 'test.ini'])
+
+
+class TestRetry(TestCase):
+
+    def test_classify(self):
+        for code in (None, 408, 429, 500, 502, 503):
+            self.assertEqual(retry.TRANSIENT, retry.classify(code))
+        for code in (400, 401, 403, 409, 422):
+            self.assertEqual(retry.PERMANENT, retry.classify(code, '{}'))
+        self.assertEqual(retry.TRANSIENT, retry.classify(
+            403, b'Rate limit exceeded, try again later'))
+
+    @mock.patch('ckanext.datadotworld.options.config', {
+        'ckan.datadotworld.retry_base': '10',
+        'ckan.datadotworld.retry_max': '60'})
+    def test_backoff(self):
+        self.assertEqual(
+            [10, 20, 40, 60, 60],
+            [retry.backoff(failures) for failures in range(1, 6)])
+
+    def test_settle_transient(self):
+        extras = Extras(state=States.failed, failures=2)
+        retry.settle(extras, 503)
+        self.assertEqual(States.failed, extras.state)
+        self.assertEqual(3, extras.failures)
+        self.assertGreater(extras.next_attempt_at, datetime.utcnow())
+
+    def test_settle_permanent(self):
+        extras = Extras(state=States.failed)
+        retry.settle(extras, 422, '{"message": "Invalid license"}')
+        self.assertEqual(States.dead, extras.state)
+        self.assertEqual(None, extras.next_attempt_at)
+
+    def test_settle_success_resets(self):
+        extras = Extras(
+            state=States.uptodate, failures=4,
+            next_attempt_at=datetime.utcnow())
+        retry.settle(extras, 200)
+        self.assertEqual(0, extras.failures)
+        self.assertEqual(None, extras.next_attempt_at)
+
+
+class TestRequeue(TestCase):
+
+    def test_requeue_org(self):
+        orgs = Organization(), Organization()
+        ids = []
+        for org in orgs:
+            pkg = Dataset(owner_org=org['id'])
+            model.Session.add(Extras(
+                package_id=pkg['id'], owner='owner', state=States.dead,
+                failures=5))
+            ids.append(pkg['id'])
+        model.Session.commit()
+
+        self.assertEqual(1, retry.requeue(orgs[0]['id']))
+        extras = model.Session.query(Extras).get(ids[0])
+        self.assertEqual(States.pending, extras.state)
+        self.assertEqual(0, extras.failures)
+        self.assertEqual(
+            States.dead, model.Session.query(Extras).get(ids[1]).state)
@@ -0,0 +1,159 @@
+# Copyright 2017 data.world, inc
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for scheduler.py."""
+from datetime import datetime, timedelta
+from unittest import TestCase
+import os.path as path
+import mock
+import ckan.model as model
+from ckan.tests.factories import Dataset, Organization
+from ckan.tests.helpers import reset_db
+import ckanext.datadotworld.scheduler as scheduler
+from ckanext.datadotworld.model import States
+from ckanext.datadotworld.model.credentials import Credentials
+from ckanext.datadotworld.model.extras import Extras
+from ckanext.datadotworld.model.sync_range import SyncRange
+from ckanext.datadotworld.command import DataDotWorldCommand
+
+BASE = path.basename(path.abspath(__file__)) + '../../'
+cmd = DataDotWorldCommand(None)
+
+
+def setup_module():
+    reset_db()
+    cmd.run(['init', '-c', BASE + 'test.ini'])
+    cmd.run(['upgrade', '-c', BASE + 'test.ini'])
+
+
+def teardown_module():
+    cmd.run(['downgrade', '-c', BASE + 'test.ini'])
+
+
+def pending_datasets(owner, amount, integration=True):
+    org = Organization()
+    model.Session.add(Credentials(
+        organization_id=org['id'], owner=owner, key='key',
+        integration=integration))
+    ids = sorted(
+        Dataset(owner_org=org['id'])['id'] for _ in range(amount))
+    for pkg_id in ids:
+        model.Session.add(Extras(
+            package_id=pkg_id, owner=owner, state=States.pending))
+    model.Session.commit()
+    return ids
+
+
+class TestFairScheduler(TestCase):
+
+    def test_round_robin(self):
+        fair = scheduler.FairScheduler(limit=10)
+        for i in range(3):
+            fair.add('big', i)
+        fair.add('small', 'x')
+        order = [fair.pop() for _ in range(4)]
+        self.assertEqual([
+            ('big', 0), ('small', 'x'), ('big', 1), ('big', 2)
+        ], order)
+        self.assertEqual(None, fair.pop())
+
+    def test_in_flight_limit(self):
+        fair = scheduler.FairScheduler(limit=1)
+        fair.add('a', 1)
+        fair.add('a', 2)
+        self.assertEqual(('a', 1), fair.pop())
+        self.assertEqual(None, fair.pop())
+        self.assertEqual(1, len(fair))
+        fair.release('a')
+        self.assertEqual(('a', 2), fair.pop())
+
+    def test_weights(self):
+        fair = scheduler.FairScheduler(limit=10, weights={'a': 2})
+        for i in range(3):
+            fair.add('a', i)
+            fair.add('b', i)
+        owners = [fair.pop()[0] for _ in range(6)]
+        self.assertEqual(['a', 'a', 'b', 'a', 'b', 'b'], owners)
+
+    def test_split_offsets(self):
+        self.assertEqual(None, scheduler._split_offsets(0, 2))
+        self.assertEqual([], scheduler._split_offsets(2, 1))
+        self.assertEqual([1], scheduler._split_offsets(4, 2))
+        self.assertEqual([2, 5], scheduler._split_offsets(10, 3))
+        self.assertEqual([0], scheduler._split_offsets(1, 3))
+
+
+class TestPackageQuery(TestCase):
+
+    def test_integration_disabled(self):
+        pending_datasets('disabled', 1, integration=False)
+        self.assertEqual(0, scheduler._package_query(
+            'disabled', state=States.pending).count())
+
+
+@mock.patch(scheduler.__name__ + '.owner_in_flight_limit', return_value=1)
+@mock.patch(scheduler.__name__ + '.batch.batch_size', return_value=1)
+@mock.patch(scheduler.__name__ + '.api.ckan_ini_filepath',
+            return_value='ini')
+@mock.patch(scheduler.__name__ + '.load_config')
+@mock.patch(scheduler.__name__ + '.register_translator')
+@mock.patch(scheduler.__name__ + '.notify')
+@mock.patch(scheduler.__name__ + '._enqueue_range')
+class TestRanges(TestCase):
+
+    def _ranges(self, owner):
+        return model.Session.query(SyncRange).filter(
+            SyncRange.owner == owner).all()
+
+    def _dispatched(self, enqueue, owner):
+        return [
+            args[0] for args, _ in enqueue.call_args_list
+            if args[0].owner == owner]
+
+    def test_checkpointed_range(self, enqueue, notify, *_):
+        ids = pending_datasets('ranged', 2)
+        scheduler.dispatch_state(States.pending)
+        sync_range, = self._ranges('ranged')
+        self.assertEqual([sync_range], self._dispatched(enqueue, 'ranged'))
+
+        scheduler.syncronize_range(sync_range.id, None, 'ini')
+        notify.assert_called_once_with(ids[0])
+        self.assertEqual(ids[0], sync_range.cursor)
+        self.assertEqual(2, len(self._dispatched(enqueue, 'ranged')))
+
+        # job of a chain that was already resumed
+        scheduler.syncronize_range(sync_range.id, None, 'ini')
+        self.assertEqual(1, notify.call_count)
+
+        scheduler.syncronize_range(sync_range.id, ids[0], 'ini')
+        scheduler.syncronize_range(sync_range.id, ids[1], 'ini')
+        self.assertEqual(2, notify.call_count)
+        self.assertEqual([], self._ranges('ranged'))
+
+    def test_resume_stale_range(self, enqueue, notify, *_):
+        ids = pending_datasets('stale', 2)
+        scheduler.dispatch_state(States.pending)
+        sync_range, = self._ranges('stale')
+        scheduler.syncronize_range(sync_range.id, None, 'ini')
+        enqueue.reset_mock()
+
+        # range is still making progress
+        scheduler.dispatch_state(States.pending)
+        self.assertEqual([], self._dispatched(enqueue, 'stale'))
+
+        sync_range.modified = datetime.utcnow() - timedelta(hours=1)
+        model.Session.commit()
+        scheduler.dispatch_state(States.pending)
+        self.assertEqual([sync_range], self._dispatched(enqueue, 'stale'))
+        self.assertEqual(ids[0], sync_range.cursor)
@@ -0,0 +1,65 @@
+# Copyright 2017 data.world, inc
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for sync_log.py."""
+from datetime import datetime, timedelta
+from unittest import TestCase
+import os.path as path
+import ckan.model as model
+from ckan.tests.factories import Dataset
+from ckan.tests.helpers import reset_db
+import ckanext.datadotworld.sync_log as sync_log
+from ckanext.datadotworld.model import States
+from ckanext.datadotworld.model.extras import Extras
+from ckanext.datadotworld.model.sync_log import SyncLog
+from ckanext.datadotworld.command import DataDotWorldCommand
+
+BASE = path.basename(path.abspath(__file__)) + '../../'
+cmd = DataDotWorldCommand(None)
+
+
+def setup_module():
+    reset_db()
+    cmd.run(['init', '-c', BASE + 'test.ini'])
+    cmd.run(['upgrade', '-c', BASE + 'test.ini'])
+
+
+def teardown_module():
+    cmd.run(['downgrade', '-c', BASE + 'test.ini'])
+
+
+class TestSyncLog(TestCase):
+
+    def test_error_class(self):
+        self.assertEqual(None, sync_log.error_class(200))
+        self.assertEqual('connection', sync_log.error_class(None))
+        self.assertEqual('rate_limited', sync_log.error_class(429))
+        self.assertEqual('client_error', sync_log.error_class(400))
+        self.assertEqual('server_error', sync_log.error_class(502))
+
+    def test_prune_keeps_latest(self):
+        pkg = Dataset()
+        ids = [sync_log.append(pkg['id'], States.failed, 500, 'error')
+               for _ in range(3)]
+        model.Session.add(Extras(
+            package_id=pkg['id'], state=States.failed, last_log_id=ids[-1]))
+        model.Session.commit()
+        model.meta.engine.execute(sync_log.table.update().values(
+            created=datetime.utcnow() - timedelta(days=31)))
+
+        self.assertEqual(2, sync_log.prune(days=30, chunk=1))
+        self.assertEqual([ids[-1]], [
+            entry.id for entry in sync_log.history(pkg['id'])])
+        self.assertEqual(0, sync_log.prune(days=30))
+        self.assertTrue(model.Session.query(SyncLog).get(ids[-1]))
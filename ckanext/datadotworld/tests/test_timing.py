@@ -0,0 +1,65 @@
+# Copyright 2017 data.world, inc
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for timing.py."""
+from unittest import TestCase
+import mock
+import ckanext.datadotworld.timing as timing
+
+
+class TestTimingRecords(TestCase):
+
+    @mock.patch(timing.__name__ + '.log')
+    def test_job_writes_record(self, log):
+        with timing.SyncJob('pkg', 1, timing.now()):
+            with timing.phase('write'):
+                pass
+            timing.set_outcome('up-to-date', 'owner')
+        record = timing.parse_record(log.info.call_args[0][0])
+        self.assertEqual('pkg', record['pkg_id'])
+        self.assertEqual('owner', record['owner'])
+        self.assertEqual(1, record['attempt'])
+        self.assertEqual('up-to-date', record['outcome'])
+        self.assertIn('write_ms', record)
+
+    @mock.patch(timing.__name__ + '.log')
+    def test_failed_job(self, log):
+        with self.assertRaises(ValueError):
+            with timing.SyncJob('pkg'):
+                raise ValueError()
+        record = timing.parse_record(log.info.call_args[0][0])
+        self.assertEqual('error', record['outcome'])
+
+    def test_formats(self):
+        record = {'event': 'sync', 'pkg_id': 'a', 'owner': 'some "one"',
+                  'attempt': 0, 'outcome': 'failed', 'total_ms': 10}
+        for fmt in ('logfmt', 'json'):
+            line = 'INFO [timing] ' + timing.format_record(record, fmt)
+            self.assertEqual(record, timing.parse_record(line))
+        self.assertEqual(None, timing.parse_record('INFO Successfuly updated'))
+
+    def test_analyze(self):
+        lines = [timing.format_record(record, 'logfmt') for record in [
+            {'event': 'sync', 'pkg_id': 'a', 'owner': 'x', 'attempt': 0,
+             'outcome': 'up-to-date', 'total_ms': 100, 'write_ms': 80,
+             'wait_ms': 10},
+            {'event': 'sync', 'pkg_id': 'b', 'owner': 'y', 'attempt': 0,
+             'outcome': 'failed', 'total_ms': 300, 'write_ms': 20,
+             'wait_ms': 250},
+        ]]
+        report = timing.analyze(lines + ['unrelated line'])
+        self.assertEqual(2, report['records'])
+        self.assertEqual('wait', report['phases'][0][0])
+        self.assertEqual('y', report['owners'][0][0])
+        self.assertEqual((300, 'b'), report['packages'][0])
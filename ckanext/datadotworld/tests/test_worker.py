@@ -0,0 +1,110 @@
+# Copyright 2017 data.world, inc
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for worker.py."""
+from unittest import TestCase
+import signal
+import mock
+import ckanext.datadotworld.worker as worker
+from ckanext.datadotworld.worker import SyncWorker
+
+
+class Result(object):
+    def __init__(self, outcome):
+        self.outcome = outcome
+
+    def ready(self):
+        return True
+
+    def get(self):
+        return self.outcome
+
+
+class TestChild(TestCase):
+
+    def tearDown(self):
+        worker._threads = None
+        worker._max_jobs = None
+        worker._jobs_done = 0
+
+    @mock.patch(worker.__name__ + '.model.meta')
+    @mock.patch(worker.__name__ + '.register_translator')
+    @mock.patch(worker.__name__ + '.load_config')
+    @mock.patch(worker.__name__ + '.signal.signal')
+    def test_child_ignores_termination(self, set_signal, load_config,
+                                       register_translator, meta):
+        worker._init_child('ini', 1, 5)
+        set_signal.assert_any_call(signal.SIGTERM, signal.SIG_IGN)
+        set_signal.assert_any_call(signal.SIGINT, signal.SIG_IGN)
+        meta.engine.dispose.assert_called_once_with()
+        self.assertEqual(5, worker._max_jobs)
+
+    @mock.patch(worker.__name__ + '._run_job', return_value=True)
+    def test_jobs_budget(self, run_job):
+        worker._max_jobs = 3
+        self.assertEqual([True, True], worker._run_chunk([1, 2]))
+        self.assertEqual([True, None], worker._run_chunk([3, 4]))
+        self.assertEqual([None], worker._run_chunk([5]))
+        self.assertEqual(3, run_job.call_count)
+
+
+class TestSyncWorker(TestCase):
+
+    @mock.patch(worker.__name__ + '.outbox')
+    @mock.patch(worker.__name__ + '._release_connections')
+    @mock.patch(worker.__name__ + '.Pool')
+    def test_no_connections_inherited(self, pool, release_connections,
+                                      outbox):
+        sync_worker = SyncWorker('ini')
+        outbox.claim.return_value = []
+
+        def connections_released(*args):
+            self.assertEqual(1, release_connections.call_count)
+            sync_worker.stopping = True
+            return mock.Mock()
+        pool.side_effect = connections_released
+        with mock.patch(worker.__name__ + '.signal.signal'):
+            sync_worker.run()
+        self.assertTrue(pool.called)
+
+    def test_max_jobs_per_child(self):
+        sync_worker = SyncWorker('ini', threads=4, max_jobs_per_child=10)
+        self.assertEqual(10, sync_worker.max_jobs)
+        self.assertEqual(11, sync_worker.max_tasks)
+        self.assertEqual(None, SyncWorker('ini').max_tasks)
+
+    def test_dispatch_chunks(self):
+        sync_worker = SyncWorker('ini', processes=2, threads=2)
+        for job_id, owner in enumerate('aabbc'):
+            sync_worker.scheduler.add(owner, job_id)
+        pool = mock.Mock()
+        sync_worker._dispatch(pool)
+        self.assertEqual(2, pool.apply_async.call_count)
+        self.assertEqual(
+            [[0, 2], [4, 1]],
+            [call[0][1][0] for call in pool.apply_async.call_args_list])
+
+    def test_collect_requeues_rejected_jobs(self):
+        sync_worker = SyncWorker('ini')
+        sync_worker.scheduler.add('a', 1)
+        sync_worker.scheduler.add('a', 2)
+        sync_worker.scheduler.pop()
+        sync_worker.scheduler.pop()
+        sync_worker.running = [([1, 2], ['a', 'a'], Result([False, None]))]
+        sync_worker._collect()
+        self.assertEqual([], sync_worker.running)
+        self.assertEqual(1, sync_worker.processed)
+        self.assertEqual(1, sync_worker.failed)
+        self.assertEqual(0, sync_worker.scheduler.in_flight('a'))
+        self.assertEqual(('a', 2), sync_worker.scheduler.pop())
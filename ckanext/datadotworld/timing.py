@@ -0,0 +1,214 @@
+# Copyright 2017 data.world, inc
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""Context of the sync job currently running in this thread.
+
+Background jobs open ``SyncJob`` around the synchronization of a package,
+so `API.sync` can record queue lag and duration without changing the
+signatures between the job and the API client.
+
+Code running inside of the job measures its steps with `phase`. When the
+job ends, one structured record with durations of all phases is written
+to ``ckanext.datadotworld.timing`` logger, either as logfmt or as JSON
+(``ckan.datadotworld.timing_log_format``). `analyze` aggregates these
+records back from log files.
+"""
+
+import json
+import logging
+import re
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import datetime
+
+from pylons import config
+
+log = logging.getLogger(__name__)
+
+_local = threading.local()
+
+EVENT = 'sync'
+
+
+def current():
+    """Job running in current thread or None.
+    """
+    return getattr(_local, 'job', None)
+
+
+def now():
+    """Timestamp stored in job arguments at enqueue time.
+    """
+    return time.time()
+
+
+@contextmanager
+def phase(name):
+    """Add time spent in the block to phase of the current job.
+    """
+    job = current()
+    started = time.time()
+    try:
+        yield
+    finally:
+        if job is not None:
+            job.phases[name] += time.time() - started
+
+
+def set_outcome(outcome, owner=None):
+    job = current()
+    if job is not None:
+        job.outcome = outcome
+        if owner:
+            job.owner = owner
+
+
+class SyncJob(object):
+
+    def __init__(self, pkg_id, attempt=0, enqueued_at=None):
+        self.pkg_id = pkg_id
+        self.attempt = attempt
+        self.enqueued_at = None
+        if enqueued_at:
+            self.enqueued_at = datetime.utcfromtimestamp(enqueued_at)
+        self.started_at = datetime.utcnow()
+        self.owner = None
+        self.outcome = None
+        self.phases = defaultdict(float)
+
+    def __enter__(self):
+        self._parent = current()
+        _local.job = self
+        self._clock = time.time()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        _local.job = self._parent
+        if exc_type is not None:
+            self.outcome = 'error'
+        try:
+            log.info(format_record(self.record(time.time() - self._clock)))
+        except Exception as e:
+            log.debug('Unable to write timing record: {0}'.format(e))
+
+    def record(self, total):
+        record = {
+            'event': EVENT,
+            'pkg_id': self.pkg_id,
+            'owner': self.owner or '',
+            'attempt': self.attempt,
+            'outcome': self.outcome or 'skipped',
+            'total_ms': int(total * 1000)
+        }
+        if self.enqueued_at:
+            record['queue_ms'] = duration_ms(
+                self.enqueued_at, self.started_at)
+        for name, seconds in self.phases.items():
+            record[name + '_ms'] = int(seconds * 1000)
+        return record
+
+
+def _log_format():
+    return config.get('ckan.datadotworld.timing_log_format', 'logfmt')
+
+
+def _logfmt_value(value):
+    value = u'{0}'.format(value)
+    if not value or re.search(r'[\s="]', value):
+        value = u'"{0}"'.format(
+            value.replace('\\', '\\\\').replace('"', '\\"'))
+    return value
+
+
+def format_record(record, fmt=None):
+    if (fmt or _log_format()) == 'json':
+        return json.dumps(record, sort_keys=True)
+    keys = ['event', 'pkg_id', 'owner', 'attempt', 'outcome']
+    keys += sorted(key for key in record if key not in keys)
+    return u' '.join(
+        u'{0}={1}'.format(key, _logfmt_value(record[key])) for key in keys)
+
+
+_logfmt_pair = re.compile(r'(\w+)=("(?:[^"\\]|\\.)*"|\S*)')
+
+
+def parse_record(line):
+    """Timing record from log line in any of supported formats or None.
+    """
+    start = line.find('{')
+    if start != -1:
+        try:
+            record = json.loads(line[start:])
+        except ValueError:
+            record = None
+        if isinstance(record, dict) and record.get('event') == EVENT:
+            return record
+    if 'event=' + EVENT not in line:
+        return None
+    record = {}
+    for key, value in _logfmt_pair.findall(line[line.find('event='):]):
+        if value.startswith('"'):
+            value = re.sub(r'\\(.)', r'\1', value[1:-1])
+        elif re.match(r'^-?\d+$', value):
+            value = int(value)
+        record[key] = value
+    return record
+
+
+def _percentile(values, point):
+    values = sorted(values)
+    return values[min(len(values) * point // 100, len(values) - 1)]
+
+
+def analyze(lines, top=10):
+    """Aggregate timing records: slowest phases, owners and packages.
+    """
+    phases = defaultdict(list)
+    owners = defaultdict(list)
+    outcomes = defaultdict(int)
+    packages = []
+    for line in lines:
+        record = parse_record(line)
+        if not record:
+            continue
+        outcomes[record.get('outcome')] += 1
+        owners[record.get('owner') or '-'].append(record.get('total_ms', 0))
+        packages.append((record.get('total_ms', 0), record.get('pkg_id')))
+        for key, value in record.items():
+            if key.endswith('_ms') and key != 'total_ms':
+                phases[key[:-3]].append(value)
+    return {
+        'records': len(packages),
+        'outcomes': dict(outcomes),
+        'phases': sorted((
+            (name, sum(values), _percentile(values, 50),
+             _percentile(values, 95))
+            for name, values in phases.items()
+        ), key=lambda row: row[1], reverse=True),
+        'owners': sorted((
+            (owner, len(values), sum(values) // len(values),
+             _percentile(values, 95))
+            for owner, values in owners.items()
+        ), key=lambda row: row[2], reverse=True)[:top],
+        'packages': sorted(packages, reverse=True)[:top]
+    }
+
+
+def duration_ms(started, finished):
+    delta = finished - started
+    return int(delta.days * 86400000 + delta.seconds * 1000 +
+               delta.microseconds // 1000)
@@ -0,0 +1,212 @@
+# Copyright 2017 data.world, inc
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""Standalone multi-process executor for outbox jobs.
+
+The parent process claims jobs from `datadotworld_outbox`, orders them
+with `FairScheduler` and hands chunks of them to a pool of child
+processes. Every child loads CKAN environment once and runs its chunk
+with a small thread pool.
+
+The parent keeps no pooled database connections between its polls,
+because children may be forked (replacing retired ones) at any moment
+and must not share sockets with it.
+
+Children ignore SIGINT and SIGTERM, so signals sent to the whole process
+group (systemd, supervisor) don't interrupt running jobs: the parent
+stops claiming new jobs and waits until children finish their chunks.
+"""
+
+import logging
+import signal
+import time
+from multiprocessing import Pool
+from multiprocessing.pool import ThreadPool
+
+import ckan.model as model
+from ckanext.datadotworld import outbox
+from ckanext.datadotworld.api import load_config, register_translator
+from ckanext.datadotworld.scheduler import (
+    FairScheduler, owner_in_flight_limit
+)
+
+log = logging.getLogger(__name__)
+
+_threads = None
+_max_jobs = None
+_jobs_done = 0
+
+
+def _init_child(ckan_ini_filepath, threads, max_jobs=None):
+    global _threads, _max_jobs
+    # parent is responsible for graceful shutdown
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+    # connections inherited from parent must not be shared
+    model.meta.engine.dispose()
+    load_config(ckan_ini_filepath)
+    register_translator()
+    _threads = ThreadPool(threads) if threads > 1 else None
+    _max_jobs = max_jobs
+
+
+def _release_connections():
+    model.Session.remove()
+    model.meta.engine.dispose()
+
+
+def _run_job(job_id):
+    ok = False
+    try:
+        job = outbox.get(job_id)
+        if job is not None:
+            fn, args = job
+            outbox.resolve(fn)(*args)
+        ok = True
+    except Exception:
+        log.exception('Outbox job {0} failed'.format(job_id))
+    finally:
+        model.Session.remove()
+    outbox.done(job_id)
+    return ok
+
+
+def _run_chunk(job_ids):
+    """Run jobs, returns list of outcomes.
+
+    Child that already ran `_max_jobs` jobs doesn't run the rest of the
+    chunk, outcome of such jobs is None and parent dispatches them again.
+    """
+    global _jobs_done
+    rejected = []
+    if _max_jobs is not None:
+        allowed = max(_max_jobs - _jobs_done, 0)
+        job_ids, rejected = job_ids[:allowed], job_ids[allowed:]
+    _jobs_done += len(job_ids)
+    if _threads is None:
+        outcome = [_run_job(job_id) for job_id in job_ids]
+    else:
+        outcome = _threads.map(_run_job, job_ids)
+    return outcome + [None] * len(rejected)
+
+
+class SyncWorker(object):
+
+    def __init__(self, ckan_ini_filepath, processes=1, threads=1,
+                 max_jobs_per_child=None, poll_interval=5,
+                 report_interval=60):
+        self.ckan_ini_filepath = ckan_ini_filepath
+        self.processes = max(processes, 1)
+        self.threads = max(threads, 1)
+        # every chunk runs at least one job until child's budget is
+        # spent, so one more chunk (rejected) is enough to retire it
+        self.max_jobs = max_jobs_per_child or None
+        self.max_tasks = self.max_jobs + 1 if self.max_jobs else None
+        self.poll_interval = poll_interval
+        self.report_interval = report_interval
+        self.stopping = False
+        self.scheduler = FairScheduler(owner_in_flight_limit())
+        self.running = []
+        self.processed = 0
+        self.failed = 0
+
+    def stop(self, signum=None, frame=None):
+        log.info('Shutting down after running jobs are finished')
+        self.stopping = True
+
+    def _collect(self):
+        running = []
+        for job_ids, owners, result in self.running:
+            if not result.ready():
+                running.append((job_ids, owners, result))
+                continue
+            try:
+                outcome = result.get()
+            except Exception:
+                log.exception('Chunk {0} crashed'.format(job_ids))
+                outcome = [False] * len(job_ids)
+            for job_id, owner, ok in zip(job_ids, owners, outcome):
+                self.scheduler.release(owner)
+                if ok is None:
+                    self.scheduler.add(owner, job_id)
+                    continue
+                self.processed += 1
+                if not ok:
+                    self.failed += 1
+        self.running = running
+
+    def _dispatch(self, pool):
+        while len(self.running) < self.processes:
+            job_ids, owners = [], []
+            while len(job_ids) < self.threads:
+                task = self.scheduler.pop()
+                if task is None:
+                    break
+                owners.append(task[0])
+                job_ids.append(task[1])
+            if not job_ids:
+                break
+            result = pool.apply_async(_run_chunk, (job_ids,))
+            self.running.append((job_ids, owners, result))
+
+    def _pending_ids(self):
+        ids = []
+        while True:
+            task = self.scheduler.pop()
+            if task is None:
+                return ids
+            ids.append(task[1])
+
+    def _report(self, started, last):
+        now = time.time()
+        if now - last < self.report_interval:
+            return last
+        log.info(
+            'Processed {0} jobs ({1:.2f}/s), {2} failed, {3} running'.format(
+                self.processed, self.processed / max(now - started, 1),
+                self.failed, sum(len(ids) for ids, _, _ in self.running)))
+        return now
+
+    def run(self):
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        _release_connections()
+        pool = Pool(
+            self.processes, _init_child,
+            (self.ckan_ini_filepath, self.threads, self.max_jobs),
+            self.max_tasks)
+        started = last_report = time.time()
+        try:
+            while not self.stopping:
+                self._collect()
+                claimed = outbox.claim(
+                    self.scheduler.limit, self.scheduler.busy_owners())
+                for job_id, owner in claimed:
+                    self.scheduler.add(owner, job_id)
+                _release_connections()
+                self._dispatch(pool)
+                last_report = self._report(started, last_report)
+                if not self.running:
+                    time.sleep(self.poll_interval)
+                else:
+                    time.sleep(0.5)
+        finally:
+            outbox.release(self._pending_ids())
+            pool.close()
+            pool.join()
+            # includes jobs rejected by retiring children
+            self._collect()
+            outbox.release(self._pending_ids())
+            self._report(started, 0)
@@ -0,0 +1,42 @@
+# Copyright 2017 data.world, inc
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+from sqlalchemy import (
+    Table, Column, UnicodeText,
+    Integer, DateTime, MetaData, Index
+)
+metadata = MetaData()
+
+
+outbox = Table(
+    'datadotworld_outbox', metadata,
+    Column('id', Integer(), primary_key=True),
+    Column('fn', UnicodeText(), nullable=False),
+    Column('args', UnicodeText()),
+    Column('owner', UnicodeText()),
+    Column('created', DateTime()),
+    Column('taken_at', DateTime())
+)
+Index('datadotworld_outbox_owner_idx', outbox.c.owner, outbox.c.id)
+
+
+def upgrade(migrate_engine):
+    metadata.bind = migrate_engine
+    outbox.create()
+
+
+def downgrade(migrate_engine):
+    metadata.bind = migrate_engine
+    outbox.drop()
@@ -0,0 +1,44 @@
+# Copyright 2017 data.world, inc
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+from datetime import datetime
+
+from sqlalchemy import (
+    Table, Column, DateTime, MetaData, Index, func, select
+)
+from migrate.changeset.schema import create_column, drop_column
+
+
+def upgrade(migrate_engine):
+    metadata = MetaData(bind=migrate_engine)
+    extras = Table('datadotworld_extras', metadata, autoload=True)
+    package = Table('package', metadata, autoload=True)
+    modified = Column('modified', DateTime())
+    create_column(modified, extras)
+    # existing rows: last change of package is the best guess
+    migrate_engine.execute(extras.update().values(modified=func.coalesce(
+        select([package.c.metadata_modified]).where(
+            package.c.id == extras.c.package_id).as_scalar(),
+        datetime.utcnow())))
+    Index('datadotworld_extras_modified_idx', modified).create(
+        migrate_engine)
+
+
+def downgrade(migrate_engine):
+    metadata = MetaData(bind=migrate_engine)
+    extras = Table('datadotworld_extras', metadata, autoload=True)
+    Index('datadotworld_extras_modified_idx', extras.c.modified).drop(
+        migrate_engine)
+    drop_column('modified', extras)
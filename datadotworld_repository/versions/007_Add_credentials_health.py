@@ -0,0 +1,31 @@
+# Copyright 2017 data.world, inc
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+from sqlalchemy import Table, Column, UnicodeText, DateTime, MetaData
+from migrate.changeset.schema import create_column, drop_column
+
+
+def upgrade(migrate_engine):
+    metadata = MetaData(bind=migrate_engine)
+    credentials = Table('datadotworld_credentials', metadata, autoload=True)
+    create_column(Column('health', UnicodeText()), credentials)
+    create_column(Column('checked_at', DateTime()), credentials)
+
+
+def downgrade(migrate_engine):
+    metadata = MetaData(bind=migrate_engine)
+    credentials = Table('datadotworld_credentials', metadata, autoload=True)
+    drop_column('checked_at', credentials)
+    drop_column('health', credentials)
@@ -0,0 +1,29 @@
+# Copyright 2017 data.world, inc
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+from sqlalchemy import Table, Column, Float, MetaData
+from migrate.changeset.schema import create_column, drop_column
+
+
+def upgrade(migrate_engine):
+    metadata = MetaData(bind=migrate_engine)
+    circuit = Table('datadotworld_circuit', metadata, autoload=True)
+    create_column(Column('request_delay', Float()), circuit)
+
+
+def downgrade(migrate_engine):
+    metadata = MetaData(bind=migrate_engine)
+    circuit = Table('datadotworld_circuit', metadata, autoload=True)
+    drop_column('request_delay', circuit)
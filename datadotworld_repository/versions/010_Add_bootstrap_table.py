@@ -0,0 +1,47 @@
+# Copyright 2017 data.world, inc
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+from sqlalchemy import (
+    Table, Column, UnicodeText,
+    Integer, DateTime, MetaData, Index
+)
+metadata = MetaData()
+
+
+bootstrap = Table(
+    'datadotworld_bootstrap', metadata,
+    Column('id', Integer(), primary_key=True),
+    Column('organization_id', UnicodeText(), nullable=False),
+    Column('status', UnicodeText()),
+    Column('cursor', UnicodeText()),
+    Column('total', Integer(), default=0),
+    Column('processed', Integer(), default=0),
+    Column('failed', Integer(), default=0),
+    Column('started', DateTime()),
+    Column('modified', DateTime()),
+    Column('finished', DateTime())
+)
+Index('datadotworld_bootstrap_org_idx',
+      bootstrap.c.organization_id, bootstrap.c.id)
+
+
+def upgrade(migrate_engine):
+    metadata.bind = migrate_engine
+    bootstrap.create()
+
+
+def downgrade(migrate_engine):
+    metadata.bind = migrate_engine
+    bootstrap.drop()
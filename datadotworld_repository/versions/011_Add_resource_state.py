@@ -0,0 +1,55 @@
+# Copyright 2017 data.world, inc
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+from sqlalchemy import (
+    Table, Column, UnicodeText, DateTime, MetaData, Index
+)
+from migrate.changeset.schema import create_column, drop_column
+
+metadata = MetaData()
+
+resource_state = Table(
+    'datadotworld_resource_state', metadata,
+    Column('resource_id', UnicodeText(), primary_key=True, nullable=False),
+    Column('package_id', UnicodeText()),
+    Column('fingerprint', UnicodeText()),
+    Column('etag', UnicodeText()),
+    Column('remote_modified', UnicodeText()),
+    Column('checked_at', DateTime())
+)
+Index('datadotworld_resource_state_pkg_idx', resource_state.c.package_id)
+
+COLUMNS = (
+    ('resources_checked_at', DateTime),
+    ('resources_synced_at', DateTime),
+)
+
+
+def upgrade(migrate_engine):
+    metadata.bind = migrate_engine
+    resource_state.create()
+    extras = Table('datadotworld_extras', MetaData(bind=migrate_engine),
+                   autoload=True)
+    for name, type_ in COLUMNS:
+        create_column(Column(name, type_()), extras)
+
+
+def downgrade(migrate_engine):
+    metadata.bind = migrate_engine
+    extras = Table('datadotworld_extras', MetaData(bind=migrate_engine),
+                   autoload=True)
+    for name, _ in reversed(COLUMNS):
+        drop_column(name, extras)
+    resource_state.drop()
@@ -0,0 +1,76 @@
+# Copyright 2017 data.world, inc
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+from datetime import datetime
+
+from sqlalchemy import (
+    Table, Column, UnicodeText, Integer, DateTime, MetaData, Index, select
+)
+from migrate.changeset.schema import create_column, drop_column
+
+metadata = MetaData()
+
+sync_log = Table(
+    'datadotworld_sync_log', metadata,
+    Column('id', Integer(), primary_key=True),
+    Column('package_id', UnicodeText(), nullable=False),
+    Column('created', DateTime()),
+    Column('state', UnicodeText()),
+    Column('status_code', Integer()),
+    Column('error_class', UnicodeText()),
+    Column('body', UnicodeText())
+)
+Index('datadotworld_sync_log_pkg_idx',
+      sync_log.c.package_id, sync_log.c.created)
+Index('datadotworld_sync_log_created_idx', sync_log.c.created)
+
+BODY_SIZE = 2048
+
+
+def upgrade(migrate_engine):
+    metadata.bind = migrate_engine
+    sync_log.create()
+    extras = Table('datadotworld_extras', MetaData(bind=migrate_engine),
+                   autoload=True)
+    create_column(Column('last_log_id', Integer()), extras)
+
+    # move existing messages into the log
+    rows = migrate_engine.execute(select([
+        extras.c.package_id, extras.c.state, extras.c.modified,
+        extras.c.message
+    ]).where(extras.c.message != None)).fetchall()  # noqa
+    for row in rows:
+        result = migrate_engine.execute(sync_log.insert().values(
+            package_id=row.package_id,
+            created=row.modified or datetime.utcnow(),
+            state=row.state,
+            body=row.message[:BODY_SIZE]))
+        migrate_engine.execute(extras.update().where(
+            extras.c.package_id == row.package_id
+        ).values(last_log_id=result.inserted_primary_key[0]))
+    drop_column('message', extras)
+
+
+def downgrade(migrate_engine):
+    metadata.bind = migrate_engine
+    extras = Table('datadotworld_extras', MetaData(bind=migrate_engine),
+                   autoload=True)
+    create_column(Column('message', UnicodeText()), extras)
+    migrate_engine.execute(extras.update().values(
+        message=select([sync_log.c.body]).where(
+            sync_log.c.id == extras.c.last_log_id
+        ).as_scalar()))
+    drop_column('last_log_id', extras)
+    sync_log.drop()
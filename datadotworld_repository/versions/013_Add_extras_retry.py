@@ -0,0 +1,40 @@
+# Copyright 2017 data.world, inc
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+from sqlalchemy import Table, Column, DateTime, Integer, MetaData, Index
+from migrate.changeset.schema import create_column, drop_column
+
+COLUMNS = (
+    ('failures', Integer),
+    ('next_attempt_at', DateTime),
+)
+
+
+def upgrade(migrate_engine):
+    metadata = MetaData(bind=migrate_engine)
+    extras = Table('datadotworld_extras', metadata, autoload=True)
+    for name, type_ in COLUMNS:
+        create_column(Column(name, type_()), extras)
+    Index('datadotworld_extras_retry_idx',
+          extras.c.state, extras.c.next_attempt_at).create(migrate_engine)
+
+
+def downgrade(migrate_engine):
+    metadata = MetaData(bind=migrate_engine)
+    extras = Table('datadotworld_extras', metadata, autoload=True)
+    Index('datadotworld_extras_retry_idx',
+          extras.c.state, extras.c.next_attempt_at).drop(migrate_engine)
+    for name, _ in reversed(COLUMNS):
+        drop_column(name, extras)